@@ -0,0 +1,225 @@
+# 大量缺曠記錄的彙總引擎 (例如整個系所的學生)
+#
+# 輸入為欄位陣列 (學生、課程、狀態、週別)，一次算出每位學生每門課的各類別節次、總節次與總天數。
+# 已安裝 numpy 時以批次向量運算處理，否則退回逐筆迴圈；兩者結果與 scraper_core.calculate_summary 完全相同。
+
+from array import array
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+import config_data
+import records
+import scraper_core
+import table_parser
+
+
+def is_numpy_available() -> bool:
+    return np is not None
+
+
+class _Vocabulary:
+    """字串 <-> 連續整數代碼"""
+
+    __slots__ = ("index", "values")
+
+    def __init__(self):
+        self.index: Dict[str, int] = {}
+        self.values: List[str] = []
+
+    def code(self, value: str) -> int:
+        code = self.index.get(value)
+        if code is None:
+            code = self.index[value] = len(self.values)
+            self.values.append(value)
+        return code
+
+
+class AbsenceColumns:
+    """
+    以欄位方式保存多位學生的缺曠記錄，同一索引為同一筆記錄
+    學生、課程、週別在加入時就轉成整數代碼 (狀態使用 records.STATUS_CODES)，
+    彙總時只需要處理整數陣列
+    """
+
+    __slots__ = ("students", "courses", "weeks", "student_codes", "course_codes", "status_codes", "week_codes")
+
+    def __init__(self):
+        self.students = _Vocabulary()
+        self.courses = _Vocabulary()
+        self.weeks = _Vocabulary()
+        self.student_codes = array('l')
+        self.course_codes = array('l')
+        self.status_codes = array('l')
+        self.week_codes = array('l')
+
+    @classmethod
+    def from_arrays(
+        cls,
+        students: Iterable[str],
+        courses: Iterable[str],
+        statuses: Iterable[str],
+        weeks: Iterable[str]
+    ) -> "AbsenceColumns":
+        columns = cls()
+        for student, course_name, status, week in zip(students, courses, statuses, weeks):
+            columns.append(student, course_name, status, week)
+        return columns
+
+    def append(self, student: str, course_name: str, status: str, week: str):
+        self.student_codes.append(self.students.code(student))
+        self.course_codes.append(self.courses.code(course_name))
+        self.status_codes.append(records.STATUS_CODES.get(status, records.UNKNOWN_STATUS))
+        self.week_codes.append(self.weeks.code(week))
+
+    def extend(self, student: str, raw_data: Iterable[table_parser.AbsenceRow]):
+        """加入一位學生的 raw_data"""
+        student_code = self.students.code(student)
+        course_code = self.courses.code
+        week_code = self.weeks.code
+        status_codes = records.STATUS_CODES
+        for course_name, status, week, *_ in raw_data:
+            self.student_codes.append(student_code)
+            self.course_codes.append(course_code(course_name))
+            self.status_codes.append(status_codes.get(status, records.UNKNOWN_STATUS))
+            self.week_codes.append(week_code(week))
+
+    def __len__(self) -> int:
+        return len(self.student_codes)
+
+
+class Aggregate:
+    """
+    彙總結果: keys[i] = (學生, 課程)，counts[i] = 各類別節次 + 總節次，
+    days[i] = 總節次 / 因子 (沒有因子為 None)
+    """
+
+    def __init__(self, keys: List[Tuple[str, str]], counts: List[Sequence[int]], days: List[Optional[float]]):
+        self.keys = keys
+        self.counts = counts
+        self.days = days
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+
+# ==============================================================================
+#   【計數】
+# ==============================================================================
+
+def _count_loop(columns: AbsenceColumns) -> Tuple[List[Tuple[str, str]], List[Sequence[int]]]:
+    matrices: Dict[int, records.CountMatrix] = {}
+    course_names = columns.courses.values
+    for student, course, status in zip(columns.student_codes, columns.course_codes, columns.status_codes):
+        matrix = matrices.get(student)
+        if matrix is None:
+            matrix = matrices[student] = records.CountMatrix()
+        matrix.add(course_names[course], status)
+
+    keys: List[Tuple[str, str]] = []
+    counts: List[Sequence[int]] = []
+    for student, matrix in matrices.items():
+        for course_name, row in matrix.items():
+            keys.append((columns.students.values[student], course_name))
+            counts.append(row)
+    return keys, counts
+
+
+def _as_int64(values: array):
+    """array('l') 直接以 frombuffer 轉成 numpy 陣列，不逐筆複製 Python 物件"""
+    return np.frombuffer(values, dtype=f"i{values.itemsize}").astype(np.int64, copy=False)
+
+
+def _count_numpy(columns: AbsenceColumns):
+    """以 np.unique + np.bincount 一次算出所有 (學生, 課程) 的計數"""
+    codes = _as_int64(columns.status_codes)
+    valid = codes >= 0
+    n_courses = max(len(columns.courses.values), 1)
+    students = _as_int64(columns.student_codes)[valid]
+    courses = _as_int64(columns.course_codes)[valid]
+
+    pairs, pair_inverse = np.unique(students * n_courses + courses, return_inverse=True)
+    width = records.TOTAL_INDEX
+    flat = np.bincount(pair_inverse * width + codes[valid], minlength=len(pairs) * width)
+
+    counts = np.empty((len(pairs), records.ROW_WIDTH), dtype=np.int64)
+    counts[:, :width] = flat.reshape(len(pairs), width)
+    counts[:, width] = counts[:, :width].sum(axis=1)
+
+    student_names = columns.students.values
+    course_names = columns.courses.values
+    keys = [
+        (student_names[s], course_names[c])
+        for s, c in zip((pairs // n_courses).tolist(), (pairs % n_courses).tolist())
+    ]
+    return keys, counts
+
+
+# ==============================================================================
+#   【彙總】
+# ==============================================================================
+
+def aggregate(columns: AbsenceColumns, course_factors: Dict[str, int], use_numpy: Optional[bool] = None) -> Aggregate:
+    """計算每位學生每門課的節次與總天數；use_numpy=None 代表有安裝 numpy 就使用"""
+    if use_numpy is None:
+        use_numpy = np is not None
+
+    if not use_numpy:
+        keys, counts = _count_loop(columns)
+        days: List[Optional[float]] = []
+        for (_, course_name), row in zip(keys, counts):
+            factor = course_factors.get(course_name)
+            days.append(row[records.TOTAL_INDEX] / factor if factor else None)
+        return Aggregate(keys, counts, days)
+
+    keys, counts = _count_numpy(columns)
+    factors = np.array([course_factors.get(course_name) or 0 for _, course_name in keys], dtype=np.float64)
+    totals = counts[:, records.TOTAL_INDEX].astype(np.float64)
+    day_values = np.divide(totals, factors, out=np.zeros_like(totals), where=factors > 0)
+    has_factor = (factors > 0).tolist()
+    days = [value if ok else None for value, ok in zip(day_values.tolist(), has_factor)]
+    return Aggregate(keys, counts.tolist(), days)
+
+
+def summary_tables(
+    result: Aggregate,
+    course_factors: Dict[str, int],
+    students: Iterable[str] = (),
+    on_missing_factor: Optional[Callable[[str, str], None]] = None,
+    coverage: Optional[Dict[str, Dict[str, List[int]]]] = None
+) -> Dict[str, List[List[str]]]:
+    """
+    將彙總結果整理成每位學生的表格列，順序與內容同 scraper_core.format_summary_rows
+    students: 即使沒有任何缺曠記錄也要輸出表格的學生
+    on_missing_factor(學生, 課程): 有缺曠記錄但沒有設定因子的課程
+    coverage: {學生: leave_join.coverage_counts 的結果}；None 時 已銷假/待銷假/未請假 欄留空
+    """
+    by_student: Dict[str, Dict[str, Tuple[Sequence[int], Optional[float]]]] = {student: {} for student in students}
+    for (student, course_name), row, days in zip(result.keys, result.counts, result.days):
+        by_student.setdefault(student, {})[course_name] = (row, days)
+
+    empty_row = [0] * records.ROW_WIDTH
+    tables: Dict[str, List[List[str]]] = {}
+    for student, courses in by_student.items():
+        rows: List[List[str]] = []
+        for course_name in scraper_core.ordered_courses(courses.keys(), course_factors):
+            row, days = courses.get(course_name, (empty_row, None))
+            total_absent = row[records.TOTAL_INDEX]
+            if not course_factors.get(course_name):
+                days_str = "N/A"
+                if total_absent > 0 and on_missing_factor:
+                    on_missing_factor(student, course_name)
+            elif total_absent > 0:
+                days_str = f"{days:.2f}"
+            else:
+                days_str = "0.00"
+            if coverage is None:
+                coverage_cells = [""] * len(config_data.COVERAGE_TYPES)
+            else:
+                coverage_cells = [str(count) for count in coverage.get(student, {}).get(course_name, scraper_core.NO_COVERAGE)]
+            rows.append([course_name] + [str(count) for count in row] + [days_str] + coverage_cells)
+        tables[student] = rows
+    return tables
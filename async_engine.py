@@ -0,0 +1,344 @@
+# asyncio 抓取引擎：以協程走完 登入 -> Miss_ct.aspx -> Xerox.aspx，單一行程可同時查詢數百個帳號
+#
+# 所有帳號共用一個 keep-alive 連線池 (aiohttp.TCPConnector)，每個帳號有自己的 Cookie；
+# 每個主機另有一個 semaphore 限制同時進行的請求數，其下再由 ServerGuard 依延遲自動調整 (AIMD)
+# 並重試逾時/5xx。進度回呼與 set_status_callback 相同，
+# 回呼若返回 awaitable 會被 await (可用協程回呼)。未安裝 aiohttp 時 is_available() 為 False。
+# 會阻塞的工作 (登入快取的磁碟讀寫與加解密、整頁 HTML 解析) 以 asyncio.to_thread 在執行緒中進行，
+# 不佔用事件迴圈。
+#
+# 用法: python batch_runner.py accounts.csv --engine async --workers 200 --per-host 8
+
+import asyncio
+import inspect
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+from urllib.parse import urljoin, urlparse
+
+try:
+    import aiohttp
+    from yarl import URL
+except ImportError:
+    aiohttp = None
+
+import batch_runner
+import config_data
+import http_backend
+import load_control
+import run_metrics
+import session_cache
+import table_parser
+from rate_limiter import HostRateLimiter
+from records import LeaveSlipRecord
+from scraper_errors import LoginFailedError, PageStructureError, SessionExpiredError
+from session_cache import SessionCache
+
+DEFAULT_CONCURRENCY = 200  # 同時查詢的帳號數
+DEFAULT_PER_HOST = 8       # 每個主機同時進行的請求數
+KEEPALIVE_TIMEOUT = 30     # 閒置連線保留秒數
+
+AsyncProgress = Callable[[str, str, bool], Optional[Awaitable[None]]]
+
+
+def is_available() -> bool:
+    """是否已安裝 asyncio 引擎所需的 aiohttp 套件"""
+    return aiohttp is not None
+
+
+# ===============================================
+#                【共用連線池】
+# ===============================================
+
+class AsyncEngine:
+    """
+    所有帳號共用的連線池、每主機 semaphore、速率限制與負載控制 (以 async with 使用)
+    每個帳號以 session() 取得自己的 AsyncHttpSession (獨立 Cookie，共用連線)
+    """
+
+    def __init__(
+        self,
+        base_url: Optional[str] = None,
+        per_host: int = DEFAULT_PER_HOST,
+        timeout: float = config_data.HTTP_TIMEOUT,
+        rate_limiter: Optional[HostRateLimiter] = None,
+        guard: Optional[load_control.ServerGuard] = None,
+    ):
+        if aiohttp is None:
+            raise PageStructureError("未安裝 aiohttp 套件，無法使用 asyncio 引擎 (pip install aiohttp)")
+        base_url = base_url or config_data.BASE_URL
+        self.base_url = base_url if base_url.endswith("/") else base_url + "/"
+        self.per_host = max(1, per_host)
+        self.timeout = aiohttp.ClientTimeout(total=timeout)
+        self.rate_limiter = rate_limiter
+        # AIMD 上限不超過 per_host，等待 semaphore 的時間才不會被當成主機延遲；
+        # 主機短暫停擺時等待恢復，而不是讓排隊中的帳號全部失敗
+        self.guard = guard or load_control.ServerGuard(
+            load_control.AimdController(maximum=self.per_host), wait_when_open=config_data.CIRCUIT_MAX_WAIT
+        )
+        self._semaphores: Dict[str, asyncio.Semaphore] = {}
+        self._connector: Optional["aiohttp.TCPConnector"] = None
+
+    async def __aenter__(self) -> "AsyncEngine":
+        self._connector = aiohttp.TCPConnector(limit_per_host=self.per_host, keepalive_timeout=KEEPALIVE_TIMEOUT)
+        return self
+
+    async def __aexit__(self, *exc):
+        await self._connector.close()
+
+    def host_semaphore(self, url: str) -> asyncio.Semaphore:
+        host = urlparse(url).hostname or url
+        semaphore = self._semaphores.get(host)
+        if semaphore is None:
+            semaphore = self._semaphores[host] = asyncio.Semaphore(self.per_host)
+        return semaphore
+
+    def session(self, metrics: Optional[run_metrics.RunMetrics] = None) -> "AsyncHttpSession":
+        return AsyncHttpSession(self, metrics)
+
+
+class AsyncHttpSession:
+    """單一帳號的工作階段：自己的 Cookie，連線取自 AsyncEngine 的共用連線池"""
+
+    def __init__(self, engine: AsyncEngine, metrics: Optional[run_metrics.RunMetrics] = None):
+        self.engine = engine
+        self.metrics = metrics
+        # unsafe=True 讓以 IP 位址連線 (替身伺服器) 時也能保存 Cookie
+        self.client = aiohttp.ClientSession(
+            connector=engine._connector, connector_owner=False, timeout=engine.timeout,
+            cookie_jar=aiohttp.CookieJar(unsafe=True)
+        )
+
+    def url(self, page: str) -> str:
+        return urljoin(self.engine.base_url, page)
+
+    async def close(self):
+        await self.client.close()
+
+    async def __aenter__(self) -> "AsyncHttpSession":
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+    async def _request(
+        self, method: str, url: str, data: Optional[http_backend.FormItems] = None, idempotent: bool = True
+    ) -> Tuple[str, str]:
+        """
+        所有請求的共同入口：負載控制與重試、速率限制、每主機 semaphore、HTTP 狀態檢查
+        返回 (最終網址, HTML)
+        """
+        return await self.engine.guard.acall(
+            lambda: self._send(method, url, data), idempotent, self._on_retry, before_attempt=lambda: self._pace(url)
+        )
+
+    def _on_retry(self, attempt: int, delay: float, error: BaseException):
+        if self.metrics is not None:
+            self.metrics.incr(run_metrics.RETRIES)
+
+    async def _pace(self, url: str):
+        if self.engine.rate_limiter is not None:
+            delay = self.engine.rate_limiter.reserve(url)
+            if delay > 0:
+                await asyncio.sleep(delay)
+
+    async def _send(self, method: str, url: str, data: Optional[http_backend.FormItems]) -> Tuple[str, str]:
+        async with self.engine.host_semaphore(url):
+            async with self.client.request(method, url, data=data) as response:
+                body = await response.read()
+                if self.metrics is not None:
+                    self.metrics.incr(run_metrics.HTTP_REQUESTS)
+                    self.metrics.incr(run_metrics.BYTES_FETCHED, len(body))
+                response.raise_for_status()
+                return str(response.url), body.decode(response.get_encoding(), errors="replace")
+
+    async def login(self, account: str, password: str, set_status_callback=None):
+        """同 HttpSession.login；取得登入頁後才送出 3/9"""
+        login_url = self.url(http_backend.LOGIN_PAGE)
+        _, html = await self._request("GET", login_url)
+        if set_status_callback is not None:
+            set_status_callback("3/9 帳號密碼已填寫，正在登入...")
+        # 送出登入表單不重試 (避免重複嘗試登入)
+        url, html = await self._request(
+            "POST", login_url,
+            http_backend.form_items(await asyncio.to_thread(http_backend.login_form_fields, html, account, password)),
+            idempotent=False
+        )
+        if http_backend.is_login_response(url, html):
+            raise LoginFailedError("登入失敗，請檢查帳號密碼。")
+
+    async def fetch_page(self, page: str) -> str:
+        url, html = await self._request("GET", self.url(page))
+        if http_backend.is_login_response(url, html):
+            raise SessionExpiredError("登入狀態已失效，被導回登入頁。")
+        return html
+
+    async def postback(self, page: str, source_html: str, event_target: str, event_argument: str) -> str:
+        fields = await asyncio.to_thread(http_backend.postback_form_fields, page, source_html, event_target, event_argument)
+        url, html = await self._request("POST", self.url(page), http_backend.form_items(fields))
+        if http_backend.is_login_response(url, html):
+            raise SessionExpiredError("登入狀態已失效，被導回登入頁。")
+        return html
+
+    async def fetch_all_grid_pages(self, page: str, first_html: str) -> List[str]:
+        """同 HttpSession.fetch_all_grid_pages，每一輪的 postback 以 gather 同時送出"""
+        htmls: Dict[int, str] = {1: first_html}
+        frontier: List[Tuple[int, str]] = [(1, first_html)]
+        while frontier:
+            wanted = await asyncio.to_thread(http_backend.plan_grid_pages, frontier, htmls)
+            results = await asyncio.gather(*(self.postback(page, *wanted[number]) for number in wanted))
+            frontier = list(zip(wanted, results))
+            htmls.update(frontier)
+        return [htmls[number] for number in sorted(htmls)]
+
+    def get_cookies(self) -> List[Dict]:
+        return [
+            {"name": morsel.key, "value": morsel.value, "domain": morsel["domain"], "path": morsel["path"] or "/",
+             "secure": bool(morsel["secure"])}
+            for morsel in self.client.cookie_jar
+        ]
+
+    def set_cookies(self, cookies: List[Dict]):
+        self.client.cookie_jar.update_cookies(
+            {cookie["name"]: cookie["value"] for cookie in cookies}, URL(self.engine.base_url)
+        )
+
+
+# ===============================================
+#                【抓取流程】
+# ===============================================
+
+def _collecting(on_progress: AsyncProgress, pending: List[Awaitable]) -> Callable[[str, str, bool], None]:
+    """把可能返回 awaitable 的進度回呼轉成一般函式；返回的 awaitable 先收集，之後由 _drain 統一 await"""
+    def progress(account, message, is_error=False):
+        result = on_progress(account, message, is_error)
+        if inspect.isawaitable(result):
+            pending.append(result)
+    return progress
+
+
+async def _drain(pending: List[Awaitable]):
+    while pending:
+        await pending.pop(0)
+
+
+async def fetch_records(
+    engine: AsyncEngine,
+    account: str,
+    password: str,
+    set_status_callback,
+    cache: Optional[SessionCache] = None,
+    metrics: Optional[run_metrics.RunMetrics] = None,
+) -> Tuple[List[table_parser.AbsenceRow], List[LeaveSlipRecord]]:
+    """http_backend.fetch_records 的協程版本，狀態訊息與返回格式相同"""
+    async with engine.session(metrics) as http:
+        set_status_callback("1/9 已取得共用連線池，開始查詢...")
+        pages = None
+        cookies = await asyncio.to_thread(cache.load, account, password) if cache else None
+        if cookies:
+            set_status_callback("2/9 使用快取的登入狀態，直接讀取資料頁面...")
+            http.set_cookies(cookies)
+            try:
+                pages = await asyncio.gather(http.fetch_page(http_backend.MISS_PAGE), http.fetch_page(http_backend.XEROX_PAGE))
+            except SessionExpiredError:
+                set_status_callback("⚠️ 快取的登入狀態已過期，改為重新登入...")
+                await asyncio.to_thread(cache.invalidate, account)
+                http.client.cookie_jar.clear()
+                pages = None
+
+        if pages is None:
+            set_status_callback(f"2/9 正在以 HTTP 訪問登入頁面: {http.url(http_backend.LOGIN_PAGE)}")
+            await http.login(account, password, set_status_callback)
+            if cache:
+                await asyncio.to_thread(cache.save, account, password, http.get_cookies())
+            set_status_callback("4/9 登入成功，正在同時讀取缺曠記錄與假單列印頁面...")
+            pages = await asyncio.gather(http.fetch_page(http_backend.MISS_PAGE), http.fetch_page(http_backend.XEROX_PAGE))
+        miss_html, xerox_html = pages
+
+        set_status_callback("5/9 正在抓取缺曠課表格數據...")
+        miss_pages, xerox_pages = await asyncio.gather(
+            http.fetch_all_grid_pages(http_backend.MISS_PAGE, miss_html),
+            http.fetch_all_grid_pages(http_backend.XEROX_PAGE, xerox_html),
+        )
+        raw_data = await asyncio.to_thread(table_parser.extract_absence_pages, miss_pages)
+
+        set_status_callback(f"6/9 已取得假單列印頁面: {http.url(http_backend.XEROX_PAGE)}")
+        set_status_callback("7/9 正在抓取假單表格數據...")
+        leave_slips = await asyncio.to_thread(table_parser.extract_leave_slip_pages, xerox_pages)
+
+    if metrics is not None:
+        metrics.incr(run_metrics.ABSENCE_ROWS, len(raw_data))
+        metrics.incr(run_metrics.XEROX_ROWS, len(leave_slips))
+    return raw_data, leave_slips
+
+
+async def run_account(
+    engine: AsyncEngine,
+    account: str,
+    password: str,
+    on_progress: AsyncProgress,
+    cache: Optional[SessionCache] = None,
+) -> batch_runner.AccountResult:
+    """查詢單一帳號，只保留 raw_data 與假單 (由 run_batch 一次彙總)；失敗時記錄錯誤原因"""
+    metrics = run_metrics.RunMetrics(account, "async")
+    pending: List[Awaitable] = []
+    progress = _collecting(on_progress, pending)
+
+    def status(message, is_error=False):
+        progress(account, message, is_error)
+    status = metrics.wrap_status(status)
+
+    result = batch_runner.AccountResult(account)
+    try:
+        result.raw_data, result.leave_slips = await fetch_records(engine, account, password, status, cache, metrics)
+        status("資料抓取完成，等待彙總...")
+        metrics.finish()
+    except Exception as e:
+        result.error = f"{e.__class__.__name__}: {e}"
+        status(f"查詢失敗: {result.error}", True)
+        metrics.finish("error", result.error)
+    await _drain(pending)
+    result.metrics = metrics
+    return result
+
+
+async def run_batch_async(
+    accounts: List[Tuple[str, str]],
+    course_factors: Dict[str, int],
+    on_progress: AsyncProgress,
+    concurrency: int = DEFAULT_CONCURRENCY,
+    per_host: int = DEFAULT_PER_HOST,
+    rate: float = 0.0,
+    base_url: Optional[str] = None,
+    cache: Optional[SessionCache] = None,
+) -> List[batch_runner.AccountResult]:
+    """
+    以協程同時查詢所有帳號 (最多 concurrency 個同時進行)，結果依帳號檔順序返回
+    對主機的實際請求數由 per_host 與 rate 限制，concurrency 只決定同時有多少帳號在等待
+    """
+    account_slots = asyncio.Semaphore(max(1, concurrency))
+    rate_limiter = HostRateLimiter(rate) if rate > 0 else None
+
+    async with AsyncEngine(base_url, per_host=per_host, rate_limiter=rate_limiter) as engine:
+        async def run_one(account: str, password: str) -> batch_runner.AccountResult:
+            async with account_slots:
+                return await run_account(engine, account, password, on_progress, cache)
+
+        results = await asyncio.gather(*(run_one(account, password) for account, password in accounts))
+
+    pending: List[Awaitable] = []
+    batch_runner.aggregate_results(results, course_factors, _collecting(on_progress, pending))
+    await _drain(pending)
+    return list(results)
+
+
+def run_batch(
+    accounts: List[Tuple[str, str]],
+    course_factors: Dict[str, int],
+    on_progress: Callable[[str, str, bool], None],
+    concurrency: int = DEFAULT_CONCURRENCY,
+    per_host: int = DEFAULT_PER_HOST,
+    rate: float = 0.0,
+    base_url: Optional[str] = None,
+) -> List[batch_runner.AccountResult]:
+    """同步呼叫端 (batch_runner.main) 的入口"""
+    cache = session_cache.get_default_cache()
+    return asyncio.run(run_batch_async(accounts, course_factors, on_progress, concurrency, per_host, rate, base_url, cache))
@@ -0,0 +1,270 @@
+# 多帳號批次查詢：從 CSV/JSONL 讀取帳號，以有上限的工作執行緒池並行查詢
+#
+# 用法: python batch_runner.py accounts.csv -o results.csv --workers 4 --rate 2
+#       python batch_runner.py accounts.csv -o results.parquet --records-output absences.parquet --slips-output slips.parquet
+#       python batch_runner.py accounts.csv --engine async --workers 200 --per-host 8   (asyncio 引擎，見 async_engine.py)
+# 帳號檔格式:
+#   CSV   需有 account,password 兩欄 (第一列為標題)
+#   JSONL 每行一個 {"account": "...", "password": "..."}
+
+import argparse
+import csv
+import json
+import os
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+import aggregation
+import config_data
+import driver_pool
+import exporter
+import leave_join
+import load_control
+import run_metrics
+import scraper_core
+from rate_limiter import HostRateLimiter
+from records import LeaveSlipRecord
+from table_parser import AbsenceRow
+
+ENGINE_THREADS = "threads"
+ENGINE_ASYNC = "async"
+
+RESULT_HEADER = ["帳號"] + exporter.SUMMARY_HEADER + ["錯誤"]
+
+
+class AccountResult:
+    """單一帳號的查詢結果；error 不為空代表查詢失敗"""
+
+    def __init__(self, account: str, rows: Optional[List[List[str]]] = None, error: str = ""):
+        self.account = account
+        self.rows = rows or []
+        self.error = error
+        self.raw_data: List[AbsenceRow] = []
+        self.leave_slips: List[LeaveSlipRecord] = []
+        self.metrics: Optional[run_metrics.RunMetrics] = None
+
+    @property
+    def ok(self) -> bool:
+        return not self.error
+
+
+def load_accounts(filepath: str) -> List[Tuple[str, str]]:
+    """讀取帳號檔 (依副檔名判斷 CSV 或 JSONL)，返回 [(account, password), ...]"""
+    accounts: List[Tuple[str, str]] = []
+    with open(filepath, 'r', encoding='utf-8-sig', newline='') as f:
+        if filepath.lower().endswith((".jsonl", ".ndjson")):
+            records = (json.loads(line) for line in f if line.strip())
+        else:
+            records = csv.DictReader(f)
+        for record in records:
+            account = str(record.get("account") or "").strip()
+            if account:
+                accounts.append((account, str(record.get("password") or "")))
+    return accounts
+
+
+def run_account(
+    account: str,
+    password: str,
+    course_factors: Dict[str, int],
+    on_progress: Callable[[str, str, bool], None],
+    backend: str = scraper_core.BACKEND_AUTO,
+    pool: Optional[driver_pool.DriverPool] = None,
+    rate_limiter: Optional[HostRateLimiter] = None,
+    aggregate: bool = True,
+    guard: Optional[load_control.ServerGuard] = None,
+) -> AccountResult:
+    """
+    查詢單一帳號 (等同 scrape_and_calculate，但失敗時保留錯誤原因而不是返回空列表)
+    aggregate=False 時只保留 raw_data 與假單，由 run_batch 對所有帳號一次彙總
+    每個帳號都會記錄一份 RunMetrics (result.metrics)
+    guard: 批次中所有帳號共用，學校主機變慢時一起降低並行數
+    """
+    metrics = run_metrics.RunMetrics(account, backend)
+
+    def status(message, is_error=False):
+        on_progress(account, message, is_error)
+    status = metrics.wrap_status(status)
+
+    try:
+        raw_data, leave_slips = scraper_core.fetch_records(
+            account, password, status, backend, pool=pool, rate_limiter=rate_limiter, metrics=metrics, guard=guard
+        )
+        if not aggregate:
+            result = AccountResult(account)
+            status("資料抓取完成，等待彙總...")
+        else:
+            status("8/9 正在計算總結數據...")
+            result = AccountResult(account, scraper_core.calculate_summary(raw_data, course_factors, status, leave_slips))
+            status("9/9 資料抓取與計算完成！")
+        result.raw_data = raw_data
+        result.leave_slips = leave_slips
+        metrics.finish()
+    except Exception as e:
+        status(f"查詢失敗: {e.__class__.__name__}: {e}", True)
+        result = AccountResult(account, error=f"{e.__class__.__name__}: {e}")
+        metrics.finish("error", result.error)
+    result.metrics = metrics
+    return result
+
+
+def run_batch(
+    accounts: List[Tuple[str, str]],
+    course_factors: Dict[str, int],
+    on_progress: Callable[[str, str, bool], None],
+    workers: int = 4,
+    rate: float = 2.0,
+    backend: str = scraper_core.BACKEND_AUTO,
+) -> List[AccountResult]:
+    """
+    並行查詢所有帳號，最多同時 workers 個、每秒對學校主機最多 rate 次請求
+    單一帳號失敗不影響其他帳號；結果依帳號檔順序返回
+    實際同時送出的請求數另由 ServerGuard 依主機延遲自動調整 (不超過 workers)；
+    主機停擺時各帳號最多等待 CIRCUIT_MAX_WAIT 秒讓主機恢復
+    """
+    rate_limiter = HostRateLimiter(rate)
+    # 主機短暫停擺時等待恢復，而不是讓排隊中的帳號全部失敗
+    guard = load_control.ServerGuard(
+        load_control.AimdController(maximum=max(1, workers)), wait_when_open=config_data.CIRCUIT_MAX_WAIT
+    )
+    pool = driver_pool.DriverPool(scraper_core.create_driver, max_size=workers)
+    results: Dict[int, AccountResult] = {}
+    try:
+        with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+            futures = {
+                executor.submit(
+                    run_account, account, password, course_factors, on_progress, backend, pool, rate_limiter, False, guard
+                ): index
+                for index, (account, password) in enumerate(accounts)
+            }
+            for future in as_completed(futures):
+                results[futures[future]] = future.result()
+    finally:
+        pool.close_all()
+    ordered = [results[index] for index in range(len(accounts))]
+    aggregate_results(ordered, course_factors, on_progress)
+    return ordered
+
+
+def aggregate_results(
+    results: List[AccountResult],
+    course_factors: Dict[str, int],
+    on_progress: Callable[[str, str, bool], None]
+):
+    """所有帳號抓取完成後，以 aggregation 引擎一次算出每個帳號的表格列"""
+    # 以帳號檔中的位置當作學生鍵，帳號重複時各自計算
+    succeeded = {str(index): result for index, result in enumerate(results) if result.ok}
+    columns = aggregation.AbsenceColumns()
+    for key, result in succeeded.items():
+        columns.extend(key, result.raw_data)
+
+    def warn(key, course_name):
+        on_progress(succeeded[key].account, f"⚠️ 警告: 課程【{course_name}】缺少應計節次，總天數無法計算 (N/A)。", True)
+
+    tables = aggregation.summary_tables(
+        aggregation.aggregate(columns, course_factors), course_factors,
+        students=succeeded.keys(), on_missing_factor=warn,
+        coverage={key: leave_join.coverage_counts(result.raw_data, result.leave_slips) for key, result in succeeded.items()}
+    )
+    for key, result in succeeded.items():
+        result.rows = tables[key]
+        on_progress(result.account, "9/9 資料抓取與計算完成！", False)
+
+
+def _result_rows(results: Iterable[AccountResult]) -> Iterable[List[str]]:
+    for result in results:
+        if not result.ok:
+            yield [result.account, ""] + [""] * (len(RESULT_HEADER) - 3) + [result.error]
+            continue
+        for row in result.rows:
+            yield [result.account] + row + [""]
+
+
+def write_results(results: List[AccountResult], filepath: str):
+    """將所有帳號的結果串流寫成一個檔案 (.csv / .jsonl / .parquet)"""
+    exporter.export_rows(filepath, RESULT_HEADER, _result_rows(results))
+
+
+def write_records(results: List[AccountResult], records_path: Optional[str] = None, slips_path: Optional[str] = None):
+    """將所有帳號的原始缺曠記錄 / 假單各串流寫成一個檔案 (以帳號欄區分)"""
+    succeeded = [result for result in results if result.ok]
+    if records_path:
+        exporter.export_rows(records_path, exporter.ABSENCE_HEADER, (
+            row for result in succeeded for row in exporter.absence_rows(result.raw_data, result.account)
+        ))
+    if slips_path:
+        exporter.export_rows(slips_path, exporter.SLIP_HEADER, (
+            row for result in succeeded for row in exporter.slip_rows(result.leave_slips, result.account)
+        ))
+
+
+def add_metrics_arguments(parser: argparse.ArgumentParser):
+    parser.add_argument("--metrics-json", help="各帳號的階段耗時與計數報告 (JSON)")
+    parser.add_argument("--metrics-prom", help="同上，Prometheus 文字格式")
+
+
+def write_metrics(results: List[AccountResult], args):
+    runs = [result.metrics for result in results if result.metrics is not None]
+    if args.metrics_json:
+        run_metrics.write_json(runs, args.metrics_json)
+    if args.metrics_prom:
+        run_metrics.write_prometheus(runs, args.metrics_prom)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="多帳號批次查詢缺曠課")
+    parser.add_argument("accounts", help="帳號檔 (.csv 或 .jsonl)")
+    parser.add_argument("-o", "--output", default="batch_results.csv", help="結果檔 (.csv / .jsonl / .parquet)")
+    parser.add_argument("--records-output", help="另外匯出所有帳號的原始缺曠記錄")
+    parser.add_argument("--slips-output", help="另外匯出所有帳號的假單")
+    parser.add_argument("--workers", type=int, default=4, help="同時查詢的帳號數上限")
+    parser.add_argument("--engine", choices=[ENGINE_THREADS, ENGINE_ASYNC], default=ENGINE_THREADS,
+                        help="threads: 每帳號一個執行緒 (可用 Selenium); async: 單一執行緒協程 (僅 HTTP，需要 aiohttp)")
+    parser.add_argument("--per-host", type=int, default=8, help="asyncio 引擎對每個主機同時進行的請求數")
+    parser.add_argument("--rate", type=float, default=2.0, help="每秒對學校主機的請求數上限 (0 為不限制)")
+    parser.add_argument("--backend", choices=[scraper_core.BACKEND_AUTO, scraper_core.BACKEND_HTTP, scraper_core.BACKEND_SELENIUM],
+                        default=scraper_core.BACKEND_AUTO, help="threads 引擎的抓取方式 (async 引擎一律為 HTTP)")
+    parser.add_argument("--profile", help="學期設定檔名稱 (預設為使用中的設定檔)")
+    add_metrics_arguments(parser)
+    args = parser.parse_args(argv)
+    if args.engine == ENGINE_ASYNC and args.backend == scraper_core.BACKEND_SELENIUM:
+        parser.error("--engine async 只支援 HTTP，無法搭配 --backend selenium")
+
+    if not os.path.exists(args.accounts):
+        print(f"找不到帳號檔: {args.accounts}", file=sys.stderr)
+        return 2
+    accounts = load_accounts(args.accounts)
+    print_lock = threading.Lock()
+
+    def on_progress(account, message, is_error=False):
+        with print_lock:
+            print(f"[{account}] {message}", file=sys.stderr if is_error else sys.stdout)
+
+    course_factors = config_data.load_factors_from_file(args.profile)
+    if args.engine == ENGINE_ASYNC:
+        import async_engine
+        if not async_engine.is_available():
+            print("asyncio 引擎需要 aiohttp 套件 (pip install aiohttp)", file=sys.stderr)
+            return 2
+        results = async_engine.run_batch(
+            accounts, course_factors, on_progress, concurrency=args.workers, per_host=args.per_host, rate=args.rate
+        )
+    else:
+        results = run_batch(
+            accounts, course_factors, on_progress, workers=args.workers, rate=args.rate, backend=args.backend
+        )
+    write_results(results, args.output)
+    write_records(results, args.records_output, args.slips_output)
+    write_metrics(results, args)
+
+    failed = [r.account for r in results if not r.ok]
+    print(f"完成 {len(results) - len(failed)}/{len(results)} 個帳號，結果已寫入: {args.output}")
+    if failed:
+        print(f"失敗帳號: {', '.join(failed)}", file=sys.stderr)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
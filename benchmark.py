@@ -0,0 +1,230 @@
+# 效能基準測試：重播擷取下來的頁面 (fixture)，並以合成資料放大到 1 萬 ~ 100 萬列
+#
+# 用法: python benchmark.py --rows 10000 100000 1000000 --repeat 3 -o benchmark_results.json
+#       python benchmark.py --compare old_results.json     (與前一版本的結果比較)
+# 分別計時: 表格解析 (與正式流程相同，經過 extract_absence_pages 的分頁合併與去重)、
+#           步驟 C 統計、輸出表格列、Treeview 插入 (沒有顯示器時略過)
+
+import argparse
+import json
+import platform
+import random
+import statistics
+import sys
+import time
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Tuple
+
+import aggregation
+import config_data
+import fixture_server
+import scraper_core
+import table_parser
+
+DEFAULT_ROWS = [10_000, 100_000, 1_000_000]
+DEFAULT_OUTPUT = "benchmark_results.json"
+ROWS_PER_COURSE = 200  # 合成資料中每門課平均的記錄數 (決定課程數與 Treeview 列數)
+
+# ==============================================================================
+#   【合成資料】
+# ==============================================================================
+
+def synthesize_absence_html(rows: int, seed: int = 0) -> str:
+    """
+    以缺曠課 fixture 的標題列與資料列為樣本，產生指定列數的 GridView HTML
+    課程數隨列數放大 (約每 ROWS_PER_COURSE 列一門課)，週別、日期、節次依序遞增
+    節次每列不同，(日期, 課程, 節次) 不會重複，去重後列數不變
+    """
+    rng = random.Random(seed)
+    headers, samples = table_parser.parse_table(fixture_server.load_fixture(fixture_server.MISS_FIXTURE))
+    idx = table_parser.column_indexes(headers, [table_parser.ABSENCE_COURSE, table_parser.ABSENCE_STATUS])
+    fixture_courses = sorted({cols[idx[table_parser.ABSENCE_COURSE]] for cols in samples})
+    statuses = [cols[idx[table_parser.ABSENCE_STATUS]] for cols in samples]
+
+    extra = max(0, rows // ROWS_PER_COURSE - len(fixture_courses))
+    courses = fixture_courses + [f"合成課程{n:05d}" for n in range(extra)]
+
+    parts = [
+        f'<html><body><table id="{config_data.TABLE_ID}">',
+        "<tr>" + "".join(f"<th>{h}</th>" for h in headers) + "</tr>",
+    ]
+    for i in range(rows):
+        week = i // 500 % 18 + 1
+        day = i // 50 % 28 + 1
+        values = {
+            table_parser.ABSENCE_WEEK: str(week),
+            table_parser.ABSENCE_DATE: f"114/{week % 12 + 1:02d}/{day:02d}",
+            table_parser.ABSENCE_COURSE: rng.choice(courses),
+            table_parser.ABSENCE_STATUS: rng.choice(statuses),
+            table_parser.ABSENCE_SECTION: str(100 + i),
+        }
+        parts.append("<tr>" + "".join(f"<td>{values.get(h, '')}</td>" for h in headers) + "</tr>")
+    parts.append("</table></body></html>")
+    return "".join(parts)
+
+
+def synthesize_factors(raw_data, ratio: float = 0.5, seed: int = 0) -> Dict[str, int]:
+    """為約一半的課程設定因子，讓輸出同時包含可計算與 N/A 的課程"""
+    rng = random.Random(seed)
+    courses = sorted({row[0] for row in raw_data})
+    return {course: rng.randint(1, 6) for course in courses if rng.random() < ratio}
+
+
+# ==============================================================================
+#   【計時】
+# ==============================================================================
+
+def _time(func: Callable[[], object], repeat: int) -> Tuple[Dict[str, float], object]:
+    """執行 repeat 次，返回 (統計秒數, 最後一次的返回值)"""
+    samples: List[float] = []
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        samples.append(time.perf_counter() - start)
+    return {
+        "min_s": min(samples),
+        "median_s": statistics.median(samples),
+        "mean_s": statistics.fmean(samples),
+    }, result
+
+
+def _noop_status(message, is_error=False):
+    pass
+
+
+def _make_treeview():
+    """建立隱藏的 Treeview；沒有 tkinter 或顯示器時返回 (None, 原因)"""
+    try:
+        import tkinter as tk
+        from tkinter import ttk
+        root = tk.Tk()
+    except Exception as e:
+        return None, f"{e.__class__.__name__}: {e}"
+    root.withdraw()
+    columns = ['課程名稱'] + config_data.ABSENCE_TYPES + ['總缺課數量', '總天數'] + config_data.COVERAGE_TYPES
+    return ttk.Treeview(root, columns=columns, show='headings'), ""
+
+
+def bench_dataset(name: str, html: str, factors: Optional[Dict[str, int]], repeat: int, tree) -> List[Dict]:
+    """對一份缺曠課 HTML 依序計時各階段"""
+    results: List[Dict] = []
+
+    def record(stage: str, rows: int, timing: Optional[Dict[str, float]], note: str = ""):
+        entry = {"dataset": name, "stage": stage, "rows": rows}
+        if timing is None:
+            entry["skipped"] = note
+        else:
+            entry.update(timing)
+            entry["rows_per_s"] = rows / timing["min_s"] if timing["min_s"] > 0 else None
+        results.append(entry)
+
+    timing, raw_data = _time(lambda: table_parser.extract_absence_pages([html]), repeat)
+    record("parse", len(raw_data), timing)
+
+    if factors is None:
+        factors = synthesize_factors(raw_data)
+
+    timing, counts = _time(lambda: scraper_core.count_absences(raw_data), repeat)
+    record("aggregate", len(raw_data), timing)
+
+    if aggregation.is_numpy_available():
+        columns = aggregation.AbsenceColumns()
+        columns.extend(name, raw_data)
+        timing, _ = _time(lambda: aggregation.aggregate(columns, factors), repeat)
+        record("aggregate_vectorized", len(raw_data), timing)
+    else:
+        record("aggregate_vectorized", len(raw_data), None, "numpy 未安裝")
+
+    timing, output_rows = _time(lambda: scraper_core.format_summary_rows(counts, factors, _noop_status), repeat)
+    record("output_rows", len(output_rows), timing)
+
+    if tree is None:
+        record("treeview_insert", len(output_rows), None, "無法建立 Tk 視窗")
+    else:
+        def insert_rows():
+            tree.delete(*tree.get_children())
+            for row in output_rows:
+                tree.insert('', 'end', values=row)
+            tree.update_idletasks()
+        timing, _ = _time(insert_rows, repeat)
+        record("treeview_insert", len(output_rows), timing)
+
+    return results
+
+
+def run(row_counts: List[int], repeat: int, seed: int = 0) -> Dict:
+    tree, tree_error = _make_treeview()
+    results: List[Dict] = []
+    try:
+        miss_html = fixture_server.load_fixture(fixture_server.MISS_FIXTURE)
+        xerox_html = fixture_server.load_fixture(fixture_server.XEROX_FIXTURE)
+        fixture_factors = config_data.load_factors_from_file()
+        results += bench_dataset("fixture", miss_html, fixture_factors, repeat, tree)
+
+        timing, slips = _time(lambda: table_parser.extract_leave_slips(xerox_html), repeat)
+        results.append({"dataset": "fixture", "stage": "parse_xerox", "rows": len(slips), **timing})
+
+        for rows in row_counts:
+            print(f"產生 {rows} 列合成資料...", file=sys.stderr)
+            html = synthesize_absence_html(rows, seed)
+            results += bench_dataset(f"synthetic-{rows}", html, None, repeat, tree)
+    finally:
+        if tree is not None:
+            tree.winfo_toplevel().destroy()
+
+    return {
+        "meta": {
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "parser": "lxml" if table_parser.lxml is not None else "html.parser",
+            "numpy": aggregation.is_numpy_available(),
+            "repeat": repeat,
+            "seed": seed,
+            "treeview": tree_error or "ok",
+        },
+        "results": results,
+    }
+
+
+def compare(current: Dict, previous: Dict) -> List[str]:
+    """以 min_s 比較兩份結果，返回每個 (資料集, 階段) 的倍率說明"""
+    old = {(r["dataset"], r["stage"]): r for r in previous.get("results", []) if "min_s" in r}
+    lines = []
+    for r in current["results"]:
+        before = old.get((r["dataset"], r["stage"]))
+        if "min_s" not in r or before is None or not before["min_s"]:
+            continue
+        ratio = r["min_s"] / before["min_s"]
+        lines.append(f"{r['dataset']:>18} {r['stage']:<22} {before['min_s']:.4f}s -> {r['min_s']:.4f}s  x{ratio:.2f}")
+    return lines
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="解析與統計流程的效能基準測試")
+    parser.add_argument("--rows", type=int, nargs="*", default=DEFAULT_ROWS, help="合成資料的列數 (可多個)")
+    parser.add_argument("--repeat", type=int, default=3, help="每個階段重複次數 (取最小值比較)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("-o", "--output", default=DEFAULT_OUTPUT, help="結果 JSON 檔")
+    parser.add_argument("--compare", help="與先前的結果 JSON 比較")
+    args = parser.parse_args(argv)
+
+    report = run(args.rows, max(1, args.repeat), args.seed)
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+
+    for r in report["results"]:
+        timing = f"{r['min_s']:.4f}s" if "min_s" in r else f"略過 ({r['skipped']})"
+        print(f"{r['dataset']:>18} {r['stage']:<22} {r['rows']:>9} 列  {timing}")
+    print(f"結果已寫入: {args.output}")
+
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            previous = json.load(f)
+        print("\n".join(compare(report, previous)))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
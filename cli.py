@@ -0,0 +1,119 @@
+# 無視窗命令列入口：不載入 tkinter，可在沒有顯示器的伺服器或排程 (cron) 上執行
+#
+# 用法:
+#   python -m cli query --account B11012345              (密碼由 UCH_PASSWORD 環境變數或提示輸入)
+#   python -m cli query --account B11012345 -o summary.csv --backend http
+#   python -m cli query --account B11012345 --trend --recent-weeks 4   (另印出每週節次與最近 4 週合計)
+#   python -m cli query --account B11012345 -o summary.parquet --with-records   (另匯出 *_absences 與 *_slips)
+# 匯出檔依副檔名決定格式 (.csv / .jsonl / .parquet)；未指定時將表格印到標準輸出
+
+import argparse
+import getpass
+import os
+import sys
+import unicodedata
+from typing import List
+
+import batch_runner
+import config_data
+import exporter
+import scraper_core
+import timeline
+
+SUMMARY_HEADER = exporter.SUMMARY_HEADER
+PASSWORD_ENV = "UCH_PASSWORD"
+
+
+def _display_width(text: str) -> int:
+    """終端機顯示寬度 (全形字佔兩格)"""
+    return sum(2 if unicodedata.east_asian_width(ch) in ("W", "F") else 1 for ch in text)
+
+
+def format_table(rows: List[List[str]], header: List[str] = SUMMARY_HEADER) -> str:
+    """將表格列排成對齊的純文字表格"""
+    table = [header] + rows
+    widths = [max(_display_width(row[i]) for row in table) for i in range(len(header))]
+    lines = []
+    for row in table:
+        cells = [cell + " " * (width - _display_width(cell)) for cell, width in zip(row, widths)]
+        lines.append("  ".join(cells).rstrip())
+    return "\n".join(lines)
+
+
+def write_table(rows: List[List[str]], filepath: str, header: List[str] = SUMMARY_HEADER):
+    """將表格列寫成 .csv / .jsonl / .parquet"""
+    exporter.export_rows(filepath, header, rows)
+
+
+def format_trend(absence_timeline: timeline.AbsenceTimeline, recent_weeks: int = 0) -> str:
+    """每門課每週的合計節次；recent_weeks > 0 時加上最近 N 週的合計欄"""
+    weeks = list(absence_timeline.weeks())
+    header = ["課程名稱"] + [f"週{week}" for week in weeks]
+    recent = {}
+    if recent_weeks > 0:
+        header.append(f"最近{recent_weeks}週")
+        recent = absence_timeline.recent_weeks(recent_weeks)
+    rows = []
+    for course_name in absence_timeline.courses():
+        row = [course_name] + [str(count) for count in absence_timeline.week_series(course_name)]
+        if recent_weeks > 0:
+            row.append(str(recent.get(course_name, 0)))
+        rows.append(row)
+    return format_table(rows, header)
+
+
+def cmd_query(args) -> int:
+    password = args.password or os.environ.get(PASSWORD_ENV)
+    if password is None:
+        password = getpass.getpass("密碼: ")
+
+    def on_progress(account, message, is_error=False):
+        if not args.quiet or is_error:
+            print(message, file=sys.stderr)
+
+    result = batch_runner.run_account(
+        args.account, password, config_data.load_factors_from_file(args.profile), on_progress, args.backend
+    )
+    batch_runner.write_metrics([result], args)
+    if not result.ok:
+        return 1
+
+    if args.output:
+        if args.with_records:
+            paths = exporter.export_all(args.output, result.rows, result.raw_data, result.leave_slips, args.account)
+        else:
+            write_table(result.rows, args.output)
+            paths = [args.output]
+        print(f"結果已寫入: {', '.join(paths)}", file=sys.stderr)
+    else:
+        print(format_table(result.rows))
+    if args.trend or args.recent_weeks:
+        print()
+        print(format_trend(timeline.AbsenceTimeline(result.raw_data), args.recent_weeks))
+    return 0
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog="cli", description="缺曠課查詢 (命令列版)")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    query = subparsers.add_parser("query", help="查詢單一帳號並輸出統計表")
+    query.add_argument("--account", required=True, help="學號")
+    query.add_argument("--password", help=f"密碼 (建議改用 {PASSWORD_ENV} 環境變數，避免留在命令列歷史)")
+    query.add_argument("-o", "--output", help="匯出檔 (.csv / .jsonl / .parquet)；省略時印出表格")
+    query.add_argument("--with-records", action="store_true", help="另外匯出原始缺曠記錄與假單 (需搭配 -o)")
+    query.add_argument("--backend", choices=[scraper_core.BACKEND_AUTO, scraper_core.BACKEND_HTTP, scraper_core.BACKEND_SELENIUM],
+                       default=scraper_core.BACKEND_AUTO)
+    query.add_argument("--profile", help="學期設定檔名稱 (預設為使用中的設定檔)")
+    query.add_argument("--trend", action="store_true", help="另外印出每門課每週的節次")
+    query.add_argument("--recent-weeks", type=int, default=0, metavar="N", help="另外印出每門課最近 N 週的合計節次")
+    query.add_argument("-q", "--quiet", action="store_true", help="只顯示錯誤訊息")
+    batch_runner.add_metrics_arguments(query)
+    query.set_defaults(func=cmd_query)
+
+    args = parser.parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
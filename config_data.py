@@ -3,19 +3,48 @@
 import os
 import sys
 import json
-from typing import Dict
-from tkinter import messagebox
+from typing import Any, Dict, Optional
 
 # ===============================================
 #                【設定常數區】
 # ===============================================
 
 CONFIG_FILE = "course_factors_config.json"
+SETTINGS_FILE = "app_settings.json"
+BASE_URL = "https://std.uch.edu.tw/Std_Xerox/"
 LOGIN_URL = "https://std.uch.edu.tw/Std_Xerox/Login_Index.aspx" 
 TARGET_URL = "https://std.uch.edu.tw/Std_Xerox/Miss_ct.aspx" 
+XEROX_URL = "https://std.uch.edu.tw/Std_Xerox/Xerox.aspx"
 TABLE_ID = "ctl00_ContentPlaceHolder1_gw_absent"
 ABSENCE_TYPES = ['事假', '病假', '遲到', '曠課']
+LEAVE_STATUSES = ['事假', '病假']  # 需要假單的缺曠類別
+COVERAGE_TYPES = ['已銷假', '待銷假', '未請假']  # 請假類節次與假單的對應結果
 DEFAULT_COURSE_FACTORS: Dict[str, int] = {} 
+HTTP_TIMEOUT = 10  # HTTP 後端單次請求逾時秒數
+MAX_GRID_PAGES = 100  # GridView 分頁最多讀取的頁數 (防止分頁連結異常時無限讀取)
+PAGE_FETCH_WORKERS = 4  # HTTP 後端同時送出的分頁 postback 數量
+RETRY_ATTEMPTS = 3  # 逾時/連線錯誤/5xx 時讀取頁面的最多嘗試次數 (含第一次)
+RETRY_BASE_DELAY = 0.5  # 重試退避的基準秒數 (每次加倍，並隨機抖動)
+RETRY_MAX_DELAY = 8.0  # 單次重試等待的上限秒數
+CIRCUIT_FAILURE_THRESHOLD = 5  # 連續幾次主機錯誤後暫停送出請求
+CIRCUIT_RESET_TIMEOUT = 30.0  # 暫停多少秒後放行一個試探請求
+CIRCUIT_MAX_WAIT = 300.0  # 批次查詢遇到主機暫停時，等待主機恢復的最長秒數 (超過才判定帳號失敗)
+ADAPTIVE_INITIAL = 4  # 對學校主機同時進行的請求數 (起始值，依延遲與錯誤自動調整)
+ADAPTIVE_MIN = 1
+ADAPTIVE_MAX = 32
+ADAPTIVE_LATENCY_TARGET = 3.0  # 單一請求超過此秒數視為主機壅塞
+DRIVER_POOL_SIZE = 1  # 保留暖機的瀏覽器數量
+DRIVER_IDLE_TIMEOUT = 300  # 閒置超過此秒數的瀏覽器會被關閉
+SESSION_CACHE_TTL = 15 * 60  # 登入 Cookie 快取的存活秒數 (ASP.NET 預設工作階段逾時為 20 分鐘)
+METRICS_JSON_FILE = "run_metrics.json"  # 最近一次查詢的階段耗時報告
+METRICS_PROM_FILE = "run_metrics.prom"  # 同上，Prometheus 文字格式
+STARTUP_BUDGET_MS = 1500  # 從程式開始執行到主視窗第一次繪出的時間上限 (毫秒)
+DEFAULT_SETTINGS = {
+    "fetch_profile": "lean",  # lean: 無視窗並封鎖圖片/CSS/字型; full: 一般瀏覽器視窗
+    "startup_notice_dismissed": False,  # 使用者已關閉啟動提醒後不再顯示
+    "write_run_metrics": False,  # 每次查詢後寫出 run_metrics.json
+    "write_prometheus_metrics": False,  # 另外寫出 run_metrics.prom
+}
 
 # --- 資料持久化函數 ---
 
@@ -29,26 +58,50 @@ def get_config_filepath():
     """獲取配置檔案的完整路徑"""
     return os.path.join(get_app_path(), CONFIG_FILE)
 
-def load_factors_from_file() -> Dict[str, int]:
-    """從檔案載入課程因子，失敗則使用預設值"""
-    filepath = get_config_filepath()
+def get_settings_filepath():
+    """獲取程式設定檔的完整路徑 (與課程因子檔放在同一目錄)"""
+    return os.path.join(get_app_path(), SETTINGS_FILE)
+
+def load_settings() -> Dict[str, Any]:
+    """載入程式設定，缺少的項目以預設值補齊"""
+    settings = dict(DEFAULT_SETTINGS)
+    filepath = get_settings_filepath()
     if os.path.exists(filepath):
         try:
             with open(filepath, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-                return {str(k): int(v) for k, v in data.items()}
+                settings.update(json.load(f))
         except Exception:
-            print(f"警告：載入配置檔失敗，使用預設因子。")
-            return DEFAULT_COURSE_FACTORS
-    return DEFAULT_COURSE_FACTORS
+            print(f"警告：載入設定檔失敗，使用預設設定。")
+    return settings
 
-def save_factors_to_file(factors: Dict[str, int]):
-    """將課程因子儲存到檔案"""
-    filepath = get_config_filepath()
+def save_settings(settings: Dict[str, Any]):
+    """將程式設定儲存到檔案"""
+    filepath = get_settings_filepath()
     try:
         with open(filepath, 'w', encoding='utf-8') as f:
-            json.dump(factors, f, ensure_ascii=False, indent=4)
-        print(f"課程因子已成功儲存到: {filepath}")
+            json.dump(settings, f, ensure_ascii=False, indent=4)
+    except Exception as e:
+        print(f"設定儲存錯誤: {e}")
+
+def load_factors_from_file(profile: Optional[str] = None) -> Dict[str, int]:
+    """
+    載入課程因子 (預設為使用中的學期設定檔)
+    透過 factor_store 讀取：檔案未變動時直接使用快取，檔案不存在時使用預設值
+    """
+    import factor_store
+    return factor_store.get_default_store().load(profile)
+
+def save_factors_to_file(factors: Dict[str, int], profile: Optional[str] = None) -> str:
+    """
+    將課程因子原子寫入檔案 (預設為使用中的學期設定檔)
+    返回錯誤訊息 (成功時為空字串)；本模組不依賴 tkinter，錯誤對話框由 GUI 自行顯示
+    """
+    import factor_store
+    store = factor_store.get_default_store()
+    try:
+        store.save(factors, profile)
+        print(f"課程因子已成功儲存到: {store.filepath}")
+        return ""
     except Exception as e:
-        messagebox.showerror("儲存錯誤", f"無法儲存課程因子到檔案: {e}")
-        print(f"儲存錯誤: {e}")
\ No newline at end of file
+        print(f"儲存錯誤: {e}")
+        return f"無法儲存課程因子到檔案: {e}"
\ No newline at end of file
@@ -0,0 +1,146 @@
+# 瀏覽器驅動池：在多次查詢之間保留暖機中的 ChromeDriver，避免每次冷啟動
+# (GUI 啟動時就會匯入本模組，Selenium 只在實際檢查/關閉驅動時才匯入)
+
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, List, Optional
+
+
+class _PooledDriver:
+    __slots__ = ("driver", "account", "last_used")
+
+    def __init__(self, driver, account: Optional[str] = None):
+        self.driver = driver
+        self.account = account
+        self.last_used = time.monotonic()
+
+
+class DriverPool:
+    """
+    保留最多 max_size 個閒置的驅動
+    - 取出前先做健康檢查，失效的驅動直接丟棄並重建
+    - 換成不同帳號時清除 Cookie，避免沿用前一位使用者的登入狀態
+      (account 為呼叫端決定的鍵；scraper_core 傳入帳密指紋，密碼不符也不沿用)
+    - 閒置超過 idle_timeout 秒的驅動由背景執行緒關閉
+    """
+
+    def __init__(self, factory: Callable[[], object], max_size: int = 1, idle_timeout: float = 300):
+        self.factory = factory
+        self.max_size = max_size
+        self.idle_timeout = idle_timeout
+        self._idle: List[_PooledDriver] = []
+        self._lock = threading.Lock()
+        self._closed = False
+        self._stop = threading.Event()
+        self._reaper: Optional[threading.Thread] = None
+
+    # --- 借出與歸還 ---
+
+    def acquire(self, account: Optional[str] = None):
+        """取得一個可用的驅動 (優先沿用同帳號的閒置驅動)"""
+        if self._closed:
+            raise RuntimeError("驅動池已關閉")
+
+        while True:
+            with self._lock:
+                if not self._idle:
+                    break
+                same_account = [entry for entry in self._idle if entry.account == account]
+                entry = (same_account or self._idle)[-1]
+                self._idle.remove(entry)
+
+            if self._is_healthy(entry.driver):
+                if entry.account != account:
+                    self._reset_session(entry.driver)
+                return entry.driver
+            self._quit(entry.driver)
+
+        return self.factory()
+
+    def release(self, driver, account: Optional[str] = None):
+        """歸還驅動；池已滿或已關閉時直接關閉該驅動"""
+        with self._lock:
+            if not self._closed and len(self._idle) < self.max_size:
+                self._idle.append(_PooledDriver(driver, account))
+                self._ensure_reaper()
+                return
+        self._quit(driver)
+
+    def discard(self, driver):
+        """查詢過程發生驅動錯誤時使用，不放回池中"""
+        self._quit(driver)
+
+    @contextmanager
+    def lease(self, account: Optional[str] = None):
+        """with pool.lease(account) as driver: ...；發生例外時驅動不會被放回池中"""
+        driver = self.acquire(account)
+        try:
+            yield driver
+        except BaseException:
+            self.discard(driver)
+            raise
+        else:
+            self.release(driver, account)
+
+    # --- 維護 ---
+
+    def evict_idle(self):
+        """關閉閒置過久的驅動"""
+        deadline = time.monotonic() - self.idle_timeout
+        with self._lock:
+            expired = [entry for entry in self._idle if entry.last_used < deadline]
+            self._idle = [entry for entry in self._idle if entry.last_used >= deadline]
+        for entry in expired:
+            self._quit(entry.driver)
+
+    def close_all(self):
+        """關閉池中所有驅動 (程式結束時呼叫)"""
+        with self._lock:
+            self._closed = True
+            idle, self._idle = self._idle, []
+        self._stop.set()
+        for entry in idle:
+            self._quit(entry.driver)
+
+    def _ensure_reaper(self):
+        if self._reaper is None or not self._reaper.is_alive():
+            self._reaper = threading.Thread(target=self._reap_loop, name="DriverPoolReaper", daemon=True)
+            self._reaper.start()
+
+    def _reap_loop(self):
+        interval = max(1.0, self.idle_timeout / 4)
+        while not self._stop.wait(interval):
+            self.evict_idle()
+            with self._lock:
+                if not self._idle:
+                    self._reaper = None
+                    return
+
+    # --- 驅動檢查 ---
+
+    @staticmethod
+    def _is_healthy(driver) -> bool:
+        from selenium.common.exceptions import WebDriverException
+        try:
+            return driver.execute_script("return 1;") == 1 and bool(driver.window_handles)
+        except WebDriverException:
+            return False
+
+    @staticmethod
+    def _reset_session(driver):
+        """關閉多餘分頁並清除 Cookie"""
+        handles = driver.window_handles
+        for handle in handles[1:]:
+            driver.switch_to.window(handle)
+            driver.close()
+        driver.switch_to.window(handles[0])
+        driver.delete_all_cookies()
+
+    @staticmethod
+    def _quit(driver):
+        from selenium.common.exceptions import WebDriverException
+        try:
+            driver.quit()
+        except WebDriverException:
+            pass
@@ -0,0 +1,211 @@
+# 匯出：把統計表格列、原始缺曠記錄與假單以固定大小的區塊串流寫入 CSV / JSONL / Parquet
+#
+# 寫入時只保留一個區塊 (EXPORT_CHUNK_SIZE 列) 在記憶體中，列數再多記憶體用量也不變。
+# 格式依副檔名決定；Parquet 需要 pyarrow (未安裝時選擇 .parquet 會拋出 RuntimeError)，
+# pyarrow 載入很慢，只在實際寫 Parquet 時才匯入。
+# GUI 的【匯出】按鈕、cli 與 batch_runner 都透過這裡寫檔。
+
+import csv
+import importlib.util
+import json
+import os
+from typing import Iterable, List, Optional, Sequence, Tuple
+
+import config_data
+import table_parser
+from records import LeaveSlipRecord
+
+EXPORT_CHUNK_SIZE = 5000  # 每個區塊的列數 (Parquet 中即為一個 row group)
+
+FORMAT_CSV = "csv"
+FORMAT_JSONL = "jsonl"
+FORMAT_PARQUET = "parquet"
+FORMAT_EXTENSIONS = {".csv": FORMAT_CSV, ".jsonl": FORMAT_JSONL, ".ndjson": FORMAT_JSONL, ".parquet": FORMAT_PARQUET}
+
+SUMMARY_HEADER = ["課程名稱"] + config_data.ABSENCE_TYPES + ["總缺課數量", "總天數"] + config_data.COVERAGE_TYPES
+ABSENCE_HEADER = ["帳號", "課程名稱", "缺曠類別", "週別", "節次", "日期"]
+SLIP_HEADER = ["帳號", "假單編號", "週別", "期間", "假別", "狀態"]
+
+# export_all 寫出的三個檔案 (檔名後綴)
+SUMMARY_SUFFIX = ""
+ABSENCE_SUFFIX = "_absences"
+SLIP_SUFFIX = "_slips"
+
+
+def is_parquet_available() -> bool:
+    return importlib.util.find_spec("pyarrow") is not None
+
+
+def detect_format(filepath: str) -> str:
+    """依副檔名判斷格式，無法判斷時視為 CSV"""
+    return FORMAT_EXTENSIONS.get(os.path.splitext(filepath)[1].lower(), FORMAT_CSV)
+
+
+# ==============================================================================
+#   【各格式的區塊寫入器】
+# ==============================================================================
+
+class _CsvWriter:
+    def __init__(self, filepath: str, header: Sequence[str]):
+        # utf-8-sig 讓 Excel 正確辨識中文
+        self._file = open(filepath, 'w', encoding='utf-8-sig', newline='')
+        self._writer = csv.writer(self._file)
+        self._writer.writerow(header)
+
+    def write_chunk(self, rows: List[Sequence[str]]):
+        self._writer.writerows(rows)
+
+    def close(self):
+        self._file.close()
+
+
+class _JsonlWriter:
+    def __init__(self, filepath: str, header: Sequence[str]):
+        self._file = open(filepath, 'w', encoding='utf-8', newline='')
+        self._header = list(header)
+
+    def write_chunk(self, rows: List[Sequence[str]]):
+        self._file.write("".join(
+            json.dumps(dict(zip(self._header, row)), ensure_ascii=False) + "\n" for row in rows
+        ))
+
+    def close(self):
+        self._file.close()
+
+
+class _ParquetWriter:
+    def __init__(self, filepath: str, header: Sequence[str]):
+        try:
+            import pyarrow
+            import pyarrow.parquet
+        except ImportError:
+            raise RuntimeError("匯出 Parquet 需要安裝 pyarrow (pip install pyarrow)，或改用 .csv / .jsonl")
+        self._pa = pyarrow
+        # 所有欄位都以字串儲存，與畫面上顯示的值一致
+        self._schema = pyarrow.schema([(name, pyarrow.string()) for name in header])
+        self._writer = pyarrow.parquet.ParquetWriter(filepath, self._schema)
+        self._width = len(header)
+
+    def write_chunk(self, rows: List[Sequence[str]]):
+        pa = self._pa
+        columns = [[row[i] for row in rows] for i in range(self._width)]
+        self._writer.write_table(pa.Table.from_arrays(
+            [pa.array(column, type=pa.string()) for column in columns], schema=self._schema
+        ))
+
+    def close(self):
+        self._writer.close()
+
+
+_WRITERS = {FORMAT_CSV: _CsvWriter, FORMAT_JSONL: _JsonlWriter, FORMAT_PARQUET: _ParquetWriter}
+
+
+class TableExporter:
+    """
+    以區塊寫入一個表格檔 (可當作 with 區塊使用)
+    write()/write_many() 累積到 chunk_size 列才寫出一次；close() 寫出剩餘的列
+    """
+
+    def __init__(self, filepath: str, header: Sequence[str], fmt: Optional[str] = None, chunk_size: int = EXPORT_CHUNK_SIZE):
+        self.filepath = filepath
+        self.format = fmt or detect_format(filepath)
+        if self.format not in _WRITERS:
+            raise ValueError(f"不支援的匯出格式: {self.format}")
+        self.rows_written = 0
+        self._width = len(header)
+        self._chunk_size = max(1, chunk_size)
+        self._buffer: List[List[str]] = []
+        self._writer = _WRITERS[self.format](filepath, header)
+
+    def write(self, row: Sequence[object]):
+        # 不足的欄位補空字串，None 轉為空字串
+        cells = ["" if value is None else str(value) for value in row]
+        cells.extend([""] * (self._width - len(cells)))
+        self._buffer.append(cells[:self._width])
+        if len(self._buffer) >= self._chunk_size:
+            self.flush()
+
+    def write_many(self, rows: Iterable[Sequence[object]]):
+        for row in rows:
+            self.write(row)
+
+    def flush(self):
+        if self._buffer:
+            self._writer.write_chunk(self._buffer)
+            self.rows_written += len(self._buffer)
+            self._buffer = []
+
+    def close(self):
+        try:
+            self.flush()
+        finally:
+            self._writer.close()
+
+    def __enter__(self) -> "TableExporter":
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+# ==============================================================================
+#   【匯出函式】
+# ==============================================================================
+
+def export_rows(filepath: str, header: Sequence[str], rows: Iterable[Sequence[object]], chunk_size: int = EXPORT_CHUNK_SIZE) -> int:
+    """將任意表格列 (可為產生器) 串流寫入檔案，返回寫入列數"""
+    with TableExporter(filepath, header, chunk_size=chunk_size) as exporter:
+        exporter.write_many(rows)
+    return exporter.rows_written
+
+
+def export_summary(filepath: str, rows: Iterable[Sequence[str]], chunk_size: int = EXPORT_CHUNK_SIZE) -> int:
+    """匯出 scrape_and_calculate / format_summary_rows 的表格列"""
+    return export_rows(filepath, SUMMARY_HEADER, rows, chunk_size)
+
+
+def absence_rows(raw_data: Iterable[table_parser.AbsenceRow], account: str = "") -> Iterable[Tuple[str, ...]]:
+    for course_name, status, week, section, date in raw_data:
+        yield account, course_name, status, week.strip(), section, date
+
+
+def slip_rows(leave_slips: Iterable[LeaveSlipRecord], account: str = "") -> Iterable[Tuple[str, ...]]:
+    for slip in leave_slips:
+        yield (account,) + tuple(slip)
+
+
+def export_absences(filepath: str, raw_data: Iterable[table_parser.AbsenceRow], account: str = "", chunk_size: int = EXPORT_CHUNK_SIZE) -> int:
+    return export_rows(filepath, ABSENCE_HEADER, absence_rows(raw_data, account), chunk_size)
+
+
+def export_leave_slips(filepath: str, leave_slips: Iterable[LeaveSlipRecord], account: str = "", chunk_size: int = EXPORT_CHUNK_SIZE) -> int:
+    return export_rows(filepath, SLIP_HEADER, slip_rows(leave_slips, account), chunk_size)
+
+
+def sibling_path(filepath: str, suffix: str) -> str:
+    """summary.csv + "_absences" -> summary_absences.csv"""
+    base, ext = os.path.splitext(filepath)
+    return f"{base}{suffix}{ext}"
+
+
+def export_all(
+    filepath: str,
+    summary: Iterable[Sequence[str]],
+    raw_data: Iterable[table_parser.AbsenceRow] = (),
+    leave_slips: Iterable[LeaveSlipRecord] = (),
+    account: str = "",
+    chunk_size: int = EXPORT_CHUNK_SIZE
+) -> List[str]:
+    """
+    一次匯出一個帳號的三份資料：統計表 (filepath)、原始缺曠記錄 (*_absences)、假單 (*_slips)
+    返回寫出的檔案路徑
+    """
+    paths = [
+        sibling_path(filepath, SUMMARY_SUFFIX),
+        sibling_path(filepath, ABSENCE_SUFFIX),
+        sibling_path(filepath, SLIP_SUFFIX),
+    ]
+    export_summary(paths[0], summary, chunk_size)
+    export_absences(paths[1], raw_data, account, chunk_size)
+    export_leave_slips(paths[2], leave_slips, account, chunk_size)
+    return paths
@@ -0,0 +1,311 @@
+# 課程因子存放區：依檔案修改時間快取解析結果、以暫存檔 + 改名原子寫入、跨行程檔案鎖、
+# 每學期一組的具名設定檔，以及檔案被其他視窗/批次程式修改時的熱重載通知
+#
+# 檔案格式 (兩個檔案):
+#   course_factors_config.json           {"課程名稱": 節次, ...}  使用中設定檔的因子 (與舊版程式相同的平面格式)
+#   course_factors_config.profiles.json  {"version": 1, "active_profile": "114-1", "profiles": {其他設定檔...}}
+# 主檔維持舊格式，舊版程式 (app.py 等) 仍可讀寫；它寫入的內容視為使用中設定檔的因子，
+# 其他學期的設定檔存在附屬檔中不受影響。附屬檔的 version 比本程式新時拒絕讀寫。
+
+import json
+import os
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional, Tuple
+
+import config_data
+
+DEFAULT_PROFILE = "default"
+PROFILES_SUFFIX = ".profiles.json"
+PROFILES_VERSION = 1
+LOCK_SUFFIX = ".lock"
+LOCK_TIMEOUT = 10.0         # 取得檔案鎖的最長等待秒數
+REPLACE_RETRIES = 5         # Windows 上目標檔正被讀取時 os.replace 可能暫時失敗
+WATCH_INTERVAL = 2.0        # 背景監看檔案變動的間隔秒數
+
+FactorListener = Callable[[Dict[str, int]], None]
+
+
+# ==============================================================================
+#   【跨行程檔案鎖】
+# ==============================================================================
+
+@contextmanager
+def _file_lock(lock_path: str, timeout: float = LOCK_TIMEOUT):
+    """以作業系統的檔案鎖保護 讀取-修改-寫入，避免多個程式同時寫入互相覆蓋"""
+    with open(lock_path, "a+b") as f:
+        deadline = time.monotonic() + timeout
+        while True:
+            try:
+                _lock_fd(f)
+                break
+            except OSError:
+                if time.monotonic() > deadline:
+                    raise TimeoutError(f"等待課程因子檔案鎖逾時: {lock_path}")
+                time.sleep(0.05)
+        try:
+            yield
+        finally:
+            _unlock_fd(f)
+
+
+if os.name == "nt":
+    import msvcrt
+
+    def _lock_fd(f):
+        f.seek(0)
+        msvcrt.locking(f.fileno(), msvcrt.LK_NBLCK, 1)
+
+    def _unlock_fd(f):
+        f.seek(0)
+        msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+else:
+    import fcntl
+
+    def _lock_fd(f):
+        fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+
+    def _unlock_fd(f):
+        fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+
+def _parse_factors(data) -> Dict[str, int]:
+    return {str(k): int(v) for k, v in (data or {}).items()}
+
+
+def _check_version(sidecar):
+    """附屬檔的格式版本比本程式新 (或無法辨識) 時拋出 ValueError"""
+    version = sidecar.get("version", 0) if isinstance(sidecar, dict) else None
+    if not isinstance(version, int) or version > PROFILES_VERSION:
+        raise ValueError(f"設定檔格式版本 {version} 無法辨識或比本程式新，請更新程式")
+
+
+def _parse_documents(main, sidecar) -> Tuple[str, Dict[str, Dict[str, int]]]:
+    """
+    解析主檔與附屬檔的內容 (不存在時傳入 None)，返回 (使用中的設定檔名稱, {設定檔名稱: 因子})
+    使用中設定檔的因子一律以主檔為準
+    """
+    active, profiles = DEFAULT_PROFILE, {}
+    if sidecar is not None:
+        _check_version(sidecar)
+        active = str(sidecar.get("active_profile") or DEFAULT_PROFILE)
+        profiles = {str(name): _parse_factors(factors) for name, factors in (sidecar.get("profiles") or {}).items()}
+    profiles[active] = _parse_factors(main) if main is not None else dict(config_data.DEFAULT_COURSE_FACTORS)
+    return active, profiles
+
+
+def _read_json(filepath: str):
+    """讀取 JSON 檔，不存在時返回 None"""
+    try:
+        with open(filepath, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def _atomic_write_json(filepath: str, data):
+    """寫到同目錄的暫存檔後以 os.replace 取代原檔"""
+    directory = os.path.dirname(os.path.abspath(filepath))
+    fd, temp_path = tempfile.mkstemp(prefix=".factors-", suffix=".tmp", dir=directory)
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False, indent=4)
+            f.flush()
+            os.fsync(f.fileno())
+        for attempt in range(REPLACE_RETRIES):
+            try:
+                os.replace(temp_path, filepath)
+                break
+            except PermissionError:
+                if attempt == REPLACE_RETRIES - 1:
+                    raise
+                time.sleep(0.05 * (attempt + 1))
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+
+# ==============================================================================
+#   【因子存放區】
+# ==============================================================================
+
+class FactorStore:
+    """
+    課程因子檔的唯一讀寫入口 (可跨執行緒共用)
+    - load(): 檔案未變動時直接返回快取 (以 mtime 與大小判斷)
+    - save(): 在檔案鎖內重新讀取最新內容、只改動指定設定檔，再原子寫入
+    - poll()/start_watching(): 偵測其他程式造成的變動並通知 subscribe 的回呼
+    """
+
+    def __init__(self, filepath: Optional[str] = None):
+        self.filepath = filepath or config_data.get_config_filepath()
+        self.profiles_filepath = os.path.splitext(self.filepath)[0] + PROFILES_SUFFIX
+        self._lock = threading.RLock()
+        self._stamp: Optional[Tuple] = None
+        self._active = DEFAULT_PROFILE
+        self._profiles: Dict[str, Dict[str, int]] = {DEFAULT_PROFILE: dict(config_data.DEFAULT_COURSE_FACTORS)}
+        self._listeners: List[FactorListener] = []
+        self._watcher: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+
+    # --- 讀取 ---
+
+    @staticmethod
+    def _stat(filepath: str) -> Optional[Tuple[int, int]]:
+        try:
+            stat = os.stat(filepath)
+        except FileNotFoundError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def _file_stamp(self) -> Tuple:
+        return self._stat(self.filepath), self._stat(self.profiles_filepath)
+
+    def _refresh(self) -> bool:
+        """任一檔案有變動時重新解析，返回是否有重新載入 (呼叫端需持有 self._lock)"""
+        stamp = self._file_stamp()
+        if stamp == self._stamp:
+            return False
+        if stamp == (None, None):
+            self._active = DEFAULT_PROFILE
+            self._profiles = {DEFAULT_PROFILE: dict(config_data.DEFAULT_COURSE_FACTORS)}
+        else:
+            try:
+                self._active, self._profiles = _parse_documents(
+                    _read_json(self.filepath), _read_json(self.profiles_filepath)
+                )
+            except Exception:
+                # 保留上一次成功解析的內容；下次檔案變動時再試
+                print(f"警告：載入配置檔失敗，沿用目前的課程因子。")
+        self._stamp = stamp
+        return True
+
+    def load(self, profile: Optional[str] = None) -> Dict[str, int]:
+        """返回指定 (預設為使用中的) 設定檔的因子複本"""
+        with self._lock:
+            self._refresh()
+            return dict(self._profiles.get(profile or self._active, {}))
+
+    def profiles(self) -> List[str]:
+        with self._lock:
+            self._refresh()
+            return sorted(self._profiles)
+
+    def active_profile(self) -> str:
+        with self._lock:
+            self._refresh()
+            return self._active
+
+    # --- 寫入 ---
+
+    def _write(self, active: str, profiles: Dict[str, Dict[str, int]]):
+        """
+        先寫附屬檔 (其他設定檔)，再寫主檔 (使用中設定檔的平面因子)，兩者皆為原子寫入
+        (呼叫端需持有兩種鎖)
+        """
+        sidecar = _read_json(self.profiles_filepath)
+        if sidecar is not None:
+            _check_version(sidecar)  # 不覆寫新版程式的附屬檔
+        _atomic_write_json(self.profiles_filepath, {
+            "version": PROFILES_VERSION,
+            "active_profile": active,
+            "profiles": {name: factors for name, factors in profiles.items() if name != active},
+        })
+        _atomic_write_json(self.filepath, profiles.get(active, {}))
+        self._active, self._profiles = active, profiles
+        # 自己寫入的變動不需要再通知自己
+        self._stamp = self._file_stamp()
+
+    @contextmanager
+    def _transaction(self):
+        """在執行緒鎖與檔案鎖內，以檔案上的最新內容為基礎修改"""
+        with self._lock, _file_lock(self.filepath + LOCK_SUFFIX):
+            self._stamp = None
+            self._refresh()
+            yield
+
+    def save(self, factors: Dict[str, int], profile: Optional[str] = None):
+        """儲存一組設定檔的因子 (預設為使用中的設定檔)；失敗時拋出 OSError"""
+        with self._transaction():
+            profiles = dict(self._profiles)
+            profiles[profile or self._active] = {str(k): int(v) for k, v in factors.items()}
+            self._write(self._active, profiles)
+
+    def set_active_profile(self, profile: str, copy_from: Optional[str] = None):
+        """切換使用中的設定檔；不存在時建立 (可從 copy_from 複製因子)"""
+        with self._transaction():
+            profiles = dict(self._profiles)
+            if profile not in profiles:
+                profiles[profile] = dict(profiles.get(copy_from, {})) if copy_from else {}
+            self._write(profile, profiles)
+
+    def delete_profile(self, profile: str):
+        """刪除設定檔 (不可刪除使用中的設定檔)"""
+        with self._transaction():
+            if profile == self._active:
+                raise ValueError(f"無法刪除使用中的設定檔【{profile}】")
+            profiles = {name: factors for name, factors in self._profiles.items() if name != profile}
+            self._write(self._active, profiles)
+
+    # --- 熱重載 ---
+
+    def subscribe(self, listener: FactorListener) -> Callable[[], None]:
+        """註冊變動通知 listener(使用中設定檔的因子)，返回取消註冊的函式"""
+        with self._lock:
+            self._listeners.append(listener)
+
+        def unsubscribe():
+            with self._lock:
+                if listener in self._listeners:
+                    self._listeners.remove(listener)
+        return unsubscribe
+
+    def poll(self) -> bool:
+        """檢查檔案是否被其他程式修改，有變動就通知所有 listener；返回是否有變動"""
+        with self._lock:
+            if not self._refresh():
+                return False
+            factors = dict(self._profiles.get(self._active, {}))
+            listeners = list(self._listeners)
+        for listener in listeners:
+            listener(dict(factors))
+        return True
+
+    def start_watching(self, interval: float = WATCH_INTERVAL):
+        """在背景執行緒定期 poll (listener 會在該執行緒被呼叫)"""
+        with self._lock:
+            if self._watcher is not None:
+                return
+            self._stop.clear()
+            self._watcher = threading.Thread(target=self._watch_loop, args=(interval,), name="FactorWatcher", daemon=True)
+            self._watcher.start()
+
+    def _watch_loop(self, interval: float):
+        while not self._stop.wait(interval):
+            try:
+                self.poll()
+            except Exception as e:
+                print(f"課程因子監看錯誤: {e}")
+
+    def stop_watching(self):
+        self._stop.set()
+        with self._lock:
+            watcher, self._watcher = self._watcher, None
+        if watcher is not None:
+            watcher.join(timeout=1)
+
+
+_default_store: Optional[FactorStore] = None
+_default_store_lock = threading.Lock()
+
+
+def get_default_store() -> FactorStore:
+    """程式共用的因子存放區 (course_factors_config.json)"""
+    global _default_store
+    with _default_store_lock:
+        if _default_store is None:
+            _default_store = FactorStore()
+        return _default_store
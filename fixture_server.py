@@ -0,0 +1,203 @@
+# 本機替身伺服器：以擷取下來的頁面模擬學務系統，供 HTTP 後端離線測試
+#
+# 用法: python fixture_server.py [port] [每頁列數]
+# 之後把 http_backend.fetch_records 的 base_url 指向 http://127.0.0.1:<port>/Std_Xerox/
+# 指定每頁列數時，兩個表格會像 GridView 一樣分頁 (分頁列以 __doPostBack 切換，每頁有自己的 __VIEWSTATE)
+
+import os
+import sys
+import threading
+from html import escape
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlparse
+
+import config_data
+import table_parser
+
+FIXTURE_PASSWORD = "password"  # 替身伺服器只接受這組密碼
+SESSION_COOKIE = "ASP.NET_SessionId=fixture-session"
+MISS_FIXTURE = "缺曠課回傳資料.txt"
+XEROX_FIXTURE = "列印假單回傳資料.txt"
+VIEWSTATE = "fixture-viewstate"
+EVENTVALIDATION = "fixture-eventvalidation"
+GRID_UNIQUE_ID = "ctl00$ContentPlaceHolder1$gw_absent"  # 表格的 __EVENTTARGET
+PAGE_BUTTON_COUNT = 10  # 分頁列一次顯示的頁碼數 (同 GridView 預設的 PageButtonCount)
+TERM_FIELD = "ctl00$ContentPlaceHolder1$ddl_term"  # 分頁頁面上的學期下拉選單，postback 必須帶回選取值
+TERM_OPTIONS = ("1132", "1141")
+TERM_SELECTED = "1141"
+
+LOGIN_FORM = f"""<html><body>
+<form method="post" action="./Login_Index.aspx" id="form1">
+<input type="hidden" name="__VIEWSTATE" id="__VIEWSTATE" value="{VIEWSTATE}" />
+<input type="hidden" name="__EVENTVALIDATION" id="__EVENTVALIDATION" value="{EVENTVALIDATION}" />
+<input name="account" type="text" id="account" />
+<input name="account_pass" type="password" id="account_pass" />
+<input type="submit" name="SignIn" value="登入" id="SignIn" />
+</form></body></html>"""
+
+
+def load_fixture(filename: str) -> str:
+    """讀取擷取的表格 HTML 並包成完整頁面"""
+    path = os.path.join(config_data.get_app_path(), filename)
+    with open(path, 'r', encoding='utf-8') as f:
+        table_html = f.read()
+    return f'<html><body><form method="post" id="aspnetForm">{table_html}</form></body></html>'
+
+
+def _pager_links(current: int, page_count: int) -> List[Tuple[int, str]]:
+    """GridView Numeric 模式的分頁列 [(頁碼, 文字)]：目前這組的頁碼，前後組以 "..." 連到相鄰組的頁碼"""
+    group_start = (current - 1) // PAGE_BUTTON_COUNT * PAGE_BUTTON_COUNT + 1
+    group_end = min(group_start + PAGE_BUTTON_COUNT - 1, page_count)
+    links = [(number, str(number)) for number in range(group_start, group_end + 1)]
+    if group_start > 1:
+        links.insert(0, (group_start - 1, "..."))
+    if group_end < page_count:
+        links.append((group_end + 1, "..."))
+    return links
+
+
+def _term_select() -> str:
+    options = []
+    for term in TERM_OPTIONS:
+        selected = ' selected="selected"' if term == TERM_SELECTED else ""
+        options.append(f'<option value="{term}"{selected}>{term}</option>')
+    return f'<select name="{TERM_FIELD}">{"".join(options)}</select>'
+
+
+def paginate_fixture(filename: str, page_size: int) -> List[str]:
+    """把擷取的表格切成 GridView 分頁，返回每一頁的完整 HTML (第 n 頁的 __VIEWSTATE 為 VIEWSTATE-pn)"""
+    headers, rows = table_parser.parse_table(load_fixture(filename))
+    chunks = [rows[i:i + page_size] for i in range(0, len(rows), page_size)] or [[]]
+    target = GRID_UNIQUE_ID
+    pages = []
+    for number, chunk in enumerate(chunks, start=1):
+        cells = []
+        for link, text in _pager_links(number, len(chunks)):
+            if link == number:
+                cells.append(f"<td><span>{link}</span></td>")
+            else:
+                cells.append(f"<td><a href=\"javascript:__doPostBack(&#39;{target}&#39;,&#39;Page${link}&#39;)\">{text}</a></td>")
+        parts = [
+            f'<input type="hidden" name="__VIEWSTATE" id="__VIEWSTATE" value="{VIEWSTATE}-p{number}" />',
+            f'<input type="hidden" name="__EVENTVALIDATION" id="__EVENTVALIDATION" value="{EVENTVALIDATION}" />',
+            '<input type="submit" name="ctl00$ContentPlaceHolder1$btnQuery" value="查詢" />',
+            _term_select(),
+            f'<table id="{config_data.TABLE_ID}">',
+            "<tr>" + "".join(f"<th>{escape(h)}</th>" for h in headers) + "</tr>",
+        ]
+        parts += ["<tr>" + "".join(f"<td>{escape(c)}</td>" for c in row) + "</tr>" for row in chunk]
+        if len(chunks) > 1:
+            parts.append(f'<tr class="pager"><td colspan="{len(headers)}"><table><tr>{"".join(cells)}</tr></table></td></tr>')
+        parts.append("</table>")
+        pages.append(f'<html><body><form method="post" id="aspnetForm">{"".join(parts)}</form></body></html>')
+    return pages
+
+
+class FixtureHandler(BaseHTTPRequestHandler):
+    pages = {}
+    paged: Dict[str, List[str]] = {}  # 分頁模式下每個頁面的各頁 HTML
+
+    def log_message(self, format, *args):
+        pass  # 保持終端機安靜
+
+    def _send(self, status: int, body: str = "", headers=None):
+        data = body.encode('utf-8')
+        self.send_response(status)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(data)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _logged_in(self) -> bool:
+        return SESSION_COOKIE in (self.headers.get("Cookie") or "")
+
+    def _redirect(self, page: str, headers=None):
+        headers = dict(headers or {})
+        headers["Location"] = f"/Std_Xerox/{page}"
+        self._send(302, headers=headers)
+
+    def do_GET(self):
+        page = urlparse(self.path).path.rsplit("/", 1)[-1]
+        if page == "Login_Index.aspx":
+            self._send(200, LOGIN_FORM)
+        elif page in self.pages:
+            if self._logged_in():
+                self._send(200, self.paged[page][0] if page in self.paged else self.pages[page])
+            else:
+                self._redirect("Login_Index.aspx")
+        elif page == "Default.aspx" and self._logged_in():
+            self._send(200, "<html><body>登入成功</body></html>")
+        else:
+            self._send(404, "not found")
+
+    def do_POST(self):
+        page = urlparse(self.path).path.rsplit("/", 1)[-1]
+        length = int(self.headers.get("Content-Length") or 0)
+        form = {k: v[0] for k, v in parse_qs(self.rfile.read(length).decode('utf-8')).items()}
+        if page in self.paged:
+            self._page_postback(page, form)
+        elif page != "Login_Index.aspx":
+            self._send(404, "not found")
+        elif (form.get("__VIEWSTATE") == VIEWSTATE
+              and form.get("__EVENTVALIDATION") == EVENTVALIDATION
+              and form.get("account")
+              and form.get("account_pass") == FIXTURE_PASSWORD
+              and "SignIn" in form):
+            self._redirect("Default.aspx", {"Set-Cookie": f"{SESSION_COOKIE}; path=/"})
+        else:
+            self._send(200, LOGIN_FORM)
+
+
+    def _page_postback(self, page: str, form: Dict[str, str]):
+        """分頁 postback：只接受來源頁 (依 __VIEWSTATE) 分頁列上出現過的頁碼，模擬 ASP.NET 的事件驗證"""
+        if not self._logged_in():
+            self._redirect("Login_Index.aspx")
+            return
+        pages = self.paged[page]
+        viewstate = form.get("__VIEWSTATE", "")
+        argument = form.get("__EVENTARGUMENT", "")
+        source = viewstate.rsplit("-p", 1)[-1]
+        target = argument[len(table_parser.PAGER_ARGUMENT_PREFIX):]
+        if (not viewstate.startswith(VIEWSTATE) or not source.isdigit() or not target.isdigit()
+                or form.get("__EVENTTARGET") != GRID_UNIQUE_ID
+                or form.get(TERM_FIELD) != TERM_SELECTED
+                or any(name.endswith("btnQuery") for name in form)
+                or int(target) not in dict(_pager_links(int(source), len(pages)))):
+            self._send(500, "Invalid postback or callback argument.")
+            return
+        self._send(200, pages[int(target) - 1])
+
+
+def make_server(port: int = 0, page_size: Optional[int] = None) -> ThreadingHTTPServer:
+    """
+    建立替身伺服器 (port=0 代表自動選擇空閒埠)，呼叫端負責 serve_forever/shutdown
+    page_size: 指定時兩個表格以每頁 page_size 列分頁
+    """
+    FixtureHandler.pages = {
+        "Miss_ct.aspx": load_fixture(MISS_FIXTURE),
+        "Xerox.aspx": load_fixture(XEROX_FIXTURE),
+    }
+    FixtureHandler.paged = {}
+    if page_size:
+        FixtureHandler.paged = {
+            "Miss_ct.aspx": paginate_fixture(MISS_FIXTURE, page_size),
+            "Xerox.aspx": paginate_fixture(XEROX_FIXTURE, page_size),
+        }
+    return ThreadingHTTPServer(("127.0.0.1", port), FixtureHandler)
+
+
+def start_in_thread(port: int = 0, page_size: Optional[int] = None):
+    """在背景執行緒啟動替身伺服器，返回 (server, base_url)"""
+    server = make_server(port, page_size)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_address[1]}/Std_Xerox/"
+    return server, base_url
+
+
+if __name__ == "__main__":
+    server = make_server(int(sys.argv[1]) if len(sys.argv) > 1 else 8000, int(sys.argv[2]) if len(sys.argv) > 2 else None)
+    print(f"替身伺服器運行中: http://127.0.0.1:{server.server_address[1]}/Std_Xerox/")
+    server.serve_forever()
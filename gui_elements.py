@@ -2,11 +2,161 @@
 
 import tkinter as tk
 from tkinter import ttk, messagebox, simpledialog
-from typing import Dict
+from typing import Callable, Dict, Hashable, Iterable, Iterator, List, Optional, Sequence
 
 # 引入配置與數據模組
 import config_data 
 
+TREE_CHUNK_SIZE = 200  # 每次 after() 回呼最多執行的 Treeview 操作數
+
+# --- 以鍵值增量更新的 Treeview ---
+
+class KeyedTreeview:
+    """
+    以每列的鍵 (預設為第一欄) 作為 Treeview 的 iid，只對有變動的列呼叫 Tk:
+    apply(rows) 比對目前內容後只做必要的 刪除 / 更新 / 插入 / 移動；
+    操作數超過 chunk_size 時，分批以 after() 排程執行，介面不會凍結
+    """
+
+    def __init__(
+        self,
+        tree: ttk.Treeview,
+        key: Callable[[Sequence], Hashable] = lambda row: row[0],
+        chunk_size: int = TREE_CHUNK_SIZE
+    ):
+        self.tree = tree
+        self.key = key
+        self.chunk_size = chunk_size
+        self._values: Dict[str, tuple] = {}      # iid -> 目前顯示的值
+        self._target: List[Sequence] = []        # 分批中的 apply 目標
+        self._pending: Optional[Iterator[None]] = None
+        self._after_id = None
+        self._on_done: Optional[Callable[[], None]] = None
+
+    def _iid(self, row) -> str:
+        return str(self.key(row))
+
+    @staticmethod
+    def _normalize(row) -> tuple:
+        return tuple("" if value is None else str(value) for value in row)
+
+    # --- 單列操作 (立即執行) ---
+
+    def upsert(self, row, index: Optional[int] = None):
+        """新增或更新一列；指定 index 時一併移到該位置"""
+        iid, values = self._iid(row), self._normalize(row)
+        if iid in self._values:
+            if self._values[iid] != values:
+                self.tree.item(iid, values=values)
+                self._values[iid] = values
+            if index is not None and self.tree.index(iid) != index:
+                self.tree.move(iid, '', index)
+        else:
+            self.tree.insert('', 'end' if index is None else index, iid=iid, values=values)
+            self._values[iid] = values
+        self._restart()
+
+    def delete(self, keys: Iterable[Hashable]):
+        self._delete([str(key) for key in keys])
+        self._restart()
+
+    def _delete(self, iids: List[str]):
+        iids = [iid for iid in iids if iid in self._values]
+        if iids:
+            self.tree.delete(*iids)
+            for iid in iids:
+                del self._values[iid]
+
+    def clear(self):
+        """清空 (一次 Tk 呼叫)，並取消尚未完成的分批更新"""
+        self.cancel()
+        children = self.tree.get_children()
+        if children:
+            self.tree.delete(*children)
+        self._values.clear()
+
+    # --- 整批比對 ---
+
+    def apply(self, rows: Iterable[Sequence], on_done: Optional[Callable[[], None]] = None):
+        """
+        讓 Treeview 內容與 rows (依此順序) 一致
+        前一次尚未完成的 apply 會被取消，從目前的實際內容重新比對
+        """
+        self.cancel()
+        self._target = list(rows)
+        self._pending = self._diff(self._target)
+        self._on_done = on_done
+        self._run_chunk()
+
+    def cancel(self):
+        if self._after_id is not None:
+            self.tree.after_cancel(self._after_id)
+            self._after_id = None
+        if self._pending is not None:
+            self._pending.close()
+            self._pending = None
+        self._target = []
+        self._on_done = None
+
+    def _restart(self):
+        """分批更新途中有單列操作時，從目前的實際內容重新比對"""
+        if self._pending is not None:
+            self._pending.close()
+            self._pending = self._diff(self._target)
+
+    @property
+    def busy(self) -> bool:
+        return self._pending is not None
+
+    def _run_chunk(self):
+        self._after_id = None
+        pending = self._pending
+        for _ in range(self.chunk_size):
+            if next(pending, StopIteration) is StopIteration:
+                self._pending = None
+                on_done, self._on_done = self._on_done, None
+                if on_done:
+                    on_done()
+                return
+        self._after_id = self.tree.after(1, self._run_chunk)
+
+    def _diff(self, rows: List[Sequence]) -> Iterator[None]:
+        """
+        逐步產生 Tk 操作 (每個 yield 為一次呼叫)，整體為 O(n)
+        處理到第 index 列時，前 index 列已與目標一致，其後依序是尚未就位的既有列，
+        因此只需一個指標就知道第 index 個位置目前是哪一列，不必查詢或維護位置清單
+        """
+        target = [(self._iid(row), self._normalize(row)) for row in rows]
+        wanted = {iid for iid, _ in target}
+        current = self.tree.get_children()
+
+        stale = [iid for iid in current if iid not in wanted]
+        if stale:
+            self._delete(stale)
+            yield
+
+        remaining = [iid for iid in current if iid in wanted]  # 既有列，依目前順序
+        placed = set()
+        cursor = 0
+        for index, (iid, values) in enumerate(target):
+            while cursor < len(remaining) and remaining[cursor] in placed:
+                cursor += 1
+            if iid not in self._values:
+                self.tree.insert('', index, iid=iid, values=values)
+                self._values[iid] = values
+                yield
+                continue
+            if self._values[iid] != values:
+                self.tree.item(iid, values=values)
+                self._values[iid] = values
+                yield
+            if cursor < len(remaining) and remaining[cursor] == iid:
+                cursor += 1
+            else:
+                self.tree.move(iid, '', index)
+                yield
+            placed.add(iid)
+
 # --- 編輯視窗類別 ---
 
 class EditFactorsWindow(tk.Toplevel):
@@ -40,6 +190,7 @@ class EditFactorsWindow(tk.Toplevel):
         vsb.pack(side='right', fill='y')
         self.factor_tree.configure(yscrollcommand=vsb.set)
         self.factor_tree.pack(fill='both', expand=True)
+        self.factor_view = KeyedTreeview(self.factor_tree)
         
         button_frame = ttk.Frame(self, padding="10")
         button_frame.pack(fill='x')
@@ -51,11 +202,8 @@ class EditFactorsWindow(tk.Toplevel):
         ttk.Button(button_frame, text="取消", command=self.on_close).pack(side='right', padx=5)
 
     def populate_tree(self):
-        for item in self.factor_tree.get_children():
-            self.factor_tree.delete(item)
-            
-        for name, factor in sorted(self.current_factors.items()):
-            self.factor_tree.insert('', tk.END, values=(name, factor))
+        # 只更新有變動的課程，不再整個清空後重建
+        self.factor_view.apply(sorted(self.current_factors.items()))
 
     def add_factor(self):
         new_name = simpledialog.askstring("新增課程", "請輸入新的課程名稱:", parent=self)
@@ -112,7 +260,9 @@ class EditFactorsWindow(tk.Toplevel):
 
     def save_and_close(self):
         # 調用 config_data 中的儲存函數
-        config_data.save_factors_to_file(self.current_factors)
+        error = config_data.save_factors_to_file(self.current_factors)
+        if error:
+            messagebox.showerror("儲存錯誤", error, parent=self)
         self.update_callback(self.current_factors)
         self.destroy()
 
@@ -0,0 +1,418 @@
+# 免瀏覽器的 HTTP 抓取後端 (直接送出 ASP.NET 表單)
+
+from concurrent.futures import ThreadPoolExecutor
+from html.parser import HTMLParser
+from typing import Dict, List, Optional, Tuple, Union
+from urllib.parse import urljoin
+
+try:
+    import requests
+    from requests.adapters import HTTPAdapter
+except ImportError:  # 未安裝 requests 時，scraper_core 會改用 Selenium
+    requests = None
+
+import config_data
+import load_control
+import run_metrics
+import table_parser
+from records import LeaveSlipRecord
+from rate_limiter import HostRateLimiter
+from session_cache import SessionCache
+from scraper_errors import LoginFailedError, PageStructureError, SessionExpiredError
+
+LOGIN_PAGE = "Login_Index.aspx"
+MISS_PAGE = "Miss_ct.aspx"
+XEROX_PAGE = "Xerox.aspx"
+
+
+def is_available() -> bool:
+    """是否已安裝 HTTP 後端所需的 requests 套件"""
+    return requests is not None
+
+
+def is_transport_error(error: BaseException) -> bool:
+    """
+    requests 層的連線問題 (SSL、代理、連線被重設、逾時)，瀏覽器可能因網路堆疊不同而成功
+    HTTPError 代表主機已回應 (例如 503)，瀏覽器也會拿到相同回應，因此不算
+    """
+    return (requests is not None and isinstance(error, requests.RequestException)
+            and not isinstance(error, requests.HTTPError))
+
+
+# ===============================================
+#                【表單欄位解析】
+# ===============================================
+
+BUTTON_INPUT_TYPES = ("submit", "button", "image", "reset")
+CHECKABLE_INPUT_TYPES = ("checkbox", "radio")
+
+# 欄位名稱 -> 值；可複選的 <select multiple> 為值的列表
+FormFields = Dict[str, Union[str, List[str]]]
+FormItems = List[Tuple[str, str]]
+
+
+class _FormCollector(HTMLParser):
+    """
+    依瀏覽器送出表單的規則收集欄位 (含 __VIEWSTATE 等隱藏欄位):
+    - <input>: 略過 disabled 與 file；checkbox/radio 只有 checked 時送出 (未指定 value 時為 "on")
+    - <select>: 送出選取的 option (單選且沒有選取時為第一個 option)，例如學期下拉選單
+    - <textarea>: 送出其中的文字
+    """
+
+    def __init__(self, include_buttons: bool = True):
+        super().__init__()
+        self.include_buttons = include_buttons
+        self.fields: FormFields = {}
+        self._select: Optional[Tuple[str, bool]] = None  # (name, multiple)
+        self._options: List[Tuple[str, bool]] = []       # (value, selected)
+        self._option: Optional[Dict[str, Optional[str]]] = None
+        self._option_text: List[str] = []
+        self._textarea: Optional[str] = None
+        self._textarea_text: List[str] = []
+
+    def handle_starttag(self, tag, attrs):
+        attr_map = dict(attrs)
+        if tag == "option":
+            if self._select is not None:
+                self._end_option()
+                self._option = attr_map
+                self._option_text = []
+            return
+        name = attr_map.get("name")
+        if "disabled" in attr_map:
+            name = None
+        if tag == "input":
+            input_type = (attr_map.get("type") or "text").lower()
+            if not name or input_type == "file":
+                return
+            if not self.include_buttons and input_type in BUTTON_INPUT_TYPES:
+                return
+            if input_type in CHECKABLE_INPUT_TYPES:
+                if "checked" in attr_map:
+                    self.fields[name] = attr_map.get("value") or "on"
+                return
+            self.fields[name] = attr_map.get("value") or ""
+        elif tag == "select":
+            self._select = (name, "multiple" in attr_map) if name else ("", False)
+            self._options = []
+        elif tag == "textarea":
+            self._textarea = name or ""
+            self._textarea_text = []
+
+    def handle_data(self, data):
+        if self._option is not None:
+            self._option_text.append(data)
+        elif self._textarea is not None:
+            self._textarea_text.append(data)
+
+    def handle_endtag(self, tag):
+        if tag == "option":
+            self._end_option()
+        elif tag == "select" and self._select is not None:
+            self._end_option()
+            name, multiple = self._select
+            selected = [value for value, is_selected in self._options if is_selected]
+            if name and multiple:
+                if selected:
+                    self.fields[name] = selected
+            elif name and (selected or self._options):
+                self.fields[name] = selected[-1] if selected else self._options[0][0]
+            self._select = None
+        elif tag == "textarea" and self._textarea is not None:
+            if self._textarea:
+                # 瀏覽器會忽略開頭標籤後緊接的第一個換行
+                text = "".join(self._textarea_text)
+                self.fields[self._textarea] = text[1:] if text.startswith("\n") else text
+            self._textarea = None
+
+    def _end_option(self):
+        """</option> 可省略，遇到下一個 <option> 或 </select> 時也視為結束"""
+        if self._option is None:
+            return
+        value = self._option.get("value")
+        if value is None:
+            value = " ".join("".join(self._option_text).split())
+        if "disabled" not in self._option:
+            self._options.append((value, "selected" in self._option))
+        self._option = None
+
+
+def parse_form_fields(html: str, include_buttons: bool = True) -> FormFields:
+    """
+    頁面上的表單欄位
+    include_buttons=False 用於 __doPostBack：按鈕只有被按下時才會送出，帶上會觸發按鈕事件
+    """
+    collector = _FormCollector(include_buttons)
+    collector.feed(html)
+    collector.close()
+    return collector.fields
+
+
+def form_items(fields: FormFields) -> FormItems:
+    """展開成 (名稱, 值) 列表 (可複選的欄位送出多次)，requests 與 aiohttp 皆可直接當作 data"""
+    items: FormItems = []
+    for name, value in fields.items():
+        if isinstance(value, list):
+            items.extend((name, item) for item in value)
+        else:
+            items.append((name, value))
+    return items
+
+
+def login_form_fields(html: str, account: str, password: str) -> FormFields:
+    """由登入頁 HTML 組出要送出的表單 (含隱藏欄位與帳密)"""
+    fields = parse_form_fields(html)
+    for required in ("__VIEWSTATE", "account", "account_pass", "SignIn"):
+        if required not in fields:
+            raise PageStructureError(f"登入頁缺少欄位 {required}")
+    fields["account"] = account
+    fields["account_pass"] = password
+    return fields
+
+
+def postback_form_fields(page: str, html: str, event_target: str, event_argument: str) -> FormFields:
+    """模擬 __doPostBack 要送出的表單：來源頁自己的 __VIEWSTATE 等欄位 + 事件目標與參數"""
+    fields = parse_form_fields(html, include_buttons=False)
+    if "__VIEWSTATE" not in fields:
+        raise PageStructureError(f"{page} 缺少 __VIEWSTATE，無法切換分頁")
+    fields["__EVENTTARGET"] = event_target
+    fields["__EVENTARGUMENT"] = event_argument
+    return fields
+
+
+def is_login_response(url: str, text: str) -> bool:
+    """被導回登入頁 (網址或頁面上仍有密碼欄位) 代表尚未登入"""
+    return LOGIN_PAGE.lower() in url.lower() or 'name="account_pass"' in text
+
+
+PageRequests = Dict[int, Tuple[str, str, str]]  # 頁碼 -> (來源頁 HTML, __EVENTTARGET, __EVENTARGUMENT)
+
+
+def plan_grid_pages(
+    frontier: List[Tuple[int, str]],
+    known: Dict[int, str],
+    table_id: str = config_data.TABLE_ID,
+    max_pages: int = config_data.MAX_GRID_PAGES
+) -> PageRequests:
+    """
+    分頁讀取的一輪：frontier 中 (頁碼, HTML) 的分頁列上出現、但尚未讀取的頁碼與其 postback 參數
+    只有 上一頁/下一頁 的分頁列則只排下一頁；總頁數不超過 max_pages
+    """
+    wanted: PageRequests = {}
+    for number, html in frontier:
+        pager = table_parser.find_pager(html, table_id)
+        if pager is None:
+            continue
+        links = dict(pager.pages)
+        if not links and pager.next_argument:
+            links[number + 1] = pager.next_argument
+        for target_number, argument in links.items():
+            if target_number not in known and target_number not in wanted:
+                wanted[target_number] = (html, pager.event_target, argument)
+    return {number: wanted[number] for number in sorted(wanted)[:max(0, max_pages - len(known))]}
+
+
+# ===============================================
+#                【HTTP 工作階段】
+# ===============================================
+
+class HttpSession:
+    """以共用連線池的 requests.Session 走完 登入 -> Miss_ct -> Xerox 流程"""
+
+    def __init__(
+        self,
+        base_url: Optional[str] = None,
+        timeout: float = config_data.HTTP_TIMEOUT,
+        pool_size: int = 4,
+        rate_limiter: Optional[HostRateLimiter] = None,
+        metrics: Optional[run_metrics.RunMetrics] = None,
+        guard: Optional[load_control.ServerGuard] = None,
+    ):
+        if requests is None:
+            raise PageStructureError("未安裝 requests 套件，無法使用 HTTP 後端")
+        base_url = base_url or config_data.BASE_URL  # 執行時才讀取，方便指向替身伺服器
+        self.base_url = base_url if base_url.endswith("/") else base_url + "/"
+        self.timeout = timeout
+        self.rate_limiter = rate_limiter
+        self.metrics = metrics
+        self.guard = guard
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def url(self, page: str) -> str:
+        return urljoin(self.base_url, page)
+
+    def close(self):
+        self.session.close()
+
+    def _request(self, method: str, url: str, idempotent: bool = True, **kwargs):
+        """
+        所有請求的共同入口：套用速率限制與逾時，並檢查 HTTP 狀態碼
+        有 guard 時受 AIMD 名額與斷路器管制，idempotent 的請求在逾時/5xx 時以退避重試
+        """
+        if self.guard is None:
+            self._pace(url)
+            return self._send(method, url, **kwargs)
+        return self.guard.call(
+            lambda: self._send(method, url, **kwargs), idempotent, self._on_retry, before_attempt=lambda: self._pace(url)
+        )
+
+    def _on_retry(self, attempt: int, delay: float, error: BaseException):
+        if self.metrics is not None:
+            self.metrics.incr(run_metrics.RETRIES)
+        print(f"HTTP 請求失敗 ({error.__class__.__name__})，{delay:.1f} 秒後第 {attempt} 次重試")
+
+    def _pace(self, url: str):
+        if self.rate_limiter is not None:
+            self.rate_limiter.wait(url)
+
+    def _send(self, method: str, url: str, **kwargs):
+        response = self.session.request(method, url, timeout=self.timeout, **kwargs)
+        if self.metrics is not None:
+            self.metrics.incr(run_metrics.HTTP_REQUESTS)
+            self.metrics.incr(run_metrics.BYTES_FETCHED, len(response.content))
+        response.raise_for_status()
+        return response
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def login(self, account: str, password: str, set_status_callback=None):
+        """
+        取得登入頁的隱藏欄位後送出帳密，仍停留在登入頁即視為登入失敗
+        set_status_callback: 取得登入頁後送出 3/9 (登入頁的讀取時間才會計入 open_login 階段)
+        """
+        login_url = self.url(LOGIN_PAGE)
+        response = self._request("GET", login_url)
+        if set_status_callback is not None:
+            set_status_callback("3/9 帳號密碼已填寫，正在登入...")
+        # 送出帳密不是可安全重送的請求，不重試
+        response = self._request("POST", login_url, idempotent=False, data=form_items(login_form_fields(response.text, account, password)))
+
+        if self.is_login_page(response):
+            raise LoginFailedError("登入失敗，請檢查帳號密碼。")
+
+    def is_login_page(self, response) -> bool:
+        """被導回登入頁 (網址或頁面上仍有密碼欄位) 代表尚未登入"""
+        return is_login_response(response.url, response.text)
+
+    def fetch_page(self, page: str) -> str:
+        """讀取登入後的頁面 HTML"""
+        response = self._request("GET", self.url(page))
+        if self.is_login_page(response):
+            raise SessionExpiredError("登入狀態已失效，被導回登入頁。")
+        return response.text
+
+    def get_cookies(self) -> List[Dict]:
+        """匯出目前的 Cookie (供登入快取使用)"""
+        return [
+            {"name": c.name, "value": c.value, "domain": c.domain, "path": c.path, "secure": c.secure}
+            for c in self.session.cookies
+        ]
+
+    def set_cookies(self, cookies: List[Dict]):
+        for cookie in cookies:
+            self.session.cookies.set(
+                cookie["name"], cookie["value"],
+                domain=cookie.get("domain", ""), path=cookie.get("path", "/"), secure=cookie.get("secure", False)
+            )
+
+    def fetch_pages(self, pages: List[str]) -> List[str]:
+        """在同一個已登入的工作階段上並行讀取多個頁面，依傳入順序返回 HTML"""
+        if len(pages) <= 1:
+            return [self.fetch_page(page) for page in pages]
+        with ThreadPoolExecutor(max_workers=len(pages)) as pool:
+            return list(pool.map(self.fetch_page, pages))
+
+    def postback(self, page: str, source_html: str, event_target: str, event_argument: str) -> str:
+        """模擬 __doPostBack：帶著 source_html 自己的 __VIEWSTATE 等欄位送出事件，返回結果頁面"""
+        fields = postback_form_fields(page, source_html, event_target, event_argument)
+        response = self._request("POST", self.url(page), data=form_items(fields))
+        if self.is_login_page(response):
+            raise SessionExpiredError("登入狀態已失效，被導回登入頁。")
+        return response.text
+
+    def fetch_all_grid_pages(
+        self,
+        page: str,
+        first_html: str,
+        table_id: str = config_data.TABLE_ID,
+        max_pages: int = config_data.MAX_GRID_PAGES,
+        workers: int = config_data.PAGE_FETCH_WORKERS,
+    ) -> List[str]:
+        """
+        讀取 GridView 的每一頁，依頁碼順序返回 HTML (第一頁為 first_html)
+        每一輪把目前已知頁面上出現、但尚未讀取的頁碼同時送出 postback (各自帶著來源頁的 __VIEWSTATE)；
+        "..." 連結指向的頁面讀回後會再露出下一組頁碼。只有 上一頁/下一頁 的分頁列則逐頁往下讀。
+        """
+        htmls: Dict[int, str] = {1: first_html}
+        frontier: List[Tuple[int, str]] = [(1, first_html)]
+        with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+            while frontier:
+                wanted = plan_grid_pages(frontier, htmls, table_id, max_pages)
+                results = pool.map(lambda n: self.postback(page, *wanted[n]), wanted)
+                frontier = list(zip(wanted, results))
+                htmls.update(frontier)
+        return [htmls[number] for number in sorted(htmls)]
+
+
+def fetch_records(
+    account: str,
+    password: str,
+    set_status_callback,
+    base_url: Optional[str] = None,
+    cache: Optional[SessionCache] = None,
+    rate_limiter: Optional[HostRateLimiter] = None,
+    absence_stage: Optional[table_parser.AbsenceStage] = None,
+    metrics: Optional[run_metrics.RunMetrics] = None,
+    guard: Optional[load_control.ServerGuard] = None,
+) -> Tuple[List[table_parser.AbsenceRow], List[LeaveSlipRecord]]:
+    """
+    以 HTTP 後端抓取缺曠課與假單資料
+    返回 (raw_data, leave_slips)，格式與 Selenium 後端相同
+    cache: 登入 Cookie 快取；命中時直接讀取資料頁，失效才重新登入
+    rate_limiter: 多帳號共用的主機速率限制
+    absence_stage: 缺曠記錄解析後立即經過的產生器階段
+    metrics: 記錄請求次數與下載位元組數
+    guard: 主機負載控制 (AIMD 名額、重試、斷路器)
+    """
+    with HttpSession(base_url, rate_limiter=rate_limiter, metrics=metrics, guard=guard) as http:
+        pages = None
+        cookies = cache.load(account, password) if cache else None
+        if cookies:
+            set_status_callback("2/9 使用快取的登入狀態，直接讀取資料頁面...")
+            http.set_cookies(cookies)
+            try:
+                pages = http.fetch_pages([MISS_PAGE, XEROX_PAGE])
+            except SessionExpiredError:
+                set_status_callback("⚠️ 快取的登入狀態已過期，改為重新登入...")
+                cache.invalidate(account)
+                http.session.cookies.clear()
+
+        if pages is None:
+            set_status_callback(f"2/9 正在以 HTTP 訪問登入頁面: {http.url(LOGIN_PAGE)}")
+            http.login(account, password, set_status_callback)
+            if cache:
+                cache.save(account, password, http.get_cookies())
+
+            # 登入後兩個頁面互不相依，同時送出請求
+            set_status_callback("4/9 登入成功，正在同時讀取缺曠記錄與假單列印頁面...")
+            pages = http.fetch_pages([MISS_PAGE, XEROX_PAGE])
+        miss_html, xerox_html = pages
+
+        set_status_callback("5/9 正在抓取缺曠課表格數據...")
+        miss_pages = http.fetch_all_grid_pages(MISS_PAGE, miss_html)
+        if len(miss_pages) > 1:
+            set_status_callback(f"缺曠記錄共 {len(miss_pages)} 頁，已全部讀取。")
+        raw_data = table_parser.extract_absence_pages(miss_pages, absence_stage)
+
+        set_status_callback(f"6/9 已取得假單列印頁面: {http.url(XEROX_PAGE)}")
+        set_status_callback("7/9 正在抓取假單表格數據...")
+        leave_slips = table_parser.extract_leave_slip_pages(http.fetch_all_grid_pages(XEROX_PAGE, xerox_html))
+
+    return raw_data, leave_slips
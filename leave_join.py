@@ -0,0 +1,109 @@
+# 假單與缺曠記錄的對應：以假單期間建立區間索引，每個缺曠日期以二分搜尋找出涵蓋它的假單
+#
+# 只有請假類的缺曠 (config_data.LEAVE_STATUSES，例如事假、病假) 需要假單；
+# 遲到、曠課不列入 已銷假 / 待銷假 / 未請假 的統計。
+
+from bisect import bisect_right
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import config_data
+import table_parser
+from records import LeaveSlipRecord
+from timeline import roc_date_key
+
+# 每門課的對應結果: [已銷假, 待銷假, 未請假]
+COVERED, PENDING, UNCOVERED = range(3)
+COMPLETED_STATUS = "銷假完成"  # 假單狀態中代表已完成銷假的文字
+PERIOD_SEPARATOR = "-"
+
+
+def parse_period(period: str) -> Optional[Tuple[int, int]]:
+    """假單期間 "114/11/16 - 114/11/22" -> (起, 迄)，格式不符返回 None"""
+    start, sep, end = period.partition(PERIOD_SEPARATOR)
+    if not sep:
+        key = roc_date_key(period)
+        return (key, key) if key is not None else None
+    start_key, end_key = roc_date_key(start), roc_date_key(end)
+    if start_key is None or end_key is None:
+        return None
+    return (start_key, end_key) if start_key <= end_key else (end_key, start_key)
+
+
+def is_completed(slip: LeaveSlipRecord) -> bool:
+    return COMPLETED_STATUS in slip.status and "尚未" not in slip.status
+
+
+class SlipIndex:
+    """
+    依起日排序的假單區間索引；find(日期) 為 O(log n)
+    區間重疊時，優先返回起日最晚且涵蓋該日的假單，否則返回結束最晚的涵蓋假單
+    """
+
+    def __init__(self, slips: Iterable[LeaveSlipRecord]):
+        intervals = []
+        for slip in slips:
+            period = parse_period(slip.period)
+            if period is not None:
+                intervals.append((period[0], period[1], slip))
+        intervals.sort(key=lambda item: (item[0], item[1]))
+
+        self._starts = [start for start, _, _ in intervals]
+        self._ends = [end for _, end, _ in intervals]
+        self._slips = [slip for _, _, slip in intervals]
+        # 前綴中結束日最晚的假單 (處理重疊區間)
+        self._reach: List[int] = []
+        best = -1
+        for i, end in enumerate(self._ends):
+            if best < 0 or end > self._ends[best]:
+                best = i
+            self._reach.append(best)
+
+    def __len__(self) -> int:
+        return len(self._slips)
+
+    def find_key(self, date_key: int) -> Optional[LeaveSlipRecord]:
+        i = bisect_right(self._starts, date_key) - 1
+        if i < 0:
+            return None
+        if self._ends[i] >= date_key:
+            return self._slips[i]
+        best = self._reach[i]
+        return self._slips[best] if self._ends[best] >= date_key else None
+
+    def find(self, date: str) -> Optional[LeaveSlipRecord]:
+        key = roc_date_key(date)
+        return None if key is None else self.find_key(key)
+
+
+def join_absences(
+    raw_data: Iterable[table_parser.AbsenceRow],
+    slips: Iterable[LeaveSlipRecord]
+) -> List[Tuple[table_parser.AbsenceRow, Optional[LeaveSlipRecord]]]:
+    """每筆缺曠記錄對應涵蓋其日期的假單 (沒有則為 None)"""
+    index = SlipIndex(slips)
+    by_date: Dict[str, Optional[LeaveSlipRecord]] = {}
+    joined = []
+    for row in raw_data:
+        date = row[4]
+        if date not in by_date:
+            by_date[date] = index.find(date)
+        joined.append((row, by_date[date]))
+    return joined
+
+
+def coverage_counts(
+    raw_data: Iterable[table_parser.AbsenceRow],
+    slips: Iterable[LeaveSlipRecord]
+) -> Dict[str, List[int]]:
+    """統計每門課請假類節次的 [已銷假, 待銷假, 未請假]"""
+    leave_statuses = set(config_data.LEAVE_STATUSES)
+    counts: Dict[str, List[int]] = {}
+    for row, slip in join_absences((row for row in raw_data if row[1] in leave_statuses), slips):
+        course_counts = counts.setdefault(row[0], [0, 0, 0])
+        if slip is None:
+            course_counts[UNCOVERED] += 1
+        elif is_completed(slip):
+            course_counts[COVERED] += 1
+        else:
+            course_counts[PENDING] += 1
+    return counts
@@ -0,0 +1,401 @@
+# 對學校主機的負載控制：依延遲與錯誤率以 AIMD 調整同時請求數、可重試的讀取以抖動退避重試、
+# 主機明顯停擺時以斷路器快速失敗
+#
+# - AimdController: 回應快且成功時每輪 (約 limit 次成功) 上限 +1；逾時、5xx 或延遲超過目標時上限減半
+# - RetryPolicy: 只重試逾時、連線錯誤與 429/5xx；間隔為 full jitter 指數退避
+# - CircuitBreaker: 連續 failure_threshold 次主機錯誤後開啟，reset_timeout 秒後放行一個試探請求
+# ServerGuard 把三者組合起來，同時提供執行緒 (call) 與 asyncio (acall) 兩種用法；
+# 批次查詢的所有帳號共用同一個 ServerGuard，且斷路器開啟時等待主機恢復 (wait_when_open)，
+# 短暫的停擺不會讓排隊中的帳號全部失敗；單次查詢 (GUI) 則立即回報錯誤。
+
+import asyncio
+import random
+import threading
+import time
+from collections import deque
+from contextlib import asynccontextmanager, contextmanager
+from typing import Awaitable, Callable, Deque, Iterator, Optional, TypeVar
+
+import config_data
+from scraper_errors import ScraperError
+
+T = TypeVar("T")
+
+RETRYABLE_STATUS = (429, 500, 502, 503, 504)
+# 可重試的例外 (以類別全名比對，避免為了判斷而匯入 requests / aiohttp / selenium)
+RETRYABLE_EXCEPTIONS = {
+    "builtins.TimeoutError",
+    "builtins.ConnectionError",
+    "asyncio.exceptions.TimeoutError",
+    "requests.exceptions.Timeout",
+    "requests.exceptions.ConnectionError",
+    "aiohttp.client_exceptions.ClientConnectionError",
+    "aiohttp.client_exceptions.ServerTimeoutError",
+    "selenium.common.exceptions.TimeoutException",
+}
+
+
+class ServerUnavailableError(ScraperError):
+    """斷路器開啟中：學校主機近期連續逾時或回應錯誤，暫停送出請求"""
+
+
+def is_retryable(error: BaseException) -> bool:
+    """逾時、連線錯誤、429 與 5xx 視為主機端的暫時性錯誤；帳密錯誤、頁面結構錯誤等則否"""
+    names = {f"{cls.__module__}.{cls.__name__}" for cls in type(error).__mro__}
+    if names & RETRYABLE_EXCEPTIONS:
+        return True
+    status = getattr(error, "status", None)  # aiohttp.ClientResponseError
+    response = getattr(error, "response", None)  # requests.HTTPError
+    if status is None and response is not None:
+        status = getattr(response, "status_code", None)
+    return status in RETRYABLE_STATUS
+
+
+# ==============================================================================
+#   【AIMD 同時請求數】
+# ==============================================================================
+
+class AimdController:
+    """
+    以 AIMD 決定同時進行的請求數上限 (可跨執行緒共用)
+    減半後，在減半之前就已送出的請求所回報的壞消息不再重複減半 (同一波壅塞只反應一次)
+    """
+
+    def __init__(
+        self,
+        initial: int = config_data.ADAPTIVE_INITIAL,
+        minimum: int = config_data.ADAPTIVE_MIN,
+        maximum: int = config_data.ADAPTIVE_MAX,
+        latency_target: float = config_data.ADAPTIVE_LATENCY_TARGET,
+        decrease_factor: float = 0.5,
+    ):
+        self.minimum = max(1, minimum)
+        self.maximum = max(self.minimum, maximum)
+        self.latency_target = latency_target
+        self.decrease_factor = decrease_factor
+        self._limit = float(min(max(initial, self.minimum), self.maximum))
+        self._last_decrease = 0.0
+        self._in_flight = 0
+        self._lock = threading.Condition()
+        # 等待名額的協程 (依到達順序)；名額釋出或上限提高時才喚醒，不輪詢
+        self._async_waiters: Deque[asyncio.Future] = deque()
+
+    @property
+    def limit(self) -> int:
+        return int(self._limit)
+
+    @property
+    def in_flight(self) -> int:
+        return self._in_flight
+
+    def record(self, started_at: float, latency: float, ok: bool):
+        """回報一個請求的結果；started_at 為送出時的 time.monotonic()"""
+        with self._lock:
+            if ok and latency <= self.latency_target:
+                # 每次成功 +1/limit，約一輪 (limit 個請求) 後上限 +1
+                self._limit = min(self.maximum, self._limit + 1.0 / self._limit)
+            elif started_at >= self._last_decrease:
+                self._limit = max(self.minimum, self._limit * self.decrease_factor)
+                self._last_decrease = time.monotonic()
+            self._lock.notify_all()
+            self._wake_async_waiters()
+
+    # --- 執行緒 ---
+
+    @contextmanager
+    def slot(self) -> Iterator[float]:
+        """取得一個請求名額 (超過上限時阻塞)，返回送出時間"""
+        with self._lock:
+            self._lock.wait_for(lambda: self._in_flight < self.limit)
+            self._in_flight += 1
+        try:
+            yield time.monotonic()
+        finally:
+            with self._lock:
+                self._in_flight -= 1
+                self._lock.notify_all()
+
+    # --- asyncio (等待時不佔用事件迴圈) ---
+
+    @asynccontextmanager
+    async def async_slot(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            with self._lock:
+                if self._in_flight < self.limit:
+                    self._in_flight += 1
+                    break
+                waiter = loop.create_future()
+                self._async_waiters.append(waiter)
+            try:
+                await waiter
+            except asyncio.CancelledError:
+                with self._lock:
+                    if waiter in self._async_waiters:
+                        self._async_waiters.remove(waiter)
+                    else:
+                        # 已被喚醒卻取消：把名額讓給下一個等待者
+                        self._wake_async_waiters()
+                raise
+        try:
+            yield time.monotonic()
+        finally:
+            with self._lock:
+                self._in_flight -= 1
+                self._lock.notify_all()
+                self._wake_async_waiters()
+
+    def _wake_async_waiters(self):
+        """依空出的名額數喚醒等待中的協程 (需持有 _lock；可從任何執行緒呼叫)"""
+        free = self.limit - self._in_flight
+        while free > 0 and self._async_waiters:
+            waiter = self._async_waiters.popleft()
+            waiter.get_loop().call_soon_threadsafe(_resolve_waiter, waiter)
+            free -= 1
+
+
+def _resolve_waiter(waiter: asyncio.Future):
+    if not waiter.done():
+        waiter.set_result(None)
+
+
+# ==============================================================================
+#   【重試與斷路器】
+# ==============================================================================
+
+class RetryPolicy:
+    """最多 attempts 次 (含第一次)；第 n 次重試前等待 uniform(0, min(max_delay, base_delay * 2^n)) 秒"""
+
+    def __init__(
+        self,
+        attempts: int = config_data.RETRY_ATTEMPTS,
+        base_delay: float = config_data.RETRY_BASE_DELAY,
+        max_delay: float = config_data.RETRY_MAX_DELAY,
+        rng: Optional[random.Random] = None,
+    ):
+        self.attempts = max(1, attempts)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self._rng = rng or random.Random()
+
+    def delay(self, retry: int) -> float:
+        return self._rng.uniform(0, min(self.max_delay, self.base_delay * (2 ** retry)))
+
+
+class CircuitBreaker:
+    """
+    closed: 正常放行；連續 failure_threshold 次主機錯誤 -> open
+    open: 不放行；reset_timeout 秒後 -> half_open
+    half_open: 只放行一個試探請求，成功 -> closed，失敗 -> open
+    """
+
+    CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+    PROBE_POLL_INTERVAL = 0.5  # 試探請求進行中時，其他請求重新檢查的間隔秒數
+
+    def __init__(
+        self,
+        failure_threshold: int = config_data.CIRCUIT_FAILURE_THRESHOLD,
+        reset_timeout: float = config_data.CIRCUIT_RESET_TIMEOUT,
+    ):
+        self.failure_threshold = max(1, failure_threshold)
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probing = False
+        self._lock = threading.Lock()
+
+    def admit(self) -> Optional[float]:
+        """放行時返回 None；否則返回建議等待的秒數 (不放行)"""
+        with self._lock:
+            if self.state == self.OPEN and time.monotonic() - self._opened_at >= self.reset_timeout:
+                self.state = self.HALF_OPEN
+                self._probing = False
+            if self.state == self.CLOSED:
+                return None
+            if self.state == self.HALF_OPEN:
+                if not self._probing:
+                    self._probing = True
+                    return None
+                return self.PROBE_POLL_INTERVAL
+            return max(0.0, self.reset_timeout - (time.monotonic() - self._opened_at))
+
+    def before_request(self):
+        """送出請求前呼叫；斷路器開啟中時拋出 ServerUnavailableError"""
+        delay = self.admit()
+        if delay is not None:
+            raise self.unavailable(delay)
+
+    @staticmethod
+    def unavailable(delay: float) -> ServerUnavailableError:
+        return ServerUnavailableError(f"學校主機連續回應逾時或錯誤，暫停查詢 (約 {max(1.0, delay):.0f} 秒後再試)")
+
+    def record_success(self):
+        with self._lock:
+            self.state = self.CLOSED
+            self._failures = 0
+            self._probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self.state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                self.state = self.OPEN
+                self._opened_at = time.monotonic()
+                self._probing = False
+
+    def release_probe(self):
+        """試探請求以非主機錯誤結束 (例如帳密錯誤) 時，讓下一個請求繼續試探"""
+        with self._lock:
+            self._probing = False
+
+
+# ==============================================================================
+#   【組合】
+# ==============================================================================
+
+RetryListener = Callable[[int, float, BaseException], None]  # (第幾次重試, 等待秒數, 錯誤)
+
+
+class ServerGuard:
+    """
+    對同一台主機的所有請求共用：AIMD 名額 + 斷路器 + 重試
+    wait_when_open: 斷路器開啟時最多等待主機恢復的秒數 (批次查詢用)；0 表示立即拋出 ServerUnavailableError
+    """
+
+    def __init__(
+        self,
+        concurrency: Optional[AimdController] = None,
+        retry: Optional[RetryPolicy] = None,
+        breaker: Optional[CircuitBreaker] = None,
+        wait_when_open: float = 0.0,
+    ):
+        self.concurrency = concurrency or AimdController()
+        self.retry = retry or RetryPolicy()
+        self.breaker = breaker or CircuitBreaker()
+        self.wait_when_open = max(0.0, wait_when_open)
+
+    def _admit(self):
+        """等待斷路器放行 (最多 wait_when_open 秒)"""
+        deadline = time.monotonic() + self.wait_when_open
+        while True:
+            delay = self.breaker.admit()
+            if delay is None:
+                return
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise self.breaker.unavailable(delay)
+            time.sleep(min(delay, remaining))
+
+    async def _async_admit(self):
+        deadline = time.monotonic() + self.wait_when_open
+        while True:
+            delay = self.breaker.admit()
+            if delay is None:
+                return
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise self.breaker.unavailable(delay)
+            await asyncio.sleep(min(delay, remaining))
+
+    def _settle(self, started_at: Optional[float], error: Optional[BaseException]) -> bool:
+        """
+        回報一次嘗試的結果，返回此錯誤是否為主機端的暫時性錯誤
+        started_at 為 None 代表未佔用 AIMD 名額 (不回報延遲)
+        """
+        server_error = error is not None and is_retryable(error)
+        if started_at is not None:
+            # 帳密錯誤等與主機負載無關，只看延遲
+            self.concurrency.record(started_at, time.monotonic() - started_at, not server_error)
+        if error is None:
+            self.breaker.record_success()
+        elif server_error:
+            self.breaker.record_failure()
+        else:
+            self.breaker.release_probe()
+        return server_error
+
+    @contextmanager
+    def _no_slot(self) -> Iterator[None]:
+        yield None
+
+    def call(
+        self,
+        func: Callable[[], T],
+        idempotent: bool = True,
+        on_retry: Optional[RetryListener] = None,
+        throttle: bool = True,
+        before_attempt: Optional[Callable[[], None]] = None,
+    ) -> T:
+        """
+        在執行緒中執行 func；idempotent=False 的請求 (例如送出登入表單) 不重試
+        throttle=False 時不佔用 AIMD 名額 (例如整段瀏覽器流程，耗時本來就遠超過單一請求的延遲目標)
+        before_attempt 在每次嘗試取得名額之前呼叫 (例如速率限制的等待，不計入延遲)
+        """
+        for attempt in range(self.retry.attempts):
+            self._admit()
+            if before_attempt is not None:
+                before_attempt()
+            with (self.concurrency.slot() if throttle else self._no_slot()) as started_at:
+                try:
+                    result = func()
+                except Exception as e:
+                    retryable = self._settle(started_at, e)
+                    if not (retryable and idempotent and attempt + 1 < self.retry.attempts):
+                        raise
+                    error = e
+                else:
+                    self._settle(started_at, None)
+                    return result
+            delay = self.retry.delay(attempt)
+            if on_retry is not None:
+                on_retry(attempt + 1, delay, error)
+            time.sleep(delay)
+        raise AssertionError("unreachable")
+
+    @asynccontextmanager
+    async def _no_async_slot(self):
+        yield None
+
+    async def acall(
+        self,
+        func: Callable[[], Awaitable[T]],
+        idempotent: bool = True,
+        on_retry: Optional[RetryListener] = None,
+        throttle: bool = True,
+        before_attempt: Optional[Callable[[], Awaitable[None]]] = None,
+    ) -> T:
+        """call 的 asyncio 版本；func 與 before_attempt 每次呼叫都要返回新的 awaitable"""
+        for attempt in range(self.retry.attempts):
+            await self._async_admit()
+            if before_attempt is not None:
+                await before_attempt()
+            async with (self.concurrency.async_slot() if throttle else self._no_async_slot()) as started_at:
+                try:
+                    result = await func()
+                except Exception as e:
+                    retryable = self._settle(started_at, e)
+                    if not (retryable and idempotent and attempt + 1 < self.retry.attempts):
+                        raise
+                    error = e
+                else:
+                    self._settle(started_at, None)
+                    return result
+            delay = self.retry.delay(attempt)
+            if on_retry is not None:
+                on_retry(attempt + 1, delay, error)
+            await asyncio.sleep(delay)
+        raise AssertionError("unreachable")
+
+
+_default_guard: Optional[ServerGuard] = None
+_default_guard_lock = threading.Lock()
+
+
+def get_default_guard() -> ServerGuard:
+    """程式共用的 ServerGuard (GUI 與未指定 guard 的呼叫端)"""
+    global _default_guard
+    with _default_guard_lock:
+        if _default_guard is None:
+            _default_guard = ServerGuard()
+        return _default_guard
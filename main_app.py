@@ -1,13 +1,41 @@
 #主程式結構
 
+import time
+PROCESS_START = time.perf_counter()  # 啟動計時起點 (必須在其他匯入之前)
+
+import os
+import queue
+import sys
+import threading
 import tkinter as tk
-from tkinter import ttk, messagebox
+from tkinter import ttk, messagebox, simpledialog, filedialog
 from typing import Dict
 
 # 引入拆分後的模組
+# scraper_core 會載入 Selenium 與 requests，改在第一次查詢 (或視窗繪出後的背景預載) 時才匯入
 import config_data
+import driver_pool
+import factor_store
+import fetch_profile
 import gui_elements
-import scraper_core
+import record_store
+import run_metrics
+
+IMPORTS_DONE = time.perf_counter()
+
+EVENT_POLL_MS = 50  # 主執行緒檢查背景事件佇列的間隔 (毫秒)
+FACTOR_POLL_MS = 2000  # 檢查課程因子檔是否被其他程式修改的間隔 (毫秒)
+HEAVY_MODULES = ("selenium", "selenium.webdriver", "requests")  # 不應在第一次繪出前載入的模組
+STARTUP_NOTICE = (
+    "⚠️ 總天數 = 總缺課節次 / 課程應計節次，請於【編輯課程因子】設定，否則無法查看總天數。\n"
+    "✅ 本程式使用 Google Chrome 作為爬蟲工具，請確認已安裝 Chrome，且 chromedriver.exe 與程式在同一目錄下。"
+)
+
+
+def load_scraper_core():
+    """延遲匯入 scraper_core (重複呼叫只會取得已載入的模組)"""
+    import scraper_core
+    return scraper_core
 
 # --- 主程式類別 ---
 
@@ -16,41 +44,133 @@ class MissingAttendanceApp:
         self.master = master
         master.title("學務系統缺曠課查詢工具")
         
-        self.show_startup_messages()
+        # 背景查詢執行緒送往主執行緒的事件: (種類, 內容, 是否為錯誤)
+        self.events: "queue.Queue[tuple]" = queue.Queue()
+        # 尚未送出結束事件 (result / exported) 的背景工作數；大於 0 時 poll_events 持續執行
+        self.active_jobs = 0
 
-        # 載入課程因子
-        self.COURSE_FACTORS = config_data.load_factors_from_file()
+        # 載入課程因子與程式設定
+        self.factor_store = factor_store.get_default_store()
+        self.COURSE_FACTORS = self.factor_store.load()
+        self.factor_store.subscribe(self.on_factors_reloaded)
+        self.settings = config_data.load_settings()
+        
+        # 在多次查詢之間保留暖機中的瀏覽器，關閉視窗時一併關閉
+        self.driver_pool = self.create_driver_pool()
+        # 本機記錄庫：每次查詢後增量同步，統計由索引讀出
+        self.record_store = record_store.RecordStore()
+        # 最近一次查詢的 (帳號, 表格列, 原始缺曠記錄, 假單)，供【匯出】使用
+        self.last_results = None
+        master.protocol("WM_DELETE_WINDOW", self.on_close)
         
         self.create_widgets(master)
         self.set_status("準備就緒。請輸入學號和密碼。")
+        master.bind("<Map>", self.on_first_paint, add="+")
+        master.after(FACTOR_POLL_MS, self.poll_factor_file)
+
+    def show_startup_notice(self, master):
+        """在視窗頂端顯示非強制回應的提醒，按下「不再顯示」後記錄到設定檔"""
+        if self.settings.get("startup_notice_dismissed"):
+            return
+        self.notice_frame = ttk.Frame(master, padding=(10, 5))
+        self.notice_frame.pack(fill='x')
+        ttk.Label(self.notice_frame, text=STARTUP_NOTICE, foreground="darkorange", wraplength=560, justify='left').pack(side='left', fill='x', expand=True)
+        ttk.Button(self.notice_frame, text="不再顯示", command=self.dismiss_startup_notice).pack(side='right')
+
+    def dismiss_startup_notice(self):
+        self.notice_frame.destroy()
+        self.settings["startup_notice_dismissed"] = True
+        config_data.save_settings(self.settings)
+
+    def on_first_paint(self, event):
+        """主視窗第一次繪出：回報啟動時間，並在背景預先載入查詢用的模組"""
+        if event.widget is not self.master:
+            return
+        self.master.unbind("<Map>")
+        elapsed_ms, import_ms = report_startup_time()
+        if "--startup-check" in sys.argv:
+            # 啟動時間檢查模式：不預載，直接以是否超出預算作為結束代碼
+            self.master.after_idle(lambda: self.exit_startup_check(elapsed_ms))
+            return
+        threading.Thread(target=load_scraper_core, name="ModulePreload", daemon=True).start()
 
-    def show_startup_messages(self):
-        """在程式啟動時跳出提醒視窗"""
-        messagebox.showinfo(
-            "【重要提醒】計算總天數",
-            "本系統會自動計算您的缺曠總天數。\n\n"
-            "⚠️ 總天數的計算公式為：**總缺課節次 / 課程應計節次**\n\n"
-            "請自行選擇是否修改 **【課程因子】** 若不修改將無法查看總天數"
+    def exit_startup_check(self, elapsed_ms: float):
+        loaded = [name for name in HEAVY_MODULES if name in sys.modules]
+        self.exit_code = 1 if elapsed_ms > config_data.STARTUP_BUDGET_MS or loaded else 0
+        self.on_close()
+
+
+    def create_driver_pool(self) -> driver_pool.DriverPool:
+        """依目前的抓取設定檔建立驅動池"""
+        profile = self.settings["fetch_profile"]
+        return driver_pool.DriverPool(
+            lambda: load_scraper_core().create_driver(profile),
+            max_size=config_data.DRIVER_POOL_SIZE,
+            idle_timeout=config_data.DRIVER_IDLE_TIMEOUT
         )
-        
-        messagebox.showinfo(
-            "【系統需求】瀏覽器依賴",
-            "本程式使用 Chrome 瀏覽器作為爬蟲工具。\n\n"
-            "✅ 請確認您的電腦已經安裝 **Google Chrome**。\n\n"
-            "如果程式無法啟動或閃退，請檢查 Chrome 瀏覽器版本是否為最新，並確保 **chromedriver.exe** 檔案與程式在同一目錄下。",
+
+    def toggle_lean_profile(self):
+        """切換無視窗精簡模式，儲存設定並以新設定重建驅動池"""
+        self.settings["fetch_profile"] = (
+            fetch_profile.PROFILE_LEAN if self.lean_profile_var.get() else fetch_profile.PROFILE_FULL
         )
+        config_data.save_settings(self.settings)
+        self.driver_pool.close_all()
+        self.driver_pool = self.create_driver_pool()
 
+    def on_close(self):
+        """關閉主視窗前釋放驅動池中的瀏覽器"""
+        self.driver_pool.close_all()
+        self.record_store.close()
+        self.master.destroy()
 
     def update_factors(self, new_factors: Dict[str, int]):
         """從編輯視窗接收並更新課程因子 (供主程式使用)"""
         self.COURSE_FACTORS = new_factors
 
+    def poll_factor_file(self):
+        """在主執行緒定期檢查課程因子檔，被其他視窗或批次程式修改時會觸發 on_factors_reloaded"""
+        self.factor_store.poll()
+        self.master.after(FACTOR_POLL_MS, self.poll_factor_file)
+
+    def on_factors_reloaded(self, factors: Dict[str, int]):
+        self.COURSE_FACTORS = factors
+        self.refresh_profile_choices()
+        self.set_status("課程因子檔已被更新，已重新載入。")
+
+    def refresh_profile_choices(self):
+        self.profile_combo.config(values=self.factor_store.profiles())
+        self.profile_var.set(self.factor_store.active_profile())
+
+    def on_profile_selected(self, event=None):
+        """切換學期設定檔並記錄為使用中的設定檔"""
+        self.switch_profile(self.profile_var.get())
+
+    def add_profile(self):
+        name = simpledialog.askstring("新增學期", "請輸入學期名稱 (例如 114-1)：", parent=self.master)
+        if name and name.strip():
+            # 新學期先沿用目前的課程因子，再自行修改
+            self.switch_profile(name.strip(), copy_from=self.factor_store.active_profile())
+
+    def switch_profile(self, name: str, copy_from=None):
+        try:
+            self.factor_store.set_active_profile(name, copy_from=copy_from)
+        except Exception as e:
+            messagebox.showerror("儲存錯誤", f"無法切換學期設定檔: {e}")
+            return
+        self.COURSE_FACTORS = self.factor_store.load()
+        self.refresh_profile_choices()
+        self.set_status(f"已切換到學期設定檔【{name}】。")
+
     def open_edit_factors_window(self):
         """開啟編輯課程因子視窗，調用 gui_elements 模組"""
         gui_elements.EditFactorsWindow(self.master, self.COURSE_FACTORS.copy(), self.update_factors)
 
 
     def create_widgets(self, master):
+        # --- 啟動提醒 (非強制回應) ---
+        self.show_startup_notice(master)
+
         # --- 登入資訊框架 ---
         input_frame = ttk.Frame(master, padding="10")
         input_frame.pack(fill='x')
@@ -70,8 +190,28 @@ class MissingAttendanceApp:
         self.run_button = ttk.Button(button_frame, text="開始查詢並計算", command=self.run_scraper)
         self.run_button.pack(side='left', padx=10)
 
+        self.export_button = ttk.Button(button_frame, text="匯出", command=self.export_results, state=tk.DISABLED)
+        self.export_button.pack(side='left', padx=10)
+
         ttk.Button(button_frame, text="編輯課程因子", command=self.open_edit_factors_window).pack(side='left', padx=10)
 
+        # 學期設定檔 (每學期一組課程因子)
+        ttk.Label(button_frame, text="學期:").pack(side='left')
+        self.profile_var = tk.StringVar()
+        self.profile_combo = ttk.Combobox(button_frame, textvariable=self.profile_var, width=10, state='readonly')
+        self.profile_combo.bind("<<ComboboxSelected>>", self.on_profile_selected)
+        self.profile_combo.pack(side='left', padx=(2, 2))
+        ttk.Button(button_frame, text="新增學期", command=self.add_profile).pack(side='left', padx=(2, 10))
+        self.refresh_profile_choices()
+
+        self.lean_profile_var = tk.BooleanVar(value=self.settings["fetch_profile"] == fetch_profile.PROFILE_LEAN)
+        ttk.Checkbutton(
+            button_frame,
+            text="無視窗精簡模式",
+            variable=self.lean_profile_var,
+            command=self.toggle_lean_profile
+        ).pack(side='left', padx=10)
+
         # --- 狀態訊息 ---
         self.status_label = ttk.Label(master, text="", foreground="blue", padding="10")
         self.status_label.pack(fill='x')
@@ -81,7 +221,7 @@ class MissingAttendanceApp:
         result_frame.pack(fill='both', expand=True)
         
         # 定義 Treeview (表格)
-        columns = ['課程名稱'] + config_data.ABSENCE_TYPES + ['總缺課數量', '總天數']
+        columns = ['課程名稱'] + config_data.ABSENCE_TYPES + ['總缺課數量', '總天數'] + config_data.COVERAGE_TYPES
         self.tree = ttk.Treeview(result_frame, columns=columns, show='headings')
         
         self.tree.heading('課程名稱', text='課程名稱', anchor='w')
@@ -93,6 +233,9 @@ class MissingAttendanceApp:
         self.tree.column('總缺課數量', width=70, anchor='center')
         self.tree.heading('總天數', text='總天數')
         self.tree.column('總天數', width=70, anchor='center')
+        for col in config_data.COVERAGE_TYPES:
+            self.tree.heading(col, text=col)
+            self.tree.column(col, width=60, anchor='center')
         
         # 添加滾動條
         vsb = ttk.Scrollbar(result_frame, orient="vertical", command=self.tree.yview)
@@ -100,19 +243,25 @@ class MissingAttendanceApp:
         self.tree.configure(yscrollcommand=vsb.set)
         
         self.tree.pack(fill='both', expand=True)
+        # 以課程名稱為鍵增量更新，結果很多時分批插入
+        self.result_view = gui_elements.KeyedTreeview(self.tree)
 
     def set_status(self, message, is_error=False):
-        """更新狀態欄的訊息和顏色"""
+        """更新狀態欄的訊息和顏色 (只能在主執行緒呼叫)"""
         self.status_label.config(text=message)
         self.status_label.config(foreground="red" if is_error else "blue")
-        self.master.update_idletasks() # 強制更新介面
+
+    def post_status(self, message, is_error=False):
+        """供背景執行緒使用的狀態回呼：只把訊息放進佇列，由主執行緒更新介面"""
+        self.events.put(("status", message, is_error))
 
     def run_scraper(self):
         """點擊按鈕時執行的函數"""
         
-        # 清除舊的表格數據
-        for item in self.tree.get_children():
-            self.tree.delete(item)
+        # 清除舊的表格數據 (一次 Tk 呼叫)
+        self.result_view.clear()
+        self.last_results = None
+        self.export_button.config(state=tk.DISABLED)
             
         account = self.account_entry.get().strip()
         password = self.password_entry.get()
@@ -124,25 +273,133 @@ class MissingAttendanceApp:
         self.run_button.config(state=tk.DISABLED, text="查詢中...")
         self.set_status("開始運行爬蟲程式...")
         
-        # 執行核心邏輯，調用 scraper_core 模組
+        # 在背景執行緒執行核心邏輯，避免查詢期間視窗凍結
+        self.start_job(self._scrape_worker, "ScraperWorker", account, password, self.COURSE_FACTORS.copy())
+
+    def start_job(self, target, name: str, *args):
+        """啟動背景工作；只在沒有其他工作時啟動 poll_events，整個程式只有一條輪詢鏈"""
+        threading.Thread(target=target, args=args, name=name, daemon=True).start()
+        self.active_jobs += 1
+        if self.active_jobs == 1:
+            self.master.after(EVENT_POLL_MS, self.poll_events)
+
+    def _scrape_worker(self, account: str, password: str, course_factors: Dict[str, int]):
+        """背景執行緒：調用 scraper_core 模組，邊解析邊回報課程節次，完成後把結果放進佇列"""
+        scraper_core = load_scraper_core()
+        records = {}
+        metrics = run_metrics.RunMetrics(account) if self.settings.get("write_run_metrics") else None
+        accumulator = scraper_core.SummaryAccumulator(
+            course_factors,
+            on_update=lambda row: self.events.put(("course", row, False)),
+            on_reset=lambda: self.events.put(("reset", None, False))
+        )
         data = scraper_core.scrape_and_calculate(
             account, 
             password, 
-            self.COURSE_FACTORS, 
-            self.set_status
+            course_factors, 
+            self.post_status,
+            pool=self.driver_pool,
+            store=self.record_store,
+            accumulator=accumulator,
+            metrics=metrics,
+            on_records=lambda raw_data, leave_slips: records.update(raw_data=raw_data, leave_slips=leave_slips)
         )
+        if metrics is not None:
+            self.write_run_metrics(metrics)
+        self.events.put(("result", (account, data, records.get("raw_data", []), records.get("leave_slips", [])), False))
+
+    def write_run_metrics(self, metrics: run_metrics.RunMetrics):
+        """將本次查詢的階段耗時寫到程式目錄 (背景執行緒呼叫，寫檔失敗只記錄在終端機)"""
+        app_path = config_data.get_app_path()
+        try:
+            run_metrics.write_json([metrics], os.path.join(app_path, config_data.METRICS_JSON_FILE))
+            if self.settings.get("write_prometheus_metrics"):
+                run_metrics.write_prometheus([metrics], os.path.join(app_path, config_data.METRICS_PROM_FILE))
+        except OSError as e:
+            print(f"效能報告寫入錯誤: {e}")
+
+    def poll_events(self):
+        """在主執行緒取出背景執行緒送來的事件並更新介面；所有背景工作結束後停止輪詢"""
+        try:
+            while True:
+                kind, payload, is_error = self.events.get_nowait()
+                if kind == "status":
+                    self.set_status(payload, is_error)
+                elif kind == "course":
+                    self.result_view.upsert(payload)
+                elif kind == "reset":
+                    self.result_view.clear()
+                elif kind == "result":
+                    self.show_results(payload)
+                    self.active_jobs -= 1
+                elif kind == "exported":
+                    self.set_status(payload, is_error)
+                    self.export_button.config(state=tk.NORMAL if self.last_results else tk.DISABLED)
+                    self.active_jobs -= 1
+        except queue.Empty:
+            pass
         
-        # 顯示結果到 Treeview
+        if self.active_jobs > 0:
+            self.master.after(EVENT_POLL_MS, self.poll_events)
+
+    def show_results(self, result):
+        """以最終結果校正 Treeview (補上只有因子的課程、依輸出順序排列)，只變更有差異的列"""
+        data = result[1]
         if data:
             self.set_status(f"查詢完成。總計找到 {len(data)} 門課程記錄。", is_error=False)
-            for row in data:
-                self.tree.insert('', tk.END, values=row)
+            self.result_view.apply(data)
+            self.last_results = result
+            self.export_button.config(state=tk.NORMAL)
         else:
+            self.result_view.clear()
             self.set_status("查詢失敗或未找到任何缺曠記錄。", is_error=True)
 
         self.run_button.config(state=tk.NORMAL, text="開始查詢並計算")
 
 
+    def export_results(self):
+        """將最近一次查詢的統計表、原始缺曠記錄與假單匯出 (於背景執行緒寫檔)"""
+        if not self.last_results:
+            return
+        import exporter
+        filetypes = [("CSV", "*.csv"), ("JSON Lines", "*.jsonl")]
+        if exporter.is_parquet_available():
+            filetypes.append(("Parquet", "*.parquet"))
+        account = self.last_results[0]
+        filepath = filedialog.asksaveasfilename(
+            parent=self.master, title="匯出查詢結果", defaultextension=".csv",
+            initialfile=f"{account}_summary.csv", filetypes=filetypes
+        )
+        if not filepath:
+            return
+
+        self.export_button.config(state=tk.DISABLED)
+        self.set_status("正在匯出...")
+
+        def worker(results=self.last_results):
+            try:
+                paths = exporter.export_all(filepath, results[1], results[2], results[3], results[0])
+                self.events.put(("exported", f"已匯出: {', '.join(os.path.basename(p) for p in paths)}", False))
+            except (OSError, RuntimeError) as e:
+                self.events.put(("exported", f"匯出失敗: {e}", True))
+
+        self.start_job(worker, "Exporter")
+
+
+def report_startup_time():
+    """印出從程式開始執行到第一次繪出的時間，超出 STARTUP_BUDGET_MS 或過早載入重量級模組時提出警告"""
+    now = time.perf_counter()
+    elapsed_ms = (now - PROCESS_START) * 1000
+    import_ms = (IMPORTS_DONE - PROCESS_START) * 1000
+    print(f"啟動時間: {elapsed_ms:.0f} ms (模組匯入 {import_ms:.0f} ms，預算 {config_data.STARTUP_BUDGET_MS} ms)")
+    if elapsed_ms > config_data.STARTUP_BUDGET_MS:
+        print(f"⚠️ 警告: 啟動時間超出預算 {elapsed_ms - config_data.STARTUP_BUDGET_MS:.0f} ms", file=sys.stderr)
+    loaded = [name for name in HEAVY_MODULES if name in sys.modules]
+    if loaded:
+        print(f"⚠️ 警告: 第一次繪出前已載入 {', '.join(loaded)}", file=sys.stderr)
+    return elapsed_ms, import_ms
+
+
 if __name__ == "__main__":
     # 創建主視窗
     root = tk.Tk()
@@ -150,4 +407,6 @@ if __name__ == "__main__":
     # 設置視窗大小
     root.geometry("700x500") 
     # 啟動主循環
-    root.mainloop()
\ No newline at end of file
+    root.mainloop()
+    # --startup-check: 以結束代碼回報啟動時間是否在預算內
+    sys.exit(getattr(app, "exit_code", 0))
\ No newline at end of file
@@ -0,0 +1,33 @@
+# 依主機限制請求速率 (多帳號批次查詢時避免對學校主機送出過多請求)
+
+import threading
+import time
+from typing import Dict
+from urllib.parse import urlparse
+
+
+class HostRateLimiter:
+    """每個主機每秒最多 rate 次請求；rate <= 0 代表不限制。可跨執行緒共用"""
+
+    def __init__(self, rate: float):
+        self.rate = rate
+        self._next_slot: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def reserve(self, url_or_host: str) -> float:
+        """預約此主機的下一個時段，返回需要等待的秒數 (不阻塞，供 asyncio 以 await sleep 等待)"""
+        if self.rate <= 0:
+            return 0.0
+        host = urlparse(url_or_host).hostname or url_or_host
+        interval = 1.0 / self.rate
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot.get(host, now))
+            self._next_slot[host] = slot + interval
+        return slot - now
+
+    def wait(self, url_or_host: str):
+        """阻塞到此主機的下一個可用時段"""
+        delay = self.reserve(url_or_host)
+        if delay > 0:
+            time.sleep(delay)
@@ -0,0 +1,151 @@
+# 本機 SQLite 記錄庫：保存每次抓取的缺曠課與假單記錄，只增量更新有變動的資料
+
+import os
+import sqlite3
+import threading
+from typing import Dict, Iterable, Optional, Set, Tuple
+
+import config_data
+from records import STATUS_CODES, UNKNOWN_STATUS, AbsenceRecord as AbsenceRow, CountMatrix
+
+DB_FILE = "attendance_records.db"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS absences (
+    account TEXT NOT NULL,
+    date    TEXT NOT NULL,
+    course  TEXT NOT NULL,
+    section TEXT NOT NULL,
+    week    TEXT NOT NULL,
+    status  TEXT NOT NULL,
+    PRIMARY KEY (account, date, course, section)
+);
+CREATE INDEX IF NOT EXISTS idx_absences_course ON absences (account, course);
+
+CREATE TABLE IF NOT EXISTS course_stats (
+    account TEXT NOT NULL,
+    course  TEXT NOT NULL,
+    status  TEXT NOT NULL,
+    count   INTEGER NOT NULL,
+    PRIMARY KEY (account, course, status)
+);
+
+CREATE TABLE IF NOT EXISTS leave_weeks (
+    account TEXT NOT NULL,
+    week    TEXT NOT NULL,
+    PRIMARY KEY (account, week)
+);
+"""
+
+
+class SyncResult:
+    """一次同步的變動摘要"""
+
+    def __init__(self, inserted: int = 0, updated: int = 0, deleted: int = 0, courses: Optional[Set[str]] = None):
+        self.inserted = inserted
+        self.updated = updated
+        self.deleted = deleted
+        self.courses: Set[str] = courses or set()
+
+    @property
+    def changed(self) -> bool:
+        return bool(self.inserted or self.updated or self.deleted)
+
+    def __repr__(self):
+        return (f"SyncResult(inserted={self.inserted}, updated={self.updated}, "
+                f"deleted={self.deleted}, courses={sorted(self.courses)})")
+
+
+class RecordStore:
+    """
+    以 (account, date, course, section) 為鍵保存缺曠記錄
+    每門課的統計存在 course_stats，同步時只重算有變動的課程
+    """
+
+    def __init__(self, filepath: Optional[str] = None):
+        self.filepath = filepath or os.path.join(config_data.get_app_path(), DB_FILE)
+        # 查詢可能在背景執行緒執行，統一以鎖保護同一個連線
+        self._conn = sqlite3.connect(self.filepath, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock, self._conn:
+            self._conn.executescript(SCHEMA)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def sync(self, account: str, raw_data: Iterable[AbsenceRow], xerox_weeks: Iterable[str] = ()) -> SyncResult:
+        """
+        將本次抓取結果與資料庫比對:
+        新增或狀態/週別改變的記錄才寫入，網站上已不存在的記錄刪除，
+        並只重算受影響課程的統計
+        """
+        scraped: Dict[Tuple[str, str, str], Tuple[str, str]] = {}
+        for course, status, week, section, date in raw_data:
+            scraped[(date, course, section)] = (week, status)
+
+        with self._lock, self._conn:
+            existing = {
+                (date, course, section): (week, status)
+                for date, course, section, week, status in self._conn.execute(
+                    "SELECT date, course, section, week, status FROM absences WHERE account = ?", (account,)
+                )
+            }
+
+            result = SyncResult()
+            upserts = []
+            for key, value in scraped.items():
+                old = existing.get(key)
+                if old == value:
+                    continue
+                if old is None:
+                    result.inserted += 1
+                else:
+                    result.updated += 1
+                upserts.append((account, *key, *value))
+                result.courses.add(key[1])
+
+            removed = [key for key in existing if key not in scraped]
+            result.deleted = len(removed)
+            result.courses.update(key[1] for key in removed)
+
+            self._conn.executemany(
+                "INSERT INTO absences (account, date, course, section, week, status) VALUES (?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT (account, date, course, section) DO UPDATE SET week = excluded.week, status = excluded.status",
+                upserts,
+            )
+            self._conn.executemany(
+                "DELETE FROM absences WHERE account = ? AND date = ? AND course = ? AND section = ?",
+                [(account, *key) for key in removed],
+            )
+            for course in result.courses:
+                self._refresh_course_stats(account, course)
+
+            self._conn.execute("DELETE FROM leave_weeks WHERE account = ?", (account,))
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO leave_weeks (account, week) VALUES (?, ?)",
+                [(account, week.strip()) for week in xerox_weeks],
+            )
+        return result
+
+    def _refresh_course_stats(self, account: str, course: str):
+        """重算單一課程的統計 (呼叫端需持有鎖並在交易中)"""
+        self._conn.execute("DELETE FROM course_stats WHERE account = ? AND course = ?", (account, course))
+        placeholders = ", ".join("?" for _ in config_data.ABSENCE_TYPES)
+        self._conn.execute(
+            f"INSERT INTO course_stats (account, course, status, count) "
+            f"SELECT account, course, status, COUNT(*) FROM absences "
+            f"WHERE account = ? AND course = ? AND status IN ({placeholders}) GROUP BY status",
+            (account, course, *config_data.ABSENCE_TYPES),
+        )
+
+    def course_counts(self, account: str) -> CountMatrix:
+        """從索引讀出每門課的統計，格式與 scraper_core.count_absences 相同"""
+        counts = CountMatrix()
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT course, status, count FROM course_stats WHERE account = ?", (account,)
+            ).fetchall()
+        for course, status, count in rows:
+            counts.add(course, STATUS_CODES.get(status, UNKNOWN_STATUS), count)
+        return counts
@@ -0,0 +1,102 @@
+# 精簡的記錄模型：缺曠與假單記錄、缺曠類別代碼、以陣列保存的課程統計矩陣
+
+import sys
+from array import array
+from typing import Dict, Iterator, List, NamedTuple, Tuple
+
+import config_data
+
+# 缺曠類別 <-> 小整數代碼 (順序與 ABSENCE_TYPES 相同)
+STATUS_CODES: Dict[str, int] = {status: code for code, status in enumerate(config_data.ABSENCE_TYPES)}
+UNKNOWN_STATUS = -1
+TOTAL_INDEX = len(config_data.ABSENCE_TYPES)  # 統計列最後一格為總節次
+ROW_WIDTH = TOTAL_INDEX + 1
+
+
+class AbsenceRecord(NamedTuple):
+    """缺曠記錄，欄位順序與 raw_data 的 tuple 相同，可直接當作 AbsenceRow 使用"""
+    course: str
+    status: str
+    week: str
+    section: str
+    date: str
+
+    @property
+    def status_code(self) -> int:
+        return STATUS_CODES.get(self.status, UNKNOWN_STATUS)
+
+
+class LeaveSlipRecord(NamedTuple):
+    """假單記錄 (Xerox.aspx)"""
+    slip_id: str
+    week: str
+    period: str      # 例: 114/11/16 - 114/11/22
+    leave_type: str  # 例: 事假
+    status: str      # 例: 銷假完成
+
+
+def make_absence(course: str, status: str, week: str, section: str, date: str) -> AbsenceRecord:
+    """建立缺曠記錄；課程名稱與狀態重複度高，以 sys.intern 共用同一個字串物件"""
+    return AbsenceRecord(sys.intern(course), sys.intern(status), week, section, date)
+
+
+class CountMatrix:
+    """
+    每門課一列、每列 ROW_WIDTH 格的整數矩陣 (各缺曠類別節次 + 總節次)
+    所有課程的計數連續存放在同一個 array 中，課程名稱只保存一次
+    """
+
+    __slots__ = ("_index", "_courses", "_data")
+
+    def __init__(self):
+        self._index: Dict[str, int] = {}
+        self._courses: List[str] = []
+        self._data = array('l')
+
+    def _offset(self, course: str) -> int:
+        row = self._index.get(course)
+        if row is None:
+            row = len(self._courses)
+            self._index[course] = row
+            self._courses.append(course)
+            self._data.extend([0] * ROW_WIDTH)
+        return row * ROW_WIDTH
+
+    def add(self, course: str, status_code: int, count: int = 1) -> bool:
+        """累加一筆 (未知類別不計入)，返回是否有計入"""
+        if not 0 <= status_code < TOTAL_INDEX:
+            return False
+        offset = self._offset(course)
+        self._data[offset + status_code] += count
+        self._data[offset + TOTAL_INDEX] += count
+        return True
+
+    def row(self, course: str) -> array:
+        """取得某課程的計數列 (複本)；沒有記錄的課程返回全 0"""
+        row = self._index.get(course)
+        if row is None:
+            return array('l', [0] * ROW_WIDTH)
+        offset = row * ROW_WIDTH
+        return self._data[offset:offset + ROW_WIDTH]
+
+    def total(self, course: str) -> int:
+        row = self._index.get(course)
+        return 0 if row is None else self._data[row * ROW_WIDTH + TOTAL_INDEX]
+
+    def courses(self) -> List[str]:
+        return list(self._courses)
+
+    def items(self) -> Iterator[Tuple[str, array]]:
+        for course in self._courses:
+            yield course, self.row(course)
+
+    def clear(self):
+        self._index.clear()
+        self._courses.clear()
+        del self._data[:]
+
+    def __contains__(self, course: str) -> bool:
+        return course in self._index
+
+    def __len__(self) -> int:
+        return len(self._courses)
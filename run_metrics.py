@@ -0,0 +1,219 @@
+# 每次查詢的計時與計數：以狀態訊息的 "N/9" 標記切分階段，另記錄 WebDriver 呼叫次數、下載位元組數與列數
+#
+# 報告可寫成 JSON，或 Prometheus 文字格式 (textfile collector 可直接讀取)
+
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, List, Optional
+
+# 狀態訊息編號 -> 階段名稱
+STAGE_NAMES = {
+    1: "setup",             # 啟動瀏覽器 / 建立 HTTP 連線
+    2: "open_login",        # 開啟登入頁 (或使用快取的登入狀態)
+    3: "login",             # 送出帳密並等待結果
+    4: "navigate_absence",  # 前往缺曠記錄頁面
+    5: "extract_absence",   # 解析缺曠課表格
+    6: "navigate_xerox",    # 切換到假單頁面
+    7: "extract_xerox",     # 解析假單表格
+    8: "aggregate",         # 統計計算
+    9: "done",
+}
+
+# 階段分組，方便判斷 登入 / 導航 / 擷取 / 統計 哪一段佔最多時間
+STAGE_GROUPS = {
+    "setup": "setup",
+    "open_login": "login",
+    "login": "login",
+    "navigate_absence": "navigation",
+    "navigate_xerox": "navigation",
+    "extract_absence": "extraction",
+    "extract_xerox": "extraction",
+    "aggregate": "aggregation",
+}
+
+# 計數器名稱
+WEBDRIVER_CALLS = "webdriver_calls"
+HTTP_REQUESTS = "http_requests"
+BYTES_FETCHED = "bytes_fetched"
+ABSENCE_ROWS = "absence_rows"
+XEROX_ROWS = "xerox_rows"
+RETRIES = "retries"
+
+PROMETHEUS_PREFIX = "uch_scraper"
+
+
+def parse_stage(message: str) -> Optional[int]:
+    """取出狀態訊息開頭的 "N/9" 編號，沒有則返回 None"""
+    head = message.split(" ", 1)[0]
+    number, _, total = head.partition("/")
+    if total == "9" and number.isdigit():
+        return int(number)
+    return None
+
+
+class RunMetrics:
+    """
+    一次查詢 (一個帳號) 的量測結果
+    計數器可跨執行緒累加 (HTTP 後端會並行讀取頁面)
+    """
+
+    def __init__(self, account: str = "", backend: str = ""):
+        self.account = account
+        self.backend = backend
+        self.started_at = time.time()
+        self.stages: List[Dict] = []
+        self.counters: Dict[str, int] = {}
+        self.outcome = ""
+        self.error = ""
+        self.total_s: Optional[float] = None
+        self._start = time.perf_counter()
+        self._current: Optional[Dict] = None
+        self._lock = threading.Lock()
+
+    # --- 階段 ---
+
+    def mark(self, stage: int):
+        """結束目前的階段並開始新階段 (編號回到較小值代表重試，會另記一筆)"""
+        now = time.perf_counter()
+        with self._lock:
+            self._close_stage(now)
+            if stage in STAGE_NAMES and STAGE_NAMES[stage] == "done":
+                return
+            self._current = {
+                "stage": stage, "name": STAGE_NAMES.get(stage, str(stage)), "offset_s": now - self._start, "_t": now
+            }
+
+    def _close_stage(self, now: float):
+        if self._current is not None:
+            current = self._current
+            current["duration_s"] = now - current.pop("_t")
+            self.stages.append(current)
+            self._current = None
+
+    def wrap_status(self, set_status_callback: Callable) -> Callable:
+        """包裝狀態回呼：轉送訊息之前，依 "N/9" 標記記錄階段"""
+        def wrapped(message, is_error=False):
+            stage = parse_stage(message)
+            if stage is not None:
+                self.mark(stage)
+            set_status_callback(message, is_error=is_error)
+        return wrapped
+
+    def finish(self, outcome: str = "ok", error: str = ""):
+        with self._lock:
+            self._close_stage(time.perf_counter())
+            self.outcome = outcome
+            self.error = error
+            self.total_s = time.perf_counter() - self._start
+
+    # --- 計數 ---
+
+    def incr(self, name: str, amount: int = 1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + amount
+
+    @contextmanager
+    def count_webdriver_calls(self, driver):
+        """暫時包裝 driver.execute (所有 WebDriver 指令的共同入口) 以計算呼叫次數"""
+        original = driver.execute
+
+        def execute(*args, **kwargs):
+            self.incr(WEBDRIVER_CALLS)
+            return original(*args, **kwargs)
+
+        driver.execute = execute
+        try:
+            yield driver
+        finally:
+            # 移除實例屬性，恢復類別上的原始方法
+            del driver.execute
+
+    # --- 報告 ---
+
+    def stage_totals(self) -> Dict[str, float]:
+        totals: Dict[str, float] = {}
+        for stage in self.stages:
+            totals[stage["name"]] = totals.get(stage["name"], 0.0) + stage["duration_s"]
+        return totals
+
+    def group_totals(self) -> Dict[str, float]:
+        totals: Dict[str, float] = {}
+        for name, seconds in self.stage_totals().items():
+            group = STAGE_GROUPS.get(name, name)
+            totals[group] = totals.get(group, 0.0) + seconds
+        return totals
+
+    def to_dict(self) -> Dict:
+        return {
+            "account": self.account,
+            "backend": self.backend,
+            "started_at": self.started_at,
+            "total_s": self.total_s if self.total_s is not None else time.perf_counter() - self._start,
+            "outcome": self.outcome,
+            "error": self.error,
+            "stages": list(self.stages),
+            "stage_totals": self.stage_totals(),
+            "group_totals": self.group_totals(),
+            "counters": dict(self.counters),
+        }
+
+
+# ==============================================================================
+#   【輸出】
+# ==============================================================================
+
+def write_json(runs: Iterable[RunMetrics], filepath: str):
+    with open(filepath, 'w', encoding='utf-8') as f:
+        json.dump([run.to_dict() for run in runs], f, ensure_ascii=False, indent=2)
+
+
+def _label_value(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(**labels) -> str:
+    return "{" + ",".join(f'{key}="{_label_value(value)}"' for key, value in labels.items()) + "}"
+
+
+def to_prometheus(runs: Iterable[RunMetrics]) -> str:
+    """轉成 Prometheus 文字格式；每個帳號以 account 標籤區分"""
+    runs = list(runs)
+    lines = [
+        f"# HELP {PROMETHEUS_PREFIX}_stage_seconds Wall-clock seconds spent in each scrape stage.",
+        f"# TYPE {PROMETHEUS_PREFIX}_stage_seconds gauge",
+    ]
+    for run in runs:
+        for name, seconds in run.stage_totals().items():
+            labels = _labels(account=run.account, backend=run.backend, stage=name, group=STAGE_GROUPS.get(name, name))
+            lines.append(f"{PROMETHEUS_PREFIX}_stage_seconds{labels} {seconds:.6f}")
+
+    lines += [
+        f"# HELP {PROMETHEUS_PREFIX}_run_seconds Wall-clock seconds of the whole run.",
+        f"# TYPE {PROMETHEUS_PREFIX}_run_seconds gauge",
+    ]
+    for run in runs:
+        labels = _labels(account=run.account, backend=run.backend, outcome=run.outcome or "unknown")
+        lines.append(f"{PROMETHEUS_PREFIX}_run_seconds{labels} {run.to_dict()['total_s']:.6f}")
+
+    counter_names = sorted({name for run in runs for name in run.counters})
+    for name in counter_names:
+        lines += [
+            f"# HELP {PROMETHEUS_PREFIX}_{name}_total Count of {name.replace('_', ' ')} during the run.",
+            f"# TYPE {PROMETHEUS_PREFIX}_{name}_total counter",
+        ]
+        for run in runs:
+            if name in run.counters:
+                labels = _labels(account=run.account, backend=run.backend)
+                lines.append(f"{PROMETHEUS_PREFIX}_{name}_total{labels} {run.counters[name]}")
+    return "\n".join(lines) + "\n"
+
+
+def write_prometheus(runs: Iterable[RunMetrics], filepath: str):
+    # 先寫暫存檔再改名，避免 textfile collector 讀到寫到一半的檔案
+    temp_path = filepath + ".tmp"
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        f.write(to_prometheus(runs))
+    os.replace(temp_path, filepath)
@@ -1,19 +1,34 @@
 # 爬蟲核心邏輯
 
 import os 
-import time
-from collections import defaultdict
-from typing import Set, Dict, List, Tuple
+import sys
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Set, Tuple
 
-# 引入 Selenium 相關模組
-from selenium import webdriver
-from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import WebDriverWait 
-from selenium.webdriver.support import expected_conditions as EC 
-from selenium.common.exceptions import TimeoutException, NoSuchElementException, WebDriverException
+# Selenium (含其例外類別) 載入很慢，只在建立瀏覽器或判斷錯誤類型時才於函式內匯入
 
 # 引入常數和路徑函數
 import config_data 
+import driver_pool
+import fetch_profile
+import record_store
+import records
+import run_metrics
+import session_cache
+import http_backend
+import leave_join
+import load_control
+import timeline
+import table_parser
+import wait_policy
+from rate_limiter import HostRateLimiter
+from scraper_errors import LoginFailedError, PageStructureError, SessionExpiredError
+
+NO_COVERAGE = (0, 0, 0)  # 沒有請假類節次的課程
+
+# 抓取後端選項
+BACKEND_AUTO = "auto"
+BACKEND_HTTP = "http"
+BACKEND_SELENIUM = "selenium"
 
 # ===============================================
 #                【爬蟲核心函數】
@@ -25,48 +40,172 @@ def get_driver_path(driver_name="chromedriver.exe"):
     base_path = config_data.get_app_path()
     return os.path.join(base_path, driver_name)
 
-def scrape_and_calculate(
-    account: str, 
-    password: str, 
-    course_factors: Dict[str, int],
-    set_status_callback # 傳入 GUI 的狀態更新函式
-) -> List[List[str]]:
+def create_driver(profile: Optional[str] = None):
     """
-    核心爬蟲和計算邏輯
-    返回整理好的表格數據 (List[List[str]])
+    依抓取設定檔建立新的 Chrome 驅動 (驅動池的 factory)
+    未指定 profile 時使用 app_settings.json 中的設定 (預設為 lean)
     """
+    from selenium import webdriver
+    from selenium.common.exceptions import WebDriverException
+
+    if profile is None:
+        profile = config_data.load_settings()["fetch_profile"]
+    options = fetch_profile.build_chrome_options(profile)
+    try:
+        driver = webdriver.Chrome(options=options)
+    except WebDriverException:
+        # 嘗試使用 PyInstaller 兼容路徑 
+        driver_path = get_driver_path()
+        driver = webdriver.Chrome(executable_path=driver_path, options=options)
+    fetch_profile.apply_network_blocking(driver, profile)
+    return driver
+
+def _fetch_with_selenium(
+    account: str,
+    password: str,
+    set_status_callback,
+    policy: wait_policy.WaitPolicy = wait_policy.DEFAULT_POLICY,
+    pool: Optional[driver_pool.DriverPool] = None,
+    cache: Optional[session_cache.SessionCache] = None,
+    absence_stage: Optional[table_parser.AbsenceStage] = None,
+    metrics: Optional[run_metrics.RunMetrics] = None
+) -> Tuple[List[table_parser.AbsenceRow], List[records.LeaveSlipRecord]]:
+    """
+    以 Selenium 瀏覽器抓取缺曠課與假單資料，返回 (raw_data, leave_slips)
+    傳入 pool 時向驅動池借用暖機中的驅動，用完歸還而不關閉
+    (以帳密指紋借用：密碼不同時不會沿用前一次的登入狀態)
+    """
+    set_status_callback("1/9 正在初始化瀏覽器...")
     
-    # ***新增常數: 假單列印頁面 URL***
-    XEROX_URL = "https://std.uch.edu.tw/Std_Xerox/Xerox.aspx"
+    if pool is not None:
+        with pool.lease(session_cache.credential_fingerprint(account, password)) as driver:
+            return _scrape_with_driver(driver, account, password, set_status_callback, policy, cache, absence_stage, metrics)
     
     driver = None
-    set_status_callback("1/9 正在初始化瀏覽器...")
-    
     try:
-        # 嘗試初始化驅動
+        driver = create_driver()
+        return _scrape_with_driver(driver, account, password, set_status_callback, policy, cache, absence_stage, metrics)
+    finally:
+        if driver:
+            driver.quit()
+
+def _scrape_with_driver(
+    driver,
+    account: str,
+    password: str,
+    set_status_callback,
+    policy: wait_policy.WaitPolicy,
+    cache: Optional[session_cache.SessionCache] = None,
+    absence_stage: Optional[table_parser.AbsenceStage] = None,
+    metrics: Optional[run_metrics.RunMetrics] = None
+) -> Tuple[List[table_parser.AbsenceRow], List[records.LeaveSlipRecord]]:
+    """在已建立的驅動上執行 登入 -> 缺曠記錄 -> 假單 流程"""
+    if metrics is None:
+        return _run_driver_flow(driver, account, password, set_status_callback, policy, cache, absence_stage, metrics)
+    with metrics.count_webdriver_calls(driver):
+        return _run_driver_flow(driver, account, password, set_status_callback, policy, cache, absence_stage, metrics)
+
+def _run_driver_flow(
+    driver,
+    account: str,
+    password: str,
+    set_status_callback,
+    policy: wait_policy.WaitPolicy,
+    cache: Optional[session_cache.SessionCache],
+    absence_stage: Optional[table_parser.AbsenceStage],
+    metrics: Optional[run_metrics.RunMetrics]
+) -> Tuple[List[table_parser.AbsenceRow], List[records.LeaveSlipRecord]]:
+    driver.get(config_data.LOGIN_URL)
+    set_status_callback(f"2/9 已訪問登入頁面: {config_data.LOGIN_URL}")
+
+    # 有未過期的登入快取時，直接帶 Cookie 前往資料頁面
+    cookies = cache.load(account, password) if cache else None
+    if cookies:
+        set_status_callback("3/9 使用快取的登入狀態，略過登入...")
+        for cookie in cookies:
+            driver.add_cookie({"name": cookie["name"], "value": cookie["value"], "path": cookie.get("path", "/")})
         try:
-            driver = webdriver.Chrome()
-        except WebDriverException:
-            # 嘗試使用 PyInstaller 兼容路徑 
-            driver_path = get_driver_path()
-            driver = webdriver.Chrome(executable_path=driver_path)
-        
-        driver.get(config_data.LOGIN_URL)
-        set_status_callback(f"2/9 已訪問登入頁面: {config_data.LOGIN_URL}")
-        time.sleep(1) 
-
-        # 2. 執行登入操作
-        account_input = driver.find_element(By.NAME, "account")
-        password_input = driver.find_element(By.NAME, "account_pass")
-        sign_in_button = driver.find_element(By.NAME, "SignIn")
-        
-        account_input.send_keys(account)
-        password_input.send_keys(password) 
-        set_status_callback("3/9 帳號密碼已填寫，正在登入...")
-        
-        sign_in_button.click()
-        time.sleep(3)
-        
+            return _read_tables_with_driver(driver, set_status_callback, policy, absence_stage, metrics)
+        except SessionExpiredError:
+            set_status_callback("⚠️ 快取的登入狀態已過期，改為重新登入...")
+            cache.invalidate(account)
+            driver.delete_all_cookies()
+            driver.get(config_data.LOGIN_URL)
+
+    _login_with_driver(driver, account, password, set_status_callback, policy)
+    if cache:
+        cache.save(account, password, driver.get_cookies())
+    return _read_tables_with_driver(driver, set_status_callback, policy, absence_stage, metrics)
+
+def _login_with_driver(
+    driver,
+    account: str,
+    password: str,
+    set_status_callback,
+    policy: wait_policy.WaitPolicy
+):
+    """在登入頁填寫帳密並等待登入結果 (驅動需已位於 LOGIN_URL)"""
+    
+    # 沿用驅動池中同帳號的驅動時，可能已處於登入狀態而被導離登入頁
+    if not wait_policy.is_login_url(driver.current_url):
+        set_status_callback("3/9 沿用既有登入狀態...")
+        return
+
+    # 2. 執行登入操作 (等待欄位出現即可操作，不再固定 sleep)
+    account_input, password_input, sign_in_button = wait_policy.wait_for_login_form(driver, policy)
+    
+    account_input.send_keys(account)
+    password_input.send_keys(password) 
+    set_status_callback("3/9 帳號密碼已填寫，正在登入...")
+    
+    sign_in_button.click()
+    # 等待跳轉或驗證 Cookie；帳密錯誤會立即拋出 LoginFailedError
+    wait_policy.wait_for_login_result(driver, password_input, policy)
+
+def _read_grid_pages_with_driver(
+    driver,
+    table,
+    policy: wait_policy.WaitPolicy,
+    max_pages: int = config_data.MAX_GRID_PAGES
+) -> List[str]:
+    """
+    依序點選 GridView 分頁列，返回每一頁表格的 outerHTML (依頁碼排序)
+    瀏覽器同一時間只能顯示一頁，因此逐頁切換；每次前往目前頁面上可見、尚未讀取的最小頁碼
+    """
+    htmls: Dict[int, str] = {1: table.get_attribute("outerHTML")}
+    current = 1
+    while len(htmls) < max_pages:
+        pager = table_parser.find_pager(htmls[current])
+        if pager is None:
+            break
+        links = dict(pager.pages)
+        if not links and pager.next_argument:
+            links[current + 1] = pager.next_argument
+        unread = sorted(number for number in links if number not in htmls)
+        if not unread:
+            break
+        current = unread[0]
+        driver.execute_script("__doPostBack(arguments[0], arguments[1]);", pager.event_target, links[current])
+        table = wait_policy.wait_for_table_refresh(driver, table, policy)
+        htmls[current] = table.get_attribute("outerHTML")
+    return [htmls[number] for number in sorted(htmls)]
+
+def _read_tables_with_driver(
+    driver,
+    set_status_callback,
+    policy: wait_policy.WaitPolicy,
+    absence_stage: Optional[table_parser.AbsenceStage] = None,
+    metrics: Optional[run_metrics.RunMetrics] = None
+) -> Tuple[List[table_parser.AbsenceRow], List[records.LeaveSlipRecord]]:
+    """讀取缺曠記錄與假單兩個表格；登入失效時拋出 SessionExpiredError"""
+    
+    # 先在新分頁送出假單頁面的請求，讓它與下方的缺曠記錄頁面同時載入
+    main_window = driver.current_window_handle
+    driver.execute_script("window.open(arguments[0], '_blank');", config_data.XEROX_URL)
+    xerox_window = [handle for handle in driver.window_handles if handle != main_window][-1]
+    driver.switch_to.window(main_window)
+    
+    try:
         # ==========================================================
         # 步驟 A: 抓取缺曠課記錄 (原 TARGET_URL)
         # ==========================================================
@@ -78,143 +217,354 @@ def scrape_and_calculate(
         # 5. 擷取缺曠課表格資訊
         set_status_callback(f"5/9 正在抓取缺曠課表格數據...")
         
-        WebDriverWait(driver, 10).until(
-            EC.presence_of_element_located((By.ID, config_data.TABLE_ID))
-        )
-        
-        table = driver.find_element(By.ID, config_data.TABLE_ID)
-        rows = table.find_elements(By.TAG_NAME, "tr")
-        
-        # raw_data 結構: (course_name, absence_status, week_number, section)
-        raw_data: List[Tuple[str, str, str, str]] = [] 
-        if len(rows) > 1:
-            for row in rows[1:]:
-                cols = row.find_elements(By.TAG_NAME, "td")
-                if cols and len(cols) >= 5: 
-                    week_number = cols[0].text
-                    course_name = cols[2].text
-                    absence_status = cols[3].text
-                    section = cols[4].text
-                    
-                    raw_data.append((course_name, absence_status, week_number, section))
-        
-        # 輸出原始缺曠課數據到終端機
-        print("\n" + "="*70)
-        print("【原始缺曠課記錄 (Miss_ct.aspx) - 終端機輸出】")
-        print("格式: (課程名稱, 缺曠狀態, 週別, 節次)")
-        print("-"*70)
-        if raw_data:
-            for course_name, status, week, section in raw_data:
-                print(f"({course_name}, {status}, 週{week}, 節次{section})")
-        else:
-            print("無缺曠課記錄。")
-        print("="*70 + "\n")
-
+        # 一次取回整個表格的 outerHTML，在本機解析 (避免逐格呼叫 WebDriver)；有分頁時讀取每一頁
+        table = wait_policy.wait_for_table(driver, policy)
+        # raw_data 結構: (course_name, absence_status, week_number, section, date)
+        table_pages = _read_grid_pages_with_driver(driver, table, policy)
+        raw_data = table_parser.extract_absence_pages(table_pages, absence_stage)
 
         # ==========================================================
         # 步驟 B: 抓取假單記錄 (新頁面: Xerox.aspx)
         # ==========================================================
 
-        # 6. 跳轉到假單列印頁面
-        driver.get(XEROX_URL)
-        set_status_callback(f"6/9 已跳轉到假單列印頁面: {XEROX_URL}")
+        # 6. 切換到已在背景載入的假單列印分頁
+        driver.switch_to.window(xerox_window)
+        set_status_callback(f"6/9 已切換到假單列印頁面: {config_data.XEROX_URL}")
         
         # 7. 擷取假單表格資訊
         set_status_callback(f"7/9 正在抓取假單表格數據...")
         
         # 使用相同的 TABLE_ID, 假單回傳資料.txt 中 ID 確實是 ctl00_ContentPlaceHolder1_gw_absent
-        WebDriverWait(driver, 10).until(
-            EC.presence_of_element_located((By.ID, config_data.TABLE_ID)) 
+        xerox_table = wait_policy.wait_for_table(driver, policy)
+        xerox_pages = _read_grid_pages_with_driver(driver, xerox_table, policy)
+        leave_slips = table_parser.extract_leave_slip_pages(xerox_pages)
+        if metrics is not None:
+            # 瀏覽器自行下載頁面，這裡只能計算實際取回本機的表格 HTML
+            metrics.incr(run_metrics.BYTES_FETCHED, sum(len(html.encode("utf-8")) for html in table_pages + xerox_pages))
+    finally:
+        # 無論成功與否都關閉假單分頁，讓驅動回到單一分頁的狀態
+        if xerox_window in driver.window_handles:
+            driver.switch_to.window(xerox_window)
+            driver.close()
+        driver.switch_to.window(main_window)
+
+    return raw_data, leave_slips
+
+def _fetch_with_http(
+    account: str,
+    password: str,
+    set_status_callback,
+    cache: Optional[session_cache.SessionCache] = None,
+    rate_limiter: Optional[HostRateLimiter] = None,
+    absence_stage: Optional[table_parser.AbsenceStage] = None,
+    metrics: Optional[run_metrics.RunMetrics] = None,
+    guard: Optional[load_control.ServerGuard] = None
+) -> Tuple[List[table_parser.AbsenceRow], List[records.LeaveSlipRecord]]:
+    """以免瀏覽器的 HTTP 後端抓取資料，返回 (raw_data, leave_slips)"""
+    set_status_callback("1/9 正在建立 HTTP 連線...")
+    return http_backend.fetch_records(
+        account, password, set_status_callback,
+        cache=cache, rate_limiter=rate_limiter, absence_stage=absence_stage, metrics=metrics, guard=guard
+    )
+
+def fetch_records(
+    account: str,
+    password: str,
+    set_status_callback,
+    backend: str = BACKEND_AUTO,
+    pool: Optional[driver_pool.DriverPool] = None,
+    cache: Optional[session_cache.SessionCache] = None,
+    rate_limiter: Optional[HostRateLimiter] = None,
+    absence_stage: Optional[table_parser.AbsenceStage] = None,
+    metrics: Optional[run_metrics.RunMetrics] = None,
+    guard: Optional[load_control.ServerGuard] = None
+) -> Tuple[List[table_parser.AbsenceRow], List[records.LeaveSlipRecord]]:
+    """
+    依 backend 選擇抓取方式:
+    - "http": 只用 HTTP 後端
+    - "selenium": 只用瀏覽器
+    - "auto": 優先使用 HTTP；頁面結構不符、連線層錯誤 (SSL/代理/連線重設，重試後仍失敗)
+              或未安裝 requests 時改用瀏覽器。主機回應 5xx 或斷路器開啟時不改用 (瀏覽器也會遇到相同問題)
+    pool: 瀏覽器驅動池 (可省略，省略時每次建立新的瀏覽器)
+    cache: 登入 Cookie 快取 (省略時使用程式共用的快取)
+    rate_limiter: 主機速率限制 (批次查詢時共用；瀏覽器後端僅在開始前等待一次)
+    absence_stage: 缺曠記錄解析後立即經過的產生器階段 (例如 SummaryAccumulator.track)
+    metrics: 記錄 WebDriver 呼叫次數、下載位元組數與列數 (階段計時由呼叫端以 metrics.wrap_status 包裝回呼)
+    guard: 主機負載控制 (省略時使用程式共用的)；HTTP 後端逐個請求重試，瀏覽器後端逾時時整段流程重試
+    """
+    if cache is None:
+        cache = session_cache.get_default_cache()
+    if guard is None:
+        guard = load_control.get_default_guard()
+
+    def on_selenium_retry(attempt: int, delay: float, error: BaseException):
+        if metrics is not None:
+            metrics.incr(run_metrics.RETRIES)
+        set_status_callback(f"⚠️ 學校主機回應逾時 ({error.__class__.__name__})，{delay:.1f} 秒後第 {attempt} 次重試...")
+
+    def fetch_with_selenium():
+        if rate_limiter is not None:
+            rate_limiter.wait(config_data.BASE_URL)
+        if metrics is not None:
+            metrics.backend = BACKEND_SELENIUM
+        # 整段瀏覽器流程的耗時遠超過單一請求，不佔用 AIMD 名額，只套用重試與斷路器
+        return guard.call(
+            lambda: _fetch_with_selenium(
+                account, password, set_status_callback, pool=pool, cache=cache, absence_stage=absence_stage, metrics=metrics
+            ),
+            on_retry=on_selenium_retry, throttle=False
         )
-        
-        xerox_table = driver.find_element(By.ID, config_data.TABLE_ID)
-        xerox_rows = xerox_table.find_elements(By.TAG_NAME, "tr")
-        
-        xerox_data: List[str] = [] 
-        if len(xerox_rows) > 1:
-            for row in xerox_rows[1:]:
-                cols = row.find_elements(By.TAG_NAME, "td")
-                if cols and len(cols) >= 2:
-                    # 根據 列印假單回傳資料.txt，週別是第二個欄位 (索引 1)
-                    week_number = cols[1].text.strip()
-                    xerox_data.append(week_number)
-
-        # 輸出假單週別到終端機
-        print("\n" + "="*70)
-        print("【假單記錄週別 (Xerox.aspx) - 終端機輸出】")
-        print("格式: 週別")
-        print("-"*70)
-        if xerox_data:
-            # 為了避免多個週別重複顯示，這裡可以考慮只顯示不重複的週別
-            unique_weeks = sorted(list(set(xerox_data)), key=lambda x: int(x.split(' ')[0]))
-            for week in unique_weeks:
-                print(f"假單記錄於: 週{week}")
+
+    def fetch_with_http():
+        if metrics is not None:
+            metrics.backend = BACKEND_HTTP
+        return _fetch_with_http(account, password, set_status_callback, cache, rate_limiter, absence_stage, metrics, guard)
+
+    if backend == BACKEND_SELENIUM:
+        result = fetch_with_selenium()
+    elif backend == BACKEND_HTTP:
+        result = fetch_with_http()
+    elif http_backend.is_available():
+        try:
+            result = fetch_with_http()
+        except PageStructureError as e:
+            set_status_callback(f"⚠️ HTTP 後端無法解析頁面 ({e})，改用瀏覽器重試...")
+            result = fetch_with_selenium()
+        except Exception as e:
+            if not http_backend.is_transport_error(e):
+                raise
+            set_status_callback(f"⚠️ HTTP 後端連線失敗 ({e.__class__.__name__})，改用瀏覽器重試...")
+            result = fetch_with_selenium()
+    else:
+        result = fetch_with_selenium()
+
+    if metrics is not None:
+        metrics.incr(run_metrics.ABSENCE_ROWS, len(result[0]))
+        metrics.incr(run_metrics.XEROX_ROWS, len(result[1]))
+    return result
+
+def print_raw_records(raw_data: List[table_parser.AbsenceRow], leave_slips: List[records.LeaveSlipRecord]):
+    """輸出原始缺曠課數據與假單到終端機"""
+    print("\n" + "="*70)
+    print("【原始缺曠課記錄 (Miss_ct.aspx) - 終端機輸出】")
+    print("格式: (課程名稱, 缺曠狀態, 週別, 節次, 日期)")
+    print("-"*70)
+    if raw_data:
+        for course_name, status, week, section, date in raw_data:
+            print(f"({course_name}, {status}, 週{week}, 節次{section}, {date})")
+    else:
+        print("無缺曠課記錄。")
+    print("="*70 + "\n")
+
+    print("\n" + "="*70)
+    print("【假單記錄 (Xerox.aspx) - 終端機輸出】")
+    print("格式: (假單編號, 週別, 期間, 假別, 狀態)")
+    print("-"*70)
+    if leave_slips:
+        for slip in sorted(leave_slips, key=lambda s: timeline.week_sort_key(s.week)):
+            print(f"({slip.slip_id}, 週{slip.week}, {slip.period}, {slip.leave_type}, {slip.status})")
+    else:
+        print("無假單記錄。")
+    print("="*70 + "\n")
+
+def calculate_summary(
+    raw_data: List[table_parser.AbsenceRow],
+    course_factors: Dict[str, int],
+    set_status_callback,
+    leave_slips: Optional[List[records.LeaveSlipRecord]] = None
+) -> List[List[str]]:
+    """
+    步驟 C: 統計計算，返回表格列
+    有傳入 leave_slips (步驟 B) 時，另外統計每門課請假節次的 已銷假 / 待銷假 / 未請假
+    """
+    coverage = leave_join.coverage_counts(raw_data, leave_slips) if leave_slips is not None else None
+    return format_summary_rows(count_absences(raw_data), course_factors, set_status_callback, coverage)
+
+def count_absences(raw_data: Iterable[table_parser.AbsenceRow]) -> records.CountMatrix:
+    """統計每門課各缺曠類別的節次數 (以整數代碼累加，不在此轉成字串)"""
+    
+    # 統計數據 (只使用第一個頁面抓取的 raw_data，忽略週別和節次)
+    counts = records.CountMatrix()
+    status_codes = records.STATUS_CODES
+    
+    for course_name, status, *_ in raw_data: 
+        counts.add(course_name, status_codes.get(status, records.UNKNOWN_STATUS))
+    
+    return counts
+
+def ordered_courses(recorded_courses: Iterable[str], course_factors: Dict[str, int]) -> List[str]:
+    """輸出順序: 先列出有設定因子的課程，再依名稱排序列出其餘有缺曠記錄的課程"""
+    factor_courses: Set[str] = set(course_factors.keys())
+    
+    final_course_list: List[str] = list(factor_courses)
+    for course in sorted(set(recorded_courses) - factor_courses):
+        final_course_list.append(course)
+    return final_course_list
+
+def summary_row(
+    course_name: str,
+    counts: Sequence[int],
+    factor: Optional[int],
+    coverage: Optional[Sequence[int]] = None
+) -> List[str]:
+    """
+    單一課程的表格列: (課程名稱, 各類別節次, 總節次, 總天數, 已銷假, 待銷假, 未請假)
+    counts 為 CountMatrix 的計數列，只在這裡轉成顯示用的字串
+    coverage 為 None 代表尚未比對假單，後三欄留空
+    """
+    total_absent = counts[records.TOTAL_INDEX]
+    calculated_days_str = "" 
+
+    # 計算總天數
+    if factor:
+        if total_absent > 0:
+            calculated_days = total_absent / factor
+            calculated_days_str = f"{calculated_days:.2f}"
         else:
-            print("無假單記錄。")
-        print("="*70 + "\n")
-        
-        # ==========================================================
-        # 步驟 C: 統計計算 (只使用步驟 A 的 raw_data)
-        # ==========================================================
-        
-        set_status_callback("8/9 正在計算總結數據...")
-        
-        # 統計數據 (只使用第一個頁面抓取的 raw_data，忽略週別和節次)
-        summary_data = defaultdict(lambda: defaultdict(float)) 
+            calculated_days_str = "0.00"
+    else:
+         calculated_days_str = "N/A"
+
+    row: List[str] = [course_name]
+    row.extend(str(count) for count in counts[:records.TOTAL_INDEX])
+    row.append(str(total_absent)) 
+    row.append(calculated_days_str) 
+    if coverage is None:
+        row.extend([""] * len(config_data.COVERAGE_TYPES))
+    else:
+        row.extend(str(count) for count in coverage)
+    return row
+
+def format_summary_rows(
+    counts: records.CountMatrix,
+    course_factors: Dict[str, int],
+    set_status_callback,
+    coverage: Optional[Dict[str, List[int]]] = None
+) -> List[List[str]]:
+    """
+    依課程因子把統計結果整理成表格列 (課程名稱, 各類別節次, 總節次, 總天數, 已銷假, 待銷假, 未請假)
+    coverage: leave_join.coverage_counts 的結果；None 代表沒有假單資料
+    """
+    
+    output_rows = []
+    
+    for course_name in ordered_courses(counts.courses(), course_factors):
+        factor = course_factors.get(course_name)
+        if not factor and counts.total(course_name) > 0:
+            set_status_callback(f"⚠️ 警告: 課程【{course_name}】缺少應計節次，總天數無法計算 (N/A)。", is_error=True)
         
-        for course_name, status, _, _ in raw_data: 
-            if status in config_data.ABSENCE_TYPES:
-                summary_data[course_name][status] += 1
-                summary_data[course_name]['總缺課數量'] += 1
-                
-        # 整理最終輸出列表
-        recorded_courses: Set[str] = set(summary_data.keys())
-        factor_courses: Set[str] = set(course_factors.keys())
+        course_coverage = coverage.get(course_name, NO_COVERAGE) if coverage is not None else None
+        output_rows.append(summary_row(course_name, counts.row(course_name), factor, course_coverage))
+    
+    return output_rows
+
+class SummaryAccumulator:
+    """
+    串流統計階段：接在表格解析之後，每解析出一筆缺曠記錄就更新該課程的節次，
+    並立即以 on_update(表格列) 通知介面；不需要等整份 raw_data 建立完成
+    """
+
+    def __init__(
+        self,
+        course_factors: Dict[str, int],
+        on_update: Optional[Callable[[List[str]], None]] = None,
+        on_reset: Optional[Callable[[], None]] = None
+    ):
+        self.course_factors = course_factors
+        self.on_update = on_update
+        self.on_reset = on_reset
+        self.counts = records.CountMatrix()
+
+    def track(self, rows: Iterator[table_parser.AbsenceRow]) -> Iterator[table_parser.AbsenceRow]:
+        """
+        產生器階段：原樣傳遞每筆記錄，同時累加統計
+        每次呼叫代表一份完整的缺曠表格，因此先清空前一次 (例如改用瀏覽器重試前) 的統計
+        """
+        self.counts.clear()
+        if self.on_reset:
+            self.on_reset()
         
-        final_course_list: List[str] = list(factor_courses)
-        for course in sorted(list(recorded_courses - factor_courses)):
-            final_course_list.append(course)
-            
-        output_rows = []
+        for row in rows:
+            course_name = row[0]
+            if self.counts.add(course_name, records.STATUS_CODES.get(row[1], records.UNKNOWN_STATUS)):
+                if self.on_update:
+                    self.on_update(summary_row(course_name, self.counts.row(course_name), self.course_factors.get(course_name)))
+            yield row
+
+def describe_error(e: Exception) -> str:
+    """查詢失敗時顯示給使用者的訊息"""
+    if isinstance(e, (LoginFailedError, load_control.ServerUnavailableError)):
+        return f"錯誤：{e}"
+    # Selenium 例外只可能來自已載入的 selenium，未載入時不必為了判斷而匯入
+    if "selenium" in sys.modules:
+        from selenium.common.exceptions import TimeoutException, NoSuchElementException, WebDriverException
+        if isinstance(e, (TimeoutException, NoSuchElementException)):
+            return f"錯誤：抓取頁面元素或登入超時。請檢查帳密或網路。錯誤: {e.__class__.__name__}"
+        if isinstance(e, WebDriverException):
+            return f"錯誤：瀏覽器驅動程式問題。請確保 Chrome 和 ChromeDriver 版本匹配。錯誤: {e.__class__.__name__}"
+    if load_control.is_retryable(e):
+        # HTTP 後端的逾時 / 連線錯誤 / 5xx (重試後仍失敗)
+        return f"錯誤：學校主機回應逾時或錯誤，請稍後再試。錯誤: {e.__class__.__name__}"
+    return f"發生未預期的錯誤: {e}"
+
+def scrape_and_calculate(
+    account: str, 
+    password: str, 
+    course_factors: Dict[str, int],
+    set_status_callback, # 傳入 GUI 的狀態更新函式
+    backend: str = BACKEND_AUTO,
+    pool: Optional[driver_pool.DriverPool] = None,
+    store: Optional[record_store.RecordStore] = None,
+    accumulator: Optional[SummaryAccumulator] = None,
+    metrics: Optional[run_metrics.RunMetrics] = None,
+    on_records: Optional[Callable[[List[table_parser.AbsenceRow], List[records.LeaveSlipRecord]], None]] = None,
+    guard: Optional[load_control.ServerGuard] = None
+) -> List[List[str]]:
+    """
+    核心爬蟲和計算邏輯
+    返回整理好的表格數據 (List[List[str]])
+    傳入 store 時先將記錄增量同步到本機資料庫，統計直接由資料庫索引讀出
+    傳入 accumulator 時邊解析邊統計，並透過其 on_update 即時回報每門課的最新節次
+    傳入 metrics 時記錄每個 "N/9" 階段的耗時與各項計數
+    傳入 on_records 時以 (raw_data, leave_slips) 呼叫，供呼叫端保留原始記錄 (例如之後匯出)
+    guard: 主機負載控制 (逾時/5xx 以退避重試，主機停擺時快速失敗)；省略時使用程式共用的
+    """
+    if metrics is not None:
+        set_status_callback = metrics.wrap_status(set_status_callback)
+    
+    output_rows = None
+    error = ""
+    try:
+        raw_data, leave_slips = fetch_records(
+            account, password, set_status_callback, backend, pool,
+            absence_stage=accumulator.track if accumulator else None, metrics=metrics, guard=guard
+        )
+        print_raw_records(raw_data, leave_slips)
+        if on_records is not None:
+            on_records(raw_data, leave_slips)
         
-        for course_name in final_course_list:
-            counts = summary_data[course_name] 
-            total_absent = counts.get('總缺課數量', 0)
-            factor = course_factors.get(course_name)
-            calculated_days_str = "" 
-
-            # 計算總天數
-            if factor:
-                if total_absent > 0:
-                    calculated_days = total_absent / factor
-                    calculated_days_str = f"{calculated_days:.2f}"
-                else:
-                    calculated_days_str = "0.00"
-            else:
-                 calculated_days_str = "N/A"
-                 if total_absent > 0:
-                     set_status_callback(f"⚠️ 警告: 課程【{course_name}】缺少應計節次，總天數無法計算 (N/A)。", is_error=True)
-
-            row: List[str] = [course_name]
-            for status in config_data.ABSENCE_TYPES:
-                row.append(str(int(counts.get(status, 0)))) 
-            row.append(str(int(total_absent))) 
-            row.append(calculated_days_str) 
-            
-            output_rows.append(row)
+        set_status_callback("8/9 正在計算總結數據...")
+        if store is not None:
+            sync_result = store.sync(account, raw_data, [slip.week for slip in leave_slips])
+            print(f"本機記錄庫同步: {sync_result}")
+            counts = store.course_counts(account)
+        elif accumulator is not None:
+            counts = accumulator.counts
+        else:
+            counts = count_absences(raw_data)
+        # 以假單期間的區間索引對應每筆請假節次 (步驟 B 與 步驟 A 的結合)
+        coverage = leave_join.coverage_counts(raw_data, leave_slips)
+        output_rows = format_summary_rows(counts, course_factors, set_status_callback, coverage)
         
         set_status_callback("9/9 資料抓取與計算完成！")
-        return output_rows
 
-    except (TimeoutException, NoSuchElementException) as e:
-        set_status_callback(f"錯誤：抓取頁面元素或登入超時。請檢查帳密或網路。錯誤: {e.__class__.__name__}", is_error=True)
-        return []
-    except WebDriverException as e:
-        set_status_callback(f"錯誤：瀏覽器驅動程式問題。請確保 Chrome 和 ChromeDriver 版本匹配。錯誤: {e.__class__.__name__}", is_error=True)
-        return []
     except Exception as e:
-        set_status_callback(f"發生未預期的錯誤: {e}", is_error=True)
-        return []
+        error = describe_error(e)
     finally:
-        if driver:
-            driver.quit()
\ No newline at end of file
+        if metrics is not None:
+            metrics.finish("ok" if output_rows is not None else "error", error)
+
+    if output_rows is None:
+        set_status_callback(error, is_error=True)
+        return []
+    return output_rows
@@ -0,0 +1,16 @@
+# 爬蟲流程共用的例外類別
+
+class ScraperError(Exception):
+    """爬蟲流程錯誤的基底類別"""
+
+
+class LoginFailedError(ScraperError):
+    """送出帳號密碼後仍停留在登入頁 (帳密錯誤或帳號被鎖)"""
+
+
+class PageStructureError(ScraperError):
+    """頁面結構與預期不符 (找不到表單欄位或表格)，可改用 Selenium 後端重試"""
+
+
+class SessionExpiredError(LoginFailedError):
+    """登入狀態 (或快取的 Cookie) 已失效，讀取資料頁時被導回登入頁"""
@@ -0,0 +1,196 @@
+# 已登入工作階段的 Cookie 快取 (加密、依帳號分檔、有存活時間)
+#
+# 快取檔以 cryptography 的 Fernet 加密；未安裝 cryptography 時快取自動停用，
+# 不會以明文把 Cookie 寫到磁碟。快取同時保存加鹽的密碼雜湊，密碼不符時視為沒有快取 (改為實際登入)，
+# 只知道學號無法取得別人的資料。金鑰與快取檔只有目前使用者可讀寫 (0600)。
+
+import hashlib
+import hmac
+import json
+import os
+import tempfile
+import threading
+import time
+from typing import Dict, List, Optional
+
+try:
+    from cryptography.fernet import Fernet, InvalidToken
+except ImportError:
+    Fernet = None
+
+import config_data
+
+CACHE_DIR = "session_cache"
+KEY_FILE = ".session_key"
+COOKIE_FIELDS = ("name", "value", "domain", "path", "secure")
+PASSWORD_HASH_ITERATIONS = 10_000  # 每次查詢都要計算一次；內容另有 Fernet 加密，不需要更多輪
+SALT_BYTES = 16
+PRIVATE_FILE_MODE = 0o600
+PRIVATE_DIR_MODE = 0o700
+
+# 行程內的隨機密鑰，只用於 credential_fingerprint (不寫入磁碟)
+_PROCESS_SECRET = os.urandom(32)
+
+
+def hash_password(password: str, salt: bytes) -> str:
+    return hashlib.pbkdf2_hmac('sha256', password.encode('utf-8'), salt, PASSWORD_HASH_ITERATIONS).hex()
+
+
+def credential_fingerprint(account: str, password: str) -> str:
+    """帳號 + 密碼的指紋 (只在本行程內有效)，供驅動池判斷能否沿用已登入的瀏覽器"""
+    return hmac.new(_PROCESS_SECRET, f"{account}\x00{password}".encode('utf-8'), hashlib.sha256).hexdigest()
+
+
+def _write_temp(path: str, data: bytes) -> str:
+    """在 path 的目錄寫入 0600 的暫存檔 (mkstemp 預設即為 0600)，返回暫存檔路徑"""
+    fd, temp_path = tempfile.mkstemp(prefix=".tmp-", dir=os.path.dirname(path))
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+    except BaseException:
+        os.remove(temp_path)
+        raise
+    return temp_path
+
+
+def _write_private(path: str, data: bytes):
+    """以 0600 原子寫入 (暫存檔 + os.replace)；讀取端不會看到寫到一半的檔案"""
+    temp_path = _write_temp(path, data)
+    try:
+        os.replace(temp_path, path)
+    except BaseException:
+        os.remove(temp_path)
+        raise
+
+
+def _create_private(path: str, data: bytes):
+    """
+    以 0600 原子建立檔案，已存在時保留原檔 (以 os.link 實作不覆寫的改名)
+    多個行程同時建立金鑰時，只有第一個寫入的會生效
+    """
+    temp_path = _write_temp(path, data)
+    try:
+        os.link(temp_path, path)
+    except FileExistsError:
+        pass
+    except OSError:
+        # 不支援硬連結的檔案系統：退回可能覆寫的改名
+        if not os.path.exists(path):
+            os.replace(temp_path, path)
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
+
+class SessionCache:
+    """
+    每個帳號一個加密檔，內容為 {"saved_at": 時間戳, "salt": ..., "password_hash": ..., "cookies": [...]}
+    cookies 為 {"name", "value", "domain", "path", "secure"} 字典，Selenium 與 requests 皆可使用
+    """
+
+    def __init__(self, directory: Optional[str] = None, ttl: float = config_data.SESSION_CACHE_TTL):
+        self.directory = directory or os.path.join(config_data.get_app_path(), CACHE_DIR)
+        self.ttl = ttl
+        self._fernet = None
+        self._fernet_lock = threading.Lock()  # 批次查詢的工作執行緒共用同一個快取
+
+    @property
+    def enabled(self) -> bool:
+        return Fernet is not None and self.ttl > 0
+
+    def load(self, account: str, password: str) -> Optional[List[Dict]]:
+        """
+        取得未過期的 Cookie；沒有快取、已過期、無法解密或密碼不符時返回 None
+        密碼不符時保留快取 (可能只是打錯密碼)，由呼叫端實際登入驗證
+        """
+        if not self.enabled:
+            return None
+        path = self._path(account)
+        if not os.path.exists(path):
+            return None
+        try:
+            with open(path, 'rb') as f:
+                payload = json.loads(self._cipher().decrypt(f.read()))
+        except (OSError, ValueError, InvalidToken):
+            self.invalidate(account)
+            return None
+        if time.time() - payload.get("saved_at", 0) > self.ttl or "password_hash" not in payload:
+            # 沒有密碼雜湊的舊版快取也視為無效
+            self.invalidate(account)
+            return None
+        try:
+            expected = hash_password(password, bytes.fromhex(payload.get("salt", "")))
+        except ValueError:
+            self.invalidate(account)
+            return None
+        if not hmac.compare_digest(expected, payload["password_hash"]):
+            return None
+        return payload.get("cookies") or None
+
+    def save(self, account: str, password: str, cookies: List[Dict]):
+        """登入成功後呼叫；password 只以加鹽雜湊保存"""
+        if not self.enabled or not cookies:
+            return
+        salt = os.urandom(SALT_BYTES)
+        payload = {
+            "saved_at": time.time(),
+            "salt": salt.hex(),
+            "password_hash": hash_password(password, salt),
+            "cookies": [{k: c.get(k) for k in COOKIE_FIELDS if c.get(k) is not None} for c in cookies],
+        }
+        try:
+            self._ensure_directory()
+            _write_private(self._path(account), self._cipher().encrypt(json.dumps(payload).encode('utf-8')))
+        except (OSError, ValueError) as e:
+            print(f"警告：無法寫入登入快取: {e}")
+
+    def invalidate(self, account: str):
+        try:
+            os.remove(self._path(account))
+        except OSError:
+            pass
+
+    def _path(self, account: str) -> str:
+        # 檔名使用帳號雜湊，不在目錄中留下學號
+        digest = hashlib.sha256(account.encode('utf-8')).hexdigest()[:32]
+        return os.path.join(self.directory, f"{digest}.bin")
+
+    def _ensure_directory(self):
+        os.makedirs(self.directory, mode=PRIVATE_DIR_MODE, exist_ok=True)
+        os.chmod(self.directory, PRIVATE_DIR_MODE)
+
+    def _cipher(self):
+        """
+        載入或建立金鑰 (執行緒鎖 + 不覆寫的原子建立，同時查詢的執行緒/行程只會得到同一把金鑰)
+        金鑰檔損毀時重建；以舊金鑰加密的快取之後讀取時無法解密，會被刪除
+        """
+        with self._fernet_lock:
+            if self._fernet is None:
+                key_path = os.path.join(self.directory, KEY_FILE)
+                self._ensure_directory()
+                if not os.path.exists(key_path):
+                    _create_private(key_path, Fernet.generate_key())
+                os.chmod(key_path, PRIVATE_FILE_MODE)  # 舊版以 0644 建立
+                with open(key_path, 'rb') as f:
+                    key = f.read()
+                try:
+                    self._fernet = Fernet(key)
+                except ValueError:
+                    print("警告：登入快取金鑰損毀，已重新建立。")
+                    key = Fernet.generate_key()
+                    _write_private(key_path, key)
+                    self._fernet = Fernet(key)
+            return self._fernet
+
+
+_default_cache: Optional[SessionCache] = None
+_default_cache_lock = threading.Lock()
+
+
+def get_default_cache() -> SessionCache:
+    """程式共用的快取實例 (位於程式目錄下的 session_cache/)"""
+    global _default_cache
+    with _default_cache_lock:
+        if _default_cache is None:
+            _default_cache = SessionCache()
+        return _default_cache
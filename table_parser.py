@@ -0,0 +1,273 @@
+# GridView 表格解析 (Selenium 與 HTTP 後端共用)
+#
+# 後端只需要取得表格的 outerHTML (或整頁 HTML)，欄位依 <th> 標題名稱對應，
+# 不再依賴固定的欄位索引。已安裝 lxml 時使用 lxml，否則使用標準庫 html.parser。
+# GridView 分頁時，表格底部的分頁列以 __doPostBack(表格, 'Page$N') 切換頁面；
+# find_pager 找出這些連結，由後端取回每一頁後再以 extract_absence_pages 合併 (並去除重複)。
+
+import html as html_lib
+import re
+from html.parser import HTMLParser
+from itertools import chain
+from typing import Callable, Dict, Iterable, Iterator, List, NamedTuple, Optional, Set, Tuple
+
+try:
+    import lxml.html
+except ImportError:
+    lxml = None
+
+import config_data
+from records import AbsenceRecord, LeaveSlipRecord, make_absence
+from scraper_errors import PageStructureError
+
+# 缺曠課表格 (Miss_ct.aspx) 使用的欄位標題
+ABSENCE_WEEK = "週別"
+ABSENCE_DATE = "日期"
+ABSENCE_COURSE = "課號"
+ABSENCE_STATUS = "狀態"
+ABSENCE_SECTION = "節次"
+
+# raw_data 的一筆記錄: (course_name, absence_status, week_number, section, date)
+AbsenceRow = AbsenceRecord
+
+# 假單表格 (Xerox.aspx) 使用的欄位標題
+XEROX_SLIP_ID = "假單編號"
+XEROX_WEEK = "週別"
+XEROX_PERIOD = "時間"
+XEROX_LEAVE_TYPE = "假別"
+XEROX_STATUS = "狀態"
+
+
+# 分頁連結: javascript:__doPostBack('ctl00$ContentPlaceHolder1$gw_absent','Page$2')
+PAGER_ARGUMENT_PREFIX = "Page$"
+PAGER_NEXT = "Next"
+_POSTBACK_PATTERN = re.compile(r"""__doPostBack\(\s*['"]([^'"]+)['"]\s*,\s*['"](Page\$[^'"]+)['"]\s*\)""")
+
+
+def _clean(text: str) -> str:
+    """合併連續空白並去頭尾，與 Selenium 的 .text 結果一致"""
+    return " ".join(text.split())
+
+
+class _TableCollector(HTMLParser):
+    """擷取指定 id 表格中每一列的 (是否為標題列, 儲存格文字)"""
+
+    def __init__(self, table_id: str):
+        super().__init__()
+        self.table_id = table_id
+        self.rows: List[Tuple[bool, List[str]]] = []
+        self.found = False
+        self._depth = 0
+        self._row: Optional[List[str]] = None
+        self._row_is_header = False
+        self._cell: Optional[List[str]] = None
+
+    def handle_starttag(self, tag, attrs):
+        if tag == "table":
+            if self._depth:
+                self._depth += 1
+            elif dict(attrs).get("id") == self.table_id:
+                self.found = True
+                self._depth = 1
+            return
+        # 只處理最外層表格本身的列，忽略巢狀表格
+        if self._depth != 1:
+            return
+        if tag == "tr":
+            self._row = []
+            self._row_is_header = False
+        elif tag in ("td", "th") and self._row is not None:
+            self._cell = []
+            self._row_is_header = self._row_is_header or tag == "th"
+
+    def handle_endtag(self, tag):
+        if not self._depth:
+            return
+        if tag == "table":
+            self._depth -= 1
+        elif self._depth != 1:
+            return
+        elif tag in ("td", "th") and self._cell is not None:
+            self._row.append(_clean("".join(self._cell)))
+            self._cell = None
+        elif tag == "tr" and self._row is not None:
+            self.rows.append((self._row_is_header, self._row))
+            self._row = None
+
+    def handle_data(self, data):
+        if self._cell is not None:
+            self._cell.append(data)
+
+
+def _iter_with_lxml(html: str, table_id: str) -> Iterator[Tuple[bool, List[str]]]:
+    root = lxml.html.fromstring(html)
+    if root.get("id") == table_id:
+        table = root
+    else:
+        found = root.xpath(f'//table[@id="{table_id}"]')
+        if not found:
+            raise PageStructureError(f"頁面中找不到表格 {table_id}")
+        table = found[0]
+
+    for tr in table.xpath("./tr | ./thead/tr | ./tbody/tr"):
+        cells = tr.xpath("./th | ./td")
+        is_header = any(cell.tag == "th" for cell in cells)
+        yield is_header, [_clean(cell.text_content()) for cell in cells]
+
+
+def _iter_raw_rows(html: str, table_id: str) -> Iterator[Tuple[bool, List[str]]]:
+    """逐列產生 (是否為標題列, 儲存格文字)；找不到表格時拋出 PageStructureError"""
+    if lxml is not None:
+        return _iter_with_lxml(html, table_id)
+    collector = _TableCollector(table_id)
+    collector.feed(html)
+    if not collector.found:
+        raise PageStructureError(f"頁面中找不到表格 {table_id}")
+    return iter(collector.rows)
+
+
+def iter_table(html: str, table_id: str = config_data.TABLE_ID) -> Iterator[Tuple[List[str], List[str]]]:
+    """逐列產生 (標題列, 資料列)，不先建立整個資料列清單"""
+    headers: List[str] = []
+    for is_header, cells in _iter_raw_rows(html, table_id):
+        if is_header:
+            if not headers:
+                headers = cells
+        elif cells:
+            yield headers, cells
+
+
+def parse_table(html: str, table_id: str = config_data.TABLE_ID) -> Tuple[List[str], List[List[str]]]:
+    """
+    iter_table 的清單版本：返回 (標題列, 資料列)
+    沒有資料列時返回 ([], [])；找不到表格時拋出 PageStructureError
+    """
+    headers: List[str] = []
+    data_rows: List[List[str]] = []
+    for headers, cells in iter_table(html, table_id):
+        data_rows.append(cells)
+    return headers, data_rows
+
+
+def column_indexes(headers: List[str], names: List[str]) -> Dict[str, int]:
+    """依標題名稱找出欄位索引，缺少任何一個欄位就拋出 PageStructureError"""
+    indexes = {}
+    for name in names:
+        if name not in headers:
+            raise PageStructureError(f"表格缺少欄位【{name}】，目前欄位: {headers}")
+        indexes[name] = headers.index(name)
+    return indexes
+
+
+def iter_absences(html: str) -> Iterator[AbsenceRow]:
+    """
+    逐筆解析缺曠課表格 (Miss_ct.aspx)
+    產生 (course_name, absence_status, week_number, section, date)
+    沒有標題列的表格 (GridView 只顯示 EmptyData 列，例如「查無資料」) 視為沒有記錄
+    """
+    idx = None
+    width = 0
+    for headers, cols in iter_table(html):
+        if not headers:
+            return
+        if idx is None:
+            idx = column_indexes(headers, [ABSENCE_WEEK, ABSENCE_DATE, ABSENCE_COURSE, ABSENCE_STATUS, ABSENCE_SECTION])
+            width = max(idx.values()) + 1
+        if len(cols) >= width:
+            yield make_absence(
+                cols[idx[ABSENCE_COURSE]],
+                cols[idx[ABSENCE_STATUS]],
+                cols[idx[ABSENCE_WEEK]],
+                cols[idx[ABSENCE_SECTION]],
+                cols[idx[ABSENCE_DATE]],
+            )
+
+
+# 串接在解析之後的產生器階段 (例如邊解析邊統計)，輸入與輸出皆為 AbsenceRow 的迭代器
+AbsenceStage = Callable[[Iterator[AbsenceRow]], Iterator[AbsenceRow]]
+
+
+def extract_leave_slips(html: str) -> List[LeaveSlipRecord]:
+    """解析假單表格 (Xerox.aspx)，返回完整的假單記錄；沒有標題列 (只有 EmptyData 列) 時返回空列表"""
+    headers, rows = parse_table(html)
+    if not headers:
+        return []
+    idx = column_indexes(headers, [XEROX_SLIP_ID, XEROX_WEEK, XEROX_PERIOD, XEROX_LEAVE_TYPE, XEROX_STATUS])
+    width = max(idx.values()) + 1
+    return [
+        LeaveSlipRecord(
+            cols[idx[XEROX_SLIP_ID]],
+            cols[idx[XEROX_WEEK]],
+            cols[idx[XEROX_PERIOD]],
+            cols[idx[XEROX_LEAVE_TYPE]],
+            cols[idx[XEROX_STATUS]],
+        )
+        for cols in rows if len(cols) >= width
+    ]
+
+
+# ==============================================================================
+#   【GridView 分頁】
+# ==============================================================================
+
+class GridPager(NamedTuple):
+    """表格分頁列上的連結"""
+    event_target: str          # __EVENTTARGET (GridView 的 UniqueID，例如 ctl00$ContentPlaceHolder1$gw_absent)
+    pages: Dict[int, str]      # 頁碼 -> __EVENTARGUMENT ("Page$3")；含 "..." 連結指向的頁碼
+    next_argument: str = ""    # 只有 上一頁/下一頁 模式時的 "Page$Next"
+
+
+def client_id(unique_id: str) -> str:
+    """UniqueID -> ClientID (表格的 id): ctl00$ContentPlaceHolder1$gw_absent -> ctl00_ContentPlaceHolder1_gw_absent"""
+    return unique_id.replace("$", "_")
+
+
+def find_pager(html: str, table_id: str = config_data.TABLE_ID) -> Optional[GridPager]:
+    """找出指定表格的分頁連結；表格沒有分頁 (只有一頁) 時返回 None"""
+    if PAGER_ARGUMENT_PREFIX not in html:
+        return None
+    event_target = ""
+    pages: Dict[int, str] = {}
+    next_argument = ""
+    for target, argument in _POSTBACK_PATTERN.findall(html_lib.unescape(html)):
+        if client_id(target) != table_id:
+            continue
+        event_target = target
+        value = argument[len(PAGER_ARGUMENT_PREFIX):]
+        if value.isdigit():
+            pages[int(value)] = argument
+        elif value == PAGER_NEXT:
+            next_argument = argument
+    if not event_target:
+        return None
+    return GridPager(event_target, pages, next_argument)
+
+
+def iter_unique_absences(rows: Iterable[AbsenceRow], seen: Optional[Set[Tuple[str, str, str]]] = None) -> Iterator[AbsenceRow]:
+    """以 (日期, 課程, 節次) 去除重複的記錄 (分頁重疊或重複讀取同一頁時)，保留第一筆"""
+    seen = set() if seen is None else seen
+    for row in rows:
+        key = (row.date, row.course, row.section)
+        if key not in seen:
+            seen.add(key)
+            yield row
+
+
+def extract_absence_pages(pages: Iterable[str], stage: Optional[AbsenceStage] = None) -> List[AbsenceRow]:
+    """解析分頁後的每一頁缺曠課表格並合併 (先去除重複再經過 stage)"""
+    rows = iter_unique_absences(chain.from_iterable(iter_absences(html) for html in pages))
+    if stage is not None:
+        rows = stage(rows)
+    return list(rows)
+
+
+def extract_leave_slip_pages(pages: Iterable[str]) -> List[LeaveSlipRecord]:
+    """解析分頁後的每一頁假單表格並合併 (以假單編號去除重複)"""
+    seen: Set[str] = set()
+    slips: List[LeaveSlipRecord] = []
+    for html in pages:
+        for slip in extract_leave_slips(html):
+            if slip.slip_id not in seen:
+                seen.add(slip.slip_id)
+                slips.append(slip)
+    return slips
@@ -0,0 +1,153 @@
+# 缺曠記錄的日期 / 週別層：民國日期與週別字串只解析一次 (快取)，
+# 並預先算好每門課的 每週 / 每日 節次序列，供趨勢圖與「最近 N 週」查詢直接使用
+#
+# 民國日期格式 "114/09/16" (民國年 + 1911 = 西元年)；週別欄位可能帶空白 ("8 ")。
+
+from array import array
+from bisect import bisect_left
+from datetime import date
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import records
+import table_parser
+
+ROC_YEAR_OFFSET = 1911
+PARSE_CACHE_SIZE = 4096  # 一學期的日期與週別遠少於此數
+
+
+# ==============================================================================
+#   【日期與週別解析】
+# ==============================================================================
+
+@lru_cache(maxsize=PARSE_CACHE_SIZE)
+def roc_date_key(text: str) -> Optional[int]:
+    """民國日期 "114/11/16" -> 可比較大小的整數 1141116；格式不符返回 None"""
+    parts = text.strip().split("/")
+    if len(parts) != 3 or not all(part.isdigit() for part in parts):
+        return None
+    year, month, day = (int(part) for part in parts)
+    return year * 10000 + month * 100 + day
+
+
+@lru_cache(maxsize=PARSE_CACHE_SIZE)
+def parse_roc_date(text: str) -> Optional[date]:
+    """民國日期 "114/09/16" -> date(2025, 9, 16)；格式不符或日期不存在返回 None"""
+    key = roc_date_key(text)
+    if key is None:
+        return None
+    try:
+        return date(key // 10000 + ROC_YEAR_OFFSET, key // 100 % 100, key % 100)
+    except ValueError:
+        return None
+
+
+@lru_cache(maxsize=PARSE_CACHE_SIZE)
+def parse_week(text: str) -> Optional[int]:
+    """週別 "8 " -> 8；格式不符返回 None"""
+    head = text.strip().split(" ", 1)[0]
+    return int(head) if head.isdigit() else None
+
+
+def week_sort_key(text: str) -> int:
+    """排序用：無法解析的週別排在最前面"""
+    week = parse_week(text)
+    return week if week is not None else 0
+
+
+# ==============================================================================
+#   【時間序列】
+# ==============================================================================
+
+class AbsenceTimeline:
+    """
+    每門課依 週別 / 日期 的節次序列 (各缺曠類別 + 合計，欄位順序同 CountMatrix)
+    建立時只掃描 raw_data 一次；週別或日期無法解析的記錄不列入對應的序列 (計入 skipped)
+    """
+
+    def __init__(self, raw_data: Iterable[table_parser.AbsenceRow]):
+        parsed: List[Tuple[str, int, Optional[int], Optional[date]]] = []
+        self.skipped = 0
+        for course_name, status, week, _, day in raw_data:
+            code = records.STATUS_CODES.get(status, records.UNKNOWN_STATUS)
+            if code == records.UNKNOWN_STATUS:
+                continue
+            week_number, day_value = parse_week(week), parse_roc_date(day)
+            if week_number is None or day_value is None:
+                self.skipped += 1
+            parsed.append((course_name, code, week_number, day_value))
+
+        week_numbers = [week for _, _, week, _ in parsed if week is not None]
+        self.first_week = min(week_numbers, default=1)
+        self.last_week = max(week_numbers, default=0)
+        self.days: List[date] = sorted({day for _, _, _, day in parsed if day is not None})
+        day_index = {day: i for i, day in enumerate(self.days)}
+
+        width = records.ROW_WIDTH
+        week_count = self.last_week - self.first_week + 1
+        self._weeks: Dict[str, array] = {}
+        self._days: Dict[str, array] = {}
+        for course_name, code, week, day in parsed:
+            if week is not None:
+                row = self._weeks.get(course_name)
+                if row is None:
+                    row = self._weeks[course_name] = array('l', [0]) * (week_count * width)
+                offset = (week - self.first_week) * width
+                row[offset + code] += 1
+                row[offset + records.TOTAL_INDEX] += 1
+            if day is not None:
+                row = self._days.get(course_name)
+                if row is None:
+                    row = self._days[course_name] = array('l', [0]) * (len(self.days) * width)
+                offset = day_index[day] * width
+                row[offset + code] += 1
+                row[offset + records.TOTAL_INDEX] += 1
+
+        # 每門課合計節次的每週前綴和，「最近 N 週」查詢為 O(1)
+        self._week_prefix: Dict[str, array] = {}
+        for course_name, row in self._weeks.items():
+            prefix = array('l', [0])
+            for i in range(week_count):
+                prefix.append(prefix[-1] + row[i * width + records.TOTAL_INDEX])
+            self._week_prefix[course_name] = prefix
+
+    def courses(self) -> List[str]:
+        return sorted(set(self._weeks) | set(self._days))
+
+    def weeks(self) -> range:
+        return range(self.first_week, self.last_week + 1)
+
+    @staticmethod
+    def _column(status: Optional[str]) -> int:
+        if status is None:
+            return records.TOTAL_INDEX
+        if status not in records.STATUS_CODES:
+            raise KeyError(f"未知的缺曠類別: {status}")
+        return records.STATUS_CODES[status]
+
+    def week_series(self, course_name: str, status: Optional[str] = None) -> List[int]:
+        """每週的節次 (對應 weeks())；status 為 None 時是合計"""
+        row = self._weeks.get(course_name)
+        if row is None:
+            return [0] * len(self.weeks())
+        return list(row[self._column(status)::records.ROW_WIDTH])
+
+    def day_series(self, course_name: str, status: Optional[str] = None) -> List[Tuple[date, int]]:
+        """有缺曠記錄的日期 (對應 self.days) 與當天節次"""
+        row = self._days.get(course_name)
+        if row is None:
+            return [(day, 0) for day in self.days]
+        return list(zip(self.days, row[self._column(status)::records.ROW_WIDTH]))
+
+    def recent_weeks(self, n: int, until_week: Optional[int] = None) -> Dict[str, int]:
+        """每門課在 until_week (預設為最後一週) 往前 n 週內 (含) 的合計節次"""
+        until = self.last_week if until_week is None else min(until_week, self.last_week)
+        end = until - self.first_week + 1
+        start = max(0, end - max(0, n))
+        if end <= 0:
+            return {course_name: 0 for course_name in self._week_prefix}
+        return {course_name: prefix[end] - prefix[start] for course_name, prefix in self._week_prefix.items()}
+
+    def days_between(self, start: date, end: date) -> Tuple[int, int]:
+        """self.days 中落在 [start, end] 的索引範圍 (可直接切 day_series 的結果)"""
+        return bisect_left(self.days, start), bisect_left(self.days, end + date.resolution)
@@ -0,0 +1,117 @@
+# Selenium 導航等待策略：以實際的頁面就緒訊號取代固定秒數的 sleep
+#
+# Selenium (含 selenium.common.exceptions) 載入很慢，只在真正使用瀏覽器時才於函式內匯入；
+# WaitPolicy 與 is_login_url 不依賴 Selenium，可在程式啟動時直接使用。
+
+import config_data
+from scraper_errors import LoginFailedError, SessionExpiredError
+
+# 登入成功後 ASP.NET 可能發出的驗證 Cookie
+AUTH_COOKIE_NAMES = (".ASPXAUTH", ".ASPXFORMSAUTH")
+LOGIN_PAGE = "login_index.aspx"
+
+
+class WaitPolicy:
+    """每個導航步驟各自的逾時秒數"""
+
+    def __init__(
+        self,
+        login_form: float = 10,
+        login_result: float = 15,
+        table: float = 10,
+        poll_interval: float = 0.1,
+    ):
+        self.login_form = login_form        # 登入頁欄位出現
+        self.login_result = login_result    # 按下登入後等待跳轉或錯誤
+        self.table = table                  # 資料頁表格出現
+        self.poll_interval = poll_interval
+
+
+DEFAULT_POLICY = WaitPolicy()
+
+
+def is_login_url(url: str) -> bool:
+    return LOGIN_PAGE in (url or "").lower()
+
+
+def _wait(driver, timeout: float, policy: WaitPolicy):
+    from selenium.webdriver.support.ui import WebDriverWait
+    return WebDriverWait(driver, timeout, poll_frequency=policy.poll_interval)
+
+
+def wait_for_login_form(driver, policy: WaitPolicy = DEFAULT_POLICY):
+    """等待帳號、密碼欄位與登入按鈕都出現，返回 (account_input, password_input, sign_in_button)"""
+    from selenium.webdriver.common.by import By
+    from selenium.webdriver.support import expected_conditions as EC
+
+    wait = _wait(driver, policy.login_form, policy)
+    account_input = wait.until(EC.presence_of_element_located((By.NAME, "account")))
+    password_input = wait.until(EC.presence_of_element_located((By.NAME, "account_pass")))
+    sign_in_button = wait.until(EC.element_to_be_clickable((By.NAME, "SignIn")))
+    return account_input, password_input, sign_in_button
+
+
+def _login_outcome(old_password_input):
+    """
+    建立登入結果的等待條件，回傳值:
+    - (True, None): 已離開登入頁或取得驗證 Cookie
+    - (False, 訊息): 跳出錯誤提示，或頁面重新載入後仍是登入頁
+    - False: 尚未有結果，繼續等待
+    """
+    from selenium.common.exceptions import NoAlertPresentException, StaleElementReferenceException
+    from selenium.webdriver.common.by import By
+
+    def check(driver):
+        try:
+            alert = driver.switch_to.alert
+            message = alert.text
+            alert.accept()
+            return False, message
+        except NoAlertPresentException:
+            pass
+
+        if not is_login_url(driver.current_url):
+            return True, None
+        if any(driver.get_cookie(name) for name in AUTH_COOKIE_NAMES):
+            return True, None
+
+        try:
+            old_password_input.is_enabled()
+        except StaleElementReferenceException:
+            # 表單已送出且頁面重新載入，但仍停留在登入頁
+            if driver.find_elements(By.NAME, "account_pass"):
+                return False, None
+        return False
+    return check
+
+
+def wait_for_login_result(driver, old_password_input, policy: WaitPolicy = DEFAULT_POLICY):
+    """按下登入後等待結果，登入失敗立即拋出 LoginFailedError"""
+    success, message = _wait(driver, policy.login_result, policy).until(_login_outcome(old_password_input))
+    if not success:
+        raise LoginFailedError(f"登入失敗，請檢查帳號密碼。{message or ''}".strip())
+
+
+def _table_or_login_page(driver):
+    from selenium.webdriver.common.by import By
+    if is_login_url(driver.current_url):
+        return "login"
+    if driver.find_elements(By.ID, config_data.TABLE_ID):
+        return "table"
+    return False
+
+
+def wait_for_table(driver, policy: WaitPolicy = DEFAULT_POLICY):
+    """等待資料頁的表格出現並返回該元素；若被導回登入頁則拋出 SessionExpiredError"""
+    result = _wait(driver, policy.table, policy).until(_table_or_login_page)
+    if result == "login":
+        raise SessionExpiredError("登入狀態已失效，被導回登入頁。")
+    from selenium.webdriver.common.by import By
+    return driver.find_element(By.ID, config_data.TABLE_ID)
+
+
+def wait_for_table_refresh(driver, old_table, policy: WaitPolicy = DEFAULT_POLICY):
+    """送出 postback (例如切換分頁) 後，等待舊表格失效並返回重新繪出的表格"""
+    from selenium.webdriver.support import expected_conditions as EC
+    _wait(driver, policy.table, policy).until(EC.staleness_of(old_table))
+    return wait_for_table(driver, policy)